@@ -0,0 +1,83 @@
+# Copyright 2020 Bradbase
+
+"""
+Compares decoding a page of time entries with `dacite.from_dict` against the
+generated decoders of `harvest.decoder`.
+
+    python benchmarks/decoder_benchmark.py [entry_count]
+"""
+
+import sys
+import time
+
+import dacite
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import decoder
+from harvest.harvestdataclasses import TimeEntries
+
+TIME_ENTRY = {
+    "id": 636708723,
+    "spent_date": "2017-03-01",
+    "user": {"id": 1782959, "name": "Kim Allen"},
+    "client": {"id": 5735774, "name": "ABC Corp", "currency": "USD", "address": None},
+    "project": {"id": 14307913, "name": "Marketing Website", "code": "MW"},
+    "task": {"id": 8083365, "name": "Graphic Design", "default_hourly_rate": None},
+    "hours": 2.0,
+    "notes": "Adding CSS styling",
+    "created_at": "2017-06-27T15:50:15Z",
+    "updated_at": "2017-06-27T16:47:14Z",
+    "is_locked": True,
+    "locked_reason": "Item Approved and Locked for this Time Period",
+    "is_closed": True,
+    "is_billed": False,
+    "timer_started_at": None,
+    "started_time": None,
+    "ended_time": None,
+    "is_running": False,
+    "invoice": {"id": 13150378, "number": "1001"},
+    "external_reference": None,
+    "billable": True,
+    "budgeted": True,
+    "billable_rate": 100.0,
+    "cost_rate": 50.0,
+}
+
+
+def page(count):
+    return {
+        "time_entries": [dict(TIME_ENTRY, id=index) for index in range(count)],
+        "per_page": count,
+        "total_pages": 1,
+        "total_entries": count,
+        "next_page": None,
+        "previous_page": None,
+        "page": 1,
+        "links": {"first": "", "next": None, "previous": None, "last": ""},
+    }
+
+
+def run(label, data, fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data_class=TimeEntries, data=data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    count = len(data['time_entries'])
+    print('{0:<24} {1:>8.1f} ms/page {2:>10.0f} records/second'.format(label, best * 1000, count / best))
+    return best
+
+
+def main(count=2000):
+    data = page(count)
+    assert decoder.from_dict(data_class=TimeEntries, data=data) == dacite.from_dict(data_class=TimeEntries, data=data)
+
+    slow = run('dacite.from_dict', data, dacite.from_dict)
+    fast = run('harvest.decoder.from_dict', data, decoder.from_dict)
+    print('speedup {0:.1f}x'.format(slow / fast))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
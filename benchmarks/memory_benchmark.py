@@ -0,0 +1,88 @@
+# Copyright 2020 Bradbase
+
+"""
+Measures the memory held per decoded time entry, as the parsed JSON, as
+dataclasses and as dataclasses sharing their nested references.
+
+    python benchmarks/memory_benchmark.py [entry_count]
+"""
+
+import gc
+import json
+import sys
+import tracemalloc
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest.decoder import from_dict
+from harvest.harvestdataclasses import TimeEntries
+
+CLIENTS = [{"id": 5735774 + index, "name": "Client {0}".format(index), "currency": "USD"} for index in range(20)]
+PROJECTS = [{"id": 14307913 + index, "name": "Project {0}".format(index), "code": "P{0}".format(index)} for index in range(50)]
+TASKS = [{"id": 8083365 + index, "name": "Task {0}".format(index), "default_hourly_rate": None} for index in range(10)]
+USERS = [{"id": 1782959 + index, "name": "User {0}".format(index)} for index in range(40)]
+
+
+def time_entry(index):
+    return {
+        "id": 636708723 + index,
+        "spent_date": "2017-03-{0:02d}".format(index % 28 + 1),
+        "user": USERS[index % len(USERS)],
+        "client": CLIENTS[index % len(CLIENTS)],
+        "project": PROJECTS[index % len(PROJECTS)],
+        "task": TASKS[index % len(TASKS)],
+        "hours": 2.0,
+        "notes": "Adding CSS styling",
+        "created_at": "2017-06-27T15:50:15Z",
+        "updated_at": "2017-06-27T16:47:14Z",
+        "is_locked": False,
+        "locked_reason": None,
+        "is_closed": False,
+        "is_billed": False,
+        "timer_started_at": None,
+        "started_time": None,
+        "ended_time": None,
+        "is_running": False,
+        "invoice": None,
+        "external_reference": None,
+        "billable": True,
+        "budgeted": True,
+        "billable_rate": 100.0,
+        "cost_rate": 50.0,
+    }
+
+
+def body(count):
+    return json.dumps({
+        "time_entries": [time_entry(index) for index in range(count)],
+        "per_page": count,
+        "total_pages": 1,
+        "total_entries": count,
+        "next_page": None,
+        "previous_page": None,
+        "page": 1,
+        "links": {"first": "", "next": None, "previous": None, "last": ""},
+    })
+
+
+def measure(label, count, build):
+    # each response is parsed afresh as it would be off the wire
+    text = body(count)
+    gc.collect()
+    tracemalloc.start()
+    held = build(text)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('{0:<28} {1:>8.0f} bytes/record'.format(label, size / count))
+    del held
+
+
+def main(count=20000):
+    measure('parsed JSON', count, json.loads)
+    measure('dataclasses', count, lambda text: from_dict(data_class=TimeEntries, data=json.loads(text)))
+    measure('dataclasses, intern_refs', count, lambda text: from_dict(data_class=TimeEntries, data=json.loads(text), interned={}))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
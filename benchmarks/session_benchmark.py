@@ -0,0 +1,67 @@
+# Copyright 2020 Bradbase
+
+"""
+Compares requests/second of the pooled keep-alive session used by `Harvest`
+against a fresh connection per request, using a local stub server.
+
+    python benchmarks/session_benchmark.py [request_count]
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import Harvest
+from harvest.harvestdataclasses import PersonalAccessToken
+from harvest.ratelimit import RateLimiter
+
+COMPANY = json.dumps({"name": "API Examples", "wants_timestamp_timers": False}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(COMPANY)))
+        self.end_headers()
+        self.wfile.write(COMPANY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(label, count, fn):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    elapsed = time.perf_counter() - start
+    print('{0:<24} {1:>8.1f} requests/second'.format(label, count / elapsed))
+
+
+def main(count=500):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    uri = 'http://127.0.0.1:{0}/api/v2'.format(server.server_address[1])
+
+    # the stub server has no rate limit, keep the client throttle out of the measurement
+    rate_limiter = RateLimiter(count * 3, 1)
+    with Harvest(uri, PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), rate_limiter=rate_limiter) as harvest:
+        headers = harvest.headers
+        run('requests.request', count, lambda: requests.request('GET', uri + '/company', headers=headers))
+        run('Harvest.session.request', count, lambda: harvest.session.request('GET', uri + '/company', headers=headers))
+        run('Harvest.company', count, harvest.company)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
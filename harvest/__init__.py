@@ -14,5 +14,6 @@ from .harvest import *
 
 __all__ = [
     '__author__', '__copyright__', '__email__', '__license__',
-    '__maintainer__', '__version__', 'harvest', 'harvestdataclasses', 'detailedreports'
+    '__maintainer__', '__version__', 'harvest', 'harvestdataclasses', 'detailedreports',
+    'asyncharvest', 'ratelimit', 'retry', 'decoder', 'columnar', 'sync', 'cache', 'localreports', 'httpcache'
 ]
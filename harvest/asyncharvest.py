@@ -0,0 +1,513 @@
+# Copyright 2020 Bradbase
+
+import asyncio
+import contextvars
+import copy
+import functools
+import json
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from .harvest import Harvest, HarvestError, PageParser, TIME_ENTRY_PERMISSION_MESSAGE, bulk_error, bulk_result, raise_for_status, list_field, page_records, pagination, time_entry_error
+from .detailedreports import DetailedReports, ordered_pages, remaining_requests
+from .ratelimit import MemoryBackend
+from .harvestdataclasses import *
+
+# raised by a bulk call given the wrong arguments or failing to reach Harvest
+ASYNC_BULK_ERRORS = (TypeError, asyncio.TimeoutError) + ((aiohttp.ClientError,) if aiohttp is not None else ())
+
+# Responses already fetched for the method call running in the current context.
+_replayed_responses = contextvars.ContextVar('replayed_responses', default=None)
+
+
+class _PendingRequest(Exception):
+    """
+    Raised from `_request` when the method being replayed needs a response that has not been fetched yet.
+    """
+
+    def __init__(self, method, path, data, files):
+        super().__init__(method, path)
+        self.method = method
+        self.path = path
+        self.data = data
+        self.files = files
+
+
+class _ReplayMixin(object):
+    """
+    Lets the synchronous `Harvest` methods build urls and decode responses
+    without doing any I/O. `_request` hands back the responses fetched so far
+    in order and raises `_PendingRequest` for the first one still missing.
+    """
+
+    def _request(self, method='GET', path='/', data=None, files=None):
+        responses = _replayed_responses.get()
+        response = next(responses, _PendingRequest) if responses is not None else _PendingRequest
+        if response is _PendingRequest:
+            raise _PendingRequest(method, path, data, files)
+        return response
+
+
+class _ReplayHarvest(_ReplayMixin, Harvest):
+    pass
+
+
+class _ReplayDetailedReports(_ReplayMixin, DetailedReports):
+    pass
+
+
+class AsyncHarvest(object):
+    """
+    asyncio counterpart of `Harvest` built on aiohttp. Every public `Harvest`
+    method is available as a coroutine with the same signature and returns
+    the same dataclasses, eg. `await client.time_entries(page=2)`.
+    """
+
+    _replay_class = _ReplayHarvest
+
+    def __init__(self, uri, auth, limit=100, session=None, rate_limiter=None, reports_rate_limiter=None, retry_policy=None, intern_refs=False, decode='dataclass', cache=None, company_ttl=3600, response_cache=None, archive=None, account_id=None):
+        """
+        :param uri: Base uri of the Harvest API, eg. `https://api.harvestapp.com/api/v2`
+        :type uri: str
+        :param auth: One of `PersonalAccessToken`, `OAuth2_ClientSide_Token` or `OAuth2_ServerSide`
+        :type auth: Auth
+        :param limit: Maximum number of simultaneous connections, defaults to `100`
+        :type limit: int
+        :param session: An `aiohttp.ClientSession` to send requests with, defaults to one owned by the client
+        :type session: aiohttp.ClientSession or None
+        :param rate_limiter: Limiter shared by general requests, see `Harvest`, defaults to Harvest's documented limit
+        :type rate_limiter: RateLimiter or None
+        :param reports_rate_limiter: Limiter shared by reports requests, see `Harvest`, defaults to Harvest's documented limit
+        :type reports_rate_limiter: RateLimiter or None
+        :param retry_policy: Retries for throttled and failed responses, see `Harvest`, defaults to `RetryPolicy()`
+        :type retry_policy: RetryPolicy or None
+        :param intern_refs: Share identical objects nested in records, see `Harvest`, defaults to `False`
+        :type intern_refs: bool
+        :param decode: How responses are returned, `dataclass`, `dict` or `raw`, see `Harvest`, defaults to `dataclass`
+        :type decode: str
+        :param cache: Cache of slowly changing entities, see `Harvest`, defaults to `None`
+        :type cache: ReferenceCache or None
+        :param company_ttl: Seconds the company settings are reused for, see `Harvest`, defaults to `3600`
+        :type company_ttl: float or None
+        :param response_cache: Keeps GET responses and revalidates them with conditional requests, see `Harvest`, defaults to `None`
+        :type response_cache: ResponseCache or None
+        :param archive: Answers GET requests of closed periods without sending them, see `Harvest`, defaults to `None`
+        :type archive: ClosedPeriodCache or None
+        :param account_id: Harvest account requested, see `Harvest`, defaults to `None`
+        :type account_id: str or None
+        """
+        if aiohttp is None and session is None:
+            raise HarvestError('AsyncHarvest requires aiohttp. Install it with "pip install python-harvest_apiv2[asyncio]".')
+
+        self._harvest = self._replay_class(uri, auth, rate_limiter=rate_limiter, reports_rate_limiter=reports_rate_limiter, retry_policy=retry_policy, intern_refs=intern_refs, decode=decode, cache=cache, company_ttl=company_ttl, response_cache=response_cache, archive=archive, account_id=account_id)
+        self._limit = limit
+        # shared with the copies made by `with_decode`
+        self._shared = {'session': session}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+        self._harvest.close()
+
+    @property
+    def session(self):
+        return self._shared['session']
+
+    @session.setter
+    def session(self, session):
+        self._shared['session'] = session
+
+    def with_decode(self, decode, caches=True):
+        """
+        Client returning responses as `decode` which shares this client's
+        session, rate limiters and retry policy, see `Harvest.with_decode`.
+        """
+        harvest = self._harvest.with_decode(decode, caches)
+        if harvest is self._harvest:
+            return self
+
+        client = copy.copy(self)
+        client._harvest = harvest
+        return client
+
+    @property
+    def uri(self):
+        return self._harvest.uri
+
+    @property
+    def headers(self):
+        return self._harvest.headers
+
+    @property
+    def auth(self):
+        return self._harvest.auth
+
+    async def fetch_all(self, resource, *args, concurrency=4, **kwargs):
+        """
+        Coroutine version of `Harvest.fetch_all`, the remaining pages are gathered on the event loop.
+        """
+        list_method = getattr(self._harvest, resource, None)
+        if resource.startswith('_') or not callable(list_method):
+            raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+        data_class = self._harvest._list_request(resource, *args, **kwargs)[1]
+        first_page = await self._call(list_method, *args, **kwargs)
+        first_pagination = pagination(first_page)
+        if first_pagination is None:
+            raise HarvestError('Resource "{0}" is not paginated.'.format(resource))
+
+        records = list(page_records(first_page, data_class))
+        page, total_pages, _ = first_pagination
+
+        if total_pages is None or page >= total_pages:
+            return records
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_page(page):
+            async with semaphore:
+                return await self._call(list_method, *args, **dict(kwargs, page=page))
+
+        pages = await asyncio.gather(*[fetch_page(page) for page in range(page + 1, total_pages + 1)])
+        for page in pages:
+            records.extend(page_records(page, data_class))
+
+        return records
+
+    async def _wants_timestamp_timers(self, wants_timestamp_timers):
+        # the settings are cached outside of `_call`, a replayed method must make the same requests every run
+        if (await self.company_settings()).wants_timestamp_timers == wants_timestamp_timers:
+            return True
+        return (await self.company_settings(refresh=True)).wants_timestamp_timers == wants_timestamp_timers
+
+    async def create_time_entry(self, wants_timestamp_timers, project_id, task_id, spent_date, **kwargs):
+        if not await self._wants_timestamp_timers(wants_timestamp_timers):
+            return ErrorMessage(TIME_ENTRY_PERMISSION_MESSAGE)
+        kwargs.update({'project_id': project_id, 'task_id': task_id, 'spent_date': spent_date})
+        return await self._call(self._harvest._create_time_entry, kwargs)
+
+    async def create_time_entry_via_start_and_end_time(self, project_id, task_id, spent_date, **kwargs):
+        return await self.create_time_entry(True, project_id, task_id, spent_date, **kwargs)
+
+    async def create_time_entry_via_duration(self, project_id, task_id, spent_date, **kwargs):
+        return await self.create_time_entry(False, project_id, task_id, spent_date, **kwargs)
+
+    async def create_time_entries(self, wants_timestamp_timers, time_entries, concurrency=4):
+        """
+        Coroutine version of `Harvest.create_time_entries`, the entries are posted on the event loop.
+        """
+        time_entries = list(time_entries)
+        if not await self._wants_timestamp_timers(wants_timestamp_timers):
+            return [ErrorMessage(TIME_ENTRY_PERMISSION_MESSAGE) for _ in time_entries]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create(time_entry):
+            error = time_entry_error(time_entry)
+            if error is not None:
+                return error
+            async with semaphore:
+                try:
+                    return await self._call(self._harvest._create_time_entry, dict(time_entry))
+                except HarvestError as error:
+                    return ErrorMessage(str(error))
+
+        return await asyncio.gather(*[create(time_entry) for time_entry in time_entries])
+
+    async def bulk(self, operations, concurrency=4):
+        """
+        Coroutine version of `Harvest.bulk`, the calls are gathered on the event loop.
+        """
+        calls = [self._harvest._bulk_method(operation) for operation in operations]
+        if any(not isinstance(call, HarvestError) and call[0].__name__.startswith('create_time_entry') for call in calls):
+            await self.company_settings()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(call):
+            if isinstance(call, HarvestError):
+                return call
+            method, kwargs = call
+            async with semaphore:
+                try:
+                    return bulk_result(await getattr(self, method.__name__)(**kwargs))
+                except HarvestError as error:
+                    return error
+                except ASYNC_BULK_ERRORS as error:
+                    return bulk_error(method, error)
+
+        return await asyncio.gather(*[run(call) for call in calls])
+
+    async def stream_records(self, resource, *args, **kwargs):
+        """
+        Async generator version of `Harvest.stream_records`, with ijson
+        installed each page is parsed as it downloads.
+        """
+        harvest = self._harvest
+        list_method = getattr(harvest, resource, None)
+        if resource.startswith('_') or not callable(list_method):
+            raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+        path, data_class = harvest._list_request(resource, *args, **kwargs)
+        records = list_field(data_class)
+        if records is None:
+            raise HarvestError('Resource "{0}" is not paginated.'.format(resource))
+        field_name, record_class = records
+
+        while path is not None:
+            resp = await self._request('GET', path, stream=True)
+            try:
+                if ijson is None:
+                    page = await resp.json(content_type=None)
+                    for record in page.get(field_name, []):
+                        yield harvest._decode_record(record_class, record)
+                    path = (page.get('links') or {}).get('next')
+                    continue
+
+                parser = PageParser(field_name)
+                async for prefix, event, value in ijson.parse_async(resp.content, use_float=True):
+                    record = parser.feed(prefix, event, value)
+                    if record is not None:
+                        yield harvest._decode_record(record_class, record)
+                path = parser.next_link
+            finally:
+                resp.release()
+
+    async def _iter_records(self, list_method, *args, **kwargs):
+        page_class = self._harvest._list_request(list_method.__name__, *args, **kwargs)[1]
+        page = await self._call(list_method, *args, **kwargs)
+        data_class = type(page)
+
+        while True:
+            for record in page_records(page, page_class):
+                yield record
+
+            next_link = pagination(page)[2]
+            if next_link is None:
+                return
+
+            page = self._harvest._from_dict(data_class=data_class, data=await self._request('GET', next_link))
+
+    async def _call(self, method, *args, **kwargs):
+        """
+        Runs a synchronous `Harvest` method, fetching each request it makes
+        and running it again with the responses so far until it completes.
+        """
+        responses = []
+
+        while True:
+            token = _replayed_responses.set(iter(responses))
+            try:
+                return method(*args, **kwargs)
+            except _PendingRequest as pending:
+                request = pending
+            finally:
+                _replayed_responses.reset(token)
+
+            responses.append(await self._request(request.method, request.path, request.data, request.files))
+
+    async def _account_key(self):
+        """
+        Coroutine version of `Harvest._account_key`, the user of an OAuth2 token is looked up on the event loop.
+        """
+        harvest = self._harvest
+        if harvest.headers.get('Harvest-Account-ID') is None and 'id' not in harvest._token_user:
+            client = self.with_decode('dict', caches=False)
+            harvest._token_user['id'] = (await client._request('GET', '/users/me'))['id']
+        return harvest._account_key()
+
+    async def _run_limiter(self, rate_limiter, function, *args):
+        # backends other than memory, eg. SQLite, block while waiting for their lock
+        if isinstance(rate_limiter.backend, MemoryBackend):
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def _request(self, method='GET', path='/', data=None, files=None, stream=False):
+        """
+        :param stream: Return the successful `aiohttp.ClientResponse` with its body still to be read, the caller releases it, see `Harvest._request`
+        :type stream: bool
+        """
+        harvest = self._harvest
+        url = harvest._url(path)
+        headers = dict(harvest.headers)
+
+        if files is not None:
+            del(headers['Content-Type'])
+            body = aiohttp.FormData()
+            for key, value in (data or {}).items():
+                body.add_field(key, str(value))
+            for key, value in files.items():
+                if isinstance(value, (tuple, list)):
+                    body.add_field(key, value[1], filename=value[0], content_type=value[2] if len(value) > 2 else None)
+                else:
+                    body.add_field(key, value)
+        elif data is not None:
+            body = json.dumps(data)
+        else:
+            body = None
+
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._limit))
+
+        archive_key = None
+        if method == 'GET' and harvest.archive is not None and not stream:
+            archive_key = harvest.archive.closed_key(await self._account_key(), url)
+            if archive_key is not None:
+                archived_body = harvest.archive.get(archive_key)
+                if archived_body is not None:
+                    return harvest._decode_body(archived_body)
+
+        cache_key = None
+        if method == 'GET' and harvest.response_cache is not None and not stream:
+            cache_key = harvest.response_cache.key(await self._account_key(), url)
+            headers.update(harvest.response_cache.request_headers(cache_key))
+
+        attempt = 0
+        while True:
+            rate_limiter = harvest._rate_limiter(url)
+            await asyncio.sleep(await self._run_limiter(rate_limiter, rate_limiter.reserve))
+
+            if harvest._token_expired():
+                await asyncio.get_running_loop().run_in_executor(None, harvest._refresh_token)
+
+            resp = await self.session.request(method, url, headers=headers, data=body)
+            try:
+                await self._run_limiter(rate_limiter, rate_limiter.update_from_headers, resp.headers)
+
+                if resp.status == 304 and cache_key is not None:
+                    cached_body = harvest.response_cache.not_modified(cache_key)
+                    if cached_body is not None:
+                        return harvest._decode_body(cached_body)
+                    headers.pop('If-None-Match', None)
+                    headers.pop('If-Modified-Since', None)
+                    continue
+
+                if resp.status in [200, 201]:
+                    if stream:
+                        return resp
+
+                    if cache_key is not None:
+                        harvest.response_cache.update(cache_key, resp.headers, await resp.read())
+                    if archive_key is not None:
+                        harvest.archive.set(archive_key, await resp.read())
+
+                    if 'DELETE' in method:
+                        return None
+
+                    if method == 'GET' and harvest.decode == 'raw':
+                        return await resp.read()
+
+                    try:
+                        return await resp.json(content_type=None)
+                    except ValueError:
+                        return None
+
+                delay = None
+                if files is None:
+                    delay = harvest.retry_policy.retry_delay(method, resp.status, resp.headers.get('Retry-After'), attempt)
+                if delay is None:
+                    raise_for_status(resp.status, str(resp.url), await resp.text())
+            finally:
+                if not (stream and resp.status in [200, 201]):
+                    resp.release()
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class AsyncDetailedReports(AsyncHarvest):
+    """
+    asyncio counterpart of `DetailedReports`.
+    """
+
+    _replay_class = _ReplayDetailedReports
+
+    def __init__(self, uri, auth, limit=100, session=None, rate_limiter=None, reports_rate_limiter=None, retry_policy=None, intern_refs=False, decode='dataclass', cache=None, company_ttl=3600, response_cache=None, archive=None, account_id=None):
+        super().__init__(uri, auth, limit=limit, session=session, rate_limiter=rate_limiter, reports_rate_limiter=reports_rate_limiter, retry_policy=retry_policy, intern_refs=intern_refs, decode=decode, cache=cache, company_ttl=company_ttl, response_cache=response_cache, archive=archive, account_id=account_id)
+
+    def timeframe(self, timeframe, from_date=None, to_date=None):
+        return self._harvest.timeframe(timeframe, from_date, to_date)
+
+    # team is user
+    async def detailed_time(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], include_archived_items=False, group_by='Date', activeProject_only=False, concurrency=4):
+        """
+        Coroutine version of `DetailedReports.detailed_time`, the planning and filtering are shared with it.
+        """
+        reports = self._harvest
+        harvest = self.with_decode('dataclass')
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(config):
+            async with semaphore:
+                return await harvest.time_entries(**config)
+
+        filters = reports._time_entry_filters(time_frame, clients, projects, team)
+        plan = None
+        if len(filters) == 1:
+            queries, first_pages = filters, [await fetch(filters[0])]
+        else:
+            scan_query = reports.timeframe(time_frame)
+            scan_page = await fetch(scan_query)
+            filter_pages = None
+            if reports._wants_filter_pages(filters, scan_page):
+                filter_pages = await asyncio.gather(*[fetch(config) for config in filters])
+            plan, queries, first_pages = reports._chosen_queries(filters, scan_query, scan_page, filter_pages)
+
+        requests = remaining_requests(first_pages)
+        pages = ordered_pages(first_pages, requests, await asyncio.gather(*[fetch(dict(queries[index], page=page)) for index, page in requests]))
+        time_entries = reports._report_time_entries(plan, filters, pages)
+
+        user_ids = {time_entry.user.id for time_entry in time_entries}
+        users = reports._cached_users(user_ids)
+        if reports._lists_users(user_ids, users):
+            async for user in harvest.iter_users():
+                reports._listed_user(harvest._harvest, user, user_ids, users)
+
+        missing_ids = list(user_ids - users.keys())
+        users.update(zip(missing_ids, await asyncio.gather(*[harvest.get_user(user_id) for user_id in missing_ids])))
+
+        return reports._detailed_time_report(time_entries, users)
+
+
+def _mirror(name):
+    method = getattr(Harvest, name)
+
+    @functools.wraps(method)
+    async def mirrored(self, *args, **kwargs):
+        return await self._call(getattr(self._harvest, name), *args, **kwargs)
+
+    return mirrored
+
+
+def _mirror_iterator(name):
+    method = getattr(Harvest, name)
+    list_method_name = name[len('iter_'):]
+
+    @functools.wraps(method)
+    def mirrored(self, *args, **kwargs):
+        return self._iter_records(getattr(self._harvest, list_method_name), *args, **kwargs)
+
+    return mirrored
+
+
+for _name, _member in list(vars(Harvest).items()):
+    if _name.startswith('_') or not callable(_member) or _name in vars(AsyncHarvest):
+        continue
+    if _name.startswith('iter_'):
+        setattr(AsyncHarvest, _name, _mirror_iterator(_name))
+    else:
+        setattr(AsyncHarvest, _name, _mirror(_name))
@@ -0,0 +1,90 @@
+# Copyright 2020 Bradbase
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class ReferenceCache(object):
+    """
+    Size bounded least recently used cache whose entries expire `ttl`
+    seconds after they were stored. `Harvest` keeps slowly changing
+    entities in it, eg. users, clients and the company, and drops them when
+    they are updated or deleted through the same cache. One cache can be
+    shared by several clients of the same account.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        """
+        :param maxsize: Number of entries kept before the least recently used is evicted, defaults to `1024`
+        :type maxsize: int
+        :param ttl: Seconds an entry is served for, `None` to keep entries until evicted, defaults to `300`
+        :type ttl: float or None
+        :param clock: Function returning the current time in seconds, defaults to `time.monotonic`
+        :type clock: callable
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        :return: The value stored for `key`, `default` when missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (None if self.ttl is None else self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def items(self):
+        """
+        :return: `(key, value)` of every entry not yet expired, least recently used first, without counting hits.
+        :rtype: list
+        """
+        with self._lock:
+            now = self.clock()
+            return [(key, value) for key, (expires_at, value) in self._entries.items() if expires_at is None or expires_at > now]
+
+    def invalidate(self, key):
+        """
+        :return: Whether an entry was stored for `key`.
+        :rtype: bool
+        """
+        with self._lock:
+            return self._entries.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: Counts of `hits`, `misses`, `evictions` and the current `size`.
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._entries)}
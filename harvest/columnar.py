@@ -0,0 +1,220 @@
+# Copyright 2020 Bradbase
+
+"""
+Columnar export of paginated resources. Pages are requested as plain dicts
+and their records appended straight into per-column buffers, nested objects
+flattened into columns like `user.id` and `project.name`, so no dataclass
+is built per record. Lists of nested objects, eg. the `line_items` of
+invoices, are kept as a JSON string column. With pyarrow installed the
+buffers become Arrow record batches and `export` writes Parquet or Feather
+files one page at a time.
+"""
+
+import json
+
+from dataclasses import asdict, fields, is_dataclass
+from typing import Union, get_type_hints
+
+from .harvest import HarvestError, list_field, page_records
+from .harvestdataclasses import BasePage
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ('parquet', 'feather')
+
+
+def record_class(page_class):
+    """
+    Dataclass of the records carried by a `BasePage` subclass, eg. `TimeEntry` for `TimeEntries`.
+    """
+    return list_field(page_class)[1]
+
+
+def record_columns(data_class, prefix=''):
+    """
+    :param data_class: Dataclass of the records, eg. `TimeEntry`
+    :type data_class: type
+    :return: `(name, type)` of every column of the flattened records, nested dataclasses give columns like `user.id`.
+    :rtype: list
+    """
+    hints = get_type_hints(data_class)
+    columns = []
+    for data_field in fields(data_class):
+        name = prefix + data_field.name
+        field_type = _unwrap_optional(hints[data_field.name])
+        if is_dataclass(field_type):
+            columns.extend(record_columns(field_type, name + '.'))
+        else:
+            columns.append((name, field_type))
+    return columns
+
+
+def _unwrap_optional(field_type):
+    if getattr(field_type, '__origin__', None) is Union:
+        args = [arg for arg in field_type.__args__ if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return field_type
+
+
+def _converter(column_type):
+    # the API doesn't always send the type the dataclasses declare, eg. ids as ints for `str` fields
+    if column_type in (int, float, str, bool):
+        return column_type
+    if getattr(column_type, '__origin__', None) is list and column_type.__args__[0] in (int, float, str, bool):
+        item_type = column_type.__args__[0]
+        return lambda value: [item_type(item) for item in value]
+    if _is_object_list(column_type):
+        return lambda value: json.dumps([asdict(item) if is_dataclass(item) else item for item in value], default=str)
+    return None
+
+
+def _is_object_list(column_type):
+    return getattr(column_type, '__origin__', None) is list and is_dataclass(column_type.__args__[0])
+
+
+def _arrow_type(column_type):
+    arrow_types = {int: pyarrow.int64(), float: pyarrow.float64(), str: pyarrow.string(), bool: pyarrow.bool_()}
+    if _is_object_list(column_type):
+        return pyarrow.string()
+    if getattr(column_type, '__origin__', None) is list:
+        return pyarrow.list_(arrow_types.get(column_type.__args__[0], pyarrow.string()))
+    return arrow_types.get(column_type, pyarrow.string())
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise HarvestError('Arrow export requires pyarrow. Install it with "pip install python-harvest_apiv2[arrow]".')
+
+
+class ColumnBuffer(object):
+    """
+    Accumulates records of one dataclass as columns. Records may be the
+    dicts of `decode='dict'` responses or the dataclasses themselves.
+    """
+
+    def __init__(self, data_class):
+        """
+        :param data_class: Dataclass of the records, eg. `TimeEntry`
+        :type data_class: type
+        """
+        self.data_class = data_class
+        self.columns = record_columns(data_class)
+        self.data = {name: [] for name, _ in self.columns}
+        self._paths = [(self.data[name], tuple(name.split('.')), _converter(column_type)) for name, column_type in self.columns]
+
+    def __len__(self):
+        return len(self.data[self.columns[0][0]]) if self.columns else 0
+
+    def append(self, record):
+        for values, path, convert in self._paths:
+            value = record
+            for key in path:
+                if value is None:
+                    break
+                value = value.get(key) if isinstance(value, dict) else getattr(value, key, None)
+            if value is not None and convert is not None:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError):
+                    value = None
+            values.append(value)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def clear(self):
+        for values in self.data.values():
+            values.clear()
+
+    def schema(self):
+        """
+        :return: Arrow schema of the columns, every column nullable.
+        :rtype: pyarrow.Schema
+        """
+        _require_pyarrow()
+        return pyarrow.schema([(name, _arrow_type(column_type)) for name, column_type in self.columns])
+
+    def to_record_batch(self):
+        """
+        :return: The buffered records as an Arrow record batch.
+        :rtype: pyarrow.RecordBatch
+        """
+        _require_pyarrow()
+        schema = self.schema()
+        return pyarrow.RecordBatch.from_arrays([pyarrow.array(self.data[name], type=schema.field(name).type) for name, _ in self.columns], schema=schema)
+
+
+def iter_column_buffers(harvest, resource, *args, **kwargs):
+    """
+    Lazily yields a `ColumnBuffer` holding the records of each page of a list
+    endpoint. The same buffer is cleared and refilled for every page.
+
+    :param harvest: Client to request the pages with
+    :type harvest: Harvest
+    :param resource: Name of the list method, eg. `time_entries` or `expenses`
+    :type resource: str
+    :param args: Positional arguments of the list method
+    :param kwargs: Filters handed to the list method
+    """
+    dict_harvest = harvest.with_decode('dict')
+    list_method = getattr(dict_harvest, resource, None)
+    if resource.startswith('_') or not callable(list_method):
+        raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+    page_class = dict_harvest._list_request(resource, *args, **kwargs)[1]
+    if not issubclass(page_class, BasePage):
+        raise HarvestError('Resource "{0}" is not paginated.'.format(resource))
+
+    buffer = ColumnBuffer(record_class(page_class))
+    for page in dict_harvest._iter_pages(list_method, *args, **kwargs):
+        buffer.clear()
+        buffer.extend(page_records(page, page_class))
+        yield buffer
+
+
+def export(harvest, resource, path, *args, format='parquet', **kwargs):
+    """
+    Writes every record of a list endpoint to a Parquet or Feather file,
+    appending one record batch per page so only a page is held in memory.
+
+    :param harvest: Client to request the pages with
+    :type harvest: Harvest
+    :param resource: Name of the list method, eg. `time_entries` or `expenses`
+    :type resource: str
+    :param path: File to write
+    :type path: str
+    :param args: Positional arguments of the list method
+    :param format: `parquet` or `feather`, defaults to `parquet`
+    :type format: str
+    :param kwargs: Filters handed to the list method, eg. `from_date`
+    :return: Number of records written.
+    :rtype: int
+    """
+    _require_pyarrow()
+    if format not in FORMATS:
+        raise HarvestError('Unknown format "{0}", expected one of {1}.'.format(format, ', '.join(FORMATS)))
+
+    writer = None
+    count = 0
+    try:
+        for buffer in iter_column_buffers(harvest, resource, *args, **kwargs):
+            if writer is None:
+                if format == 'parquet':
+                    writer = pyarrow.parquet.ParquetWriter(path, buffer.schema())
+                else:
+                    writer = pyarrow.ipc.new_file(path, buffer.schema())
+            if len(buffer):
+                writer.write_batch(buffer.to_record_batch())
+                count += len(buffer)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return count
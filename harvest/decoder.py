@@ -0,0 +1,195 @@
+# Copyright 2020 Bradbase
+
+"""
+Drop in replacement for `dacite.from_dict` over the classes in
+`harvestdataclasses`. The first time a dataclass is decoded a constructor
+specialised to its fields is generated and cached, so decoding a page of
+records no longer reflects over type hints for every record. Values are
+not type checked, otherwise the objects built are the same as dacite's.
+
+Given an `interned` table, nested objects decoded from identical flat data,
+eg. the `client` of every time entry of a client, are built once and shared.
+`InternTable` bounds the number of objects kept.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import MISSING, fields, is_dataclass
+from typing import Union, get_type_hints
+
+import dacite
+from dacite import MissingValueError
+
+_decoders = {}
+# stand-ins for dataclasses being compiled, kept out of `_decoders` which is read without the lock
+_compiling = {}
+_decoders_lock = threading.RLock()
+
+
+class InternTable(object):
+    """
+    Size bounded table of shared nested objects, the least recently used is
+    dropped once `maxsize` are kept. Can be passed as `interned` in place of
+    a dict, which grows with every distinct object decoded.
+    """
+
+    def __init__(self, maxsize=4096):
+        """
+        :param maxsize: Number of objects kept before the least recently used is dropped, defaults to `4096`
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            instance = self._entries.get(key, default)
+            if instance is not default:
+                self._entries.move_to_end(key)
+            return instance
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            instance = self._entries.setdefault(key, default)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return instance
+
+
+def from_dict(data_class, data, config=None, interned=None):
+    """
+    :param data_class: Dataclass to build
+    :type data_class: type
+    :param data: Decoded JSON of the object
+    :type data: dict
+    :param config: A `dacite.Config`, when given decoding falls back to dacite
+    :type config: dacite.Config or None
+    :param interned: Nested objects shared between calls, keep one table for the records of a client, defaults to `None`
+    :type interned: InternTable or dict or None
+    :return: An instance of `data_class`.
+    """
+    if config is not None:
+        return dacite.from_dict(data_class=data_class, data=data, config=config)
+
+    decoder = _decoders.get(data_class)
+    if decoder is None:
+        decoder = compile_decoder(data_class)
+    return decoder(data, interned)
+
+
+def compile_decoder(data_class):
+    """
+    Generates, caches and returns the function decoding a dict into `data_class`.
+    """
+    with _decoders_lock:
+        decoder = _decoders.get(data_class, _compiling.get(data_class))
+        if decoder is not None:
+            return decoder
+
+        # stands in until compiled, for dataclasses which refer to themselves
+        _compiling[data_class] = lambda data, interned=None: _decoders[data_class](data, interned)
+        try:
+            decoder = _generate(data_class)
+        finally:
+            del _compiling[data_class]
+        _decoders[data_class] = decoder
+        return decoder
+
+
+def _generate(data_class):
+    namespace = {'data_class': data_class, 'MISSING': MISSING, 'MissingValueError': MissingValueError, 'intern': _intern}
+    hints = get_type_hints(data_class)
+    lines = ['def decode(data, interned=None):', '    init = {}']
+    post_init = []
+
+    for index, data_field in enumerate(fields(data_class)):
+        field_type = hints[data_field.name]
+        target = "init['{0}']".format(data_field.name) if data_field.init else 'post_init_{0}'.format(index)
+        value_code = _value_code(field_type, 'value', namespace, 0)
+
+        lines.append("    value = data.get('{0}', MISSING)".format(data_field.name))
+        lines.append('    if value is not MISSING:')
+        lines.append('        {0} = {1}'.format(target, value_code))
+
+        if data_field.default is not MISSING:
+            namespace['default_{0}'.format(index)] = data_field.default
+            lines.append('    else:')
+            lines.append('        {0} = default_{1}'.format(target, index))
+        elif data_field.default_factory is not MISSING:
+            namespace['default_factory_{0}'.format(index)] = data_field.default_factory
+            lines.append('    else:')
+            lines.append('        {0} = default_factory_{1}()'.format(target, index))
+        elif _optional_type(field_type) is not None:
+            lines.append('    else:')
+            lines.append('        {0} = None'.format(target))
+        elif data_field.init:
+            lines.append('    else:')
+            lines.append("        raise MissingValueError('{0}')".format(data_field.name))
+        else:
+            lines.append('    else:')
+            lines.append('        post_init_{0} = MISSING'.format(index))
+
+        if not data_field.init:
+            post_init.append((data_field.name, index))
+
+    lines.append('    instance = data_class(**init)')
+    for name, index in post_init:
+        lines.append('    if post_init_{0} is not MISSING:'.format(index))
+        lines.append('        instance.{0} = post_init_{1}'.format(name, index))
+    lines.append('    return instance')
+
+    exec('\n'.join(lines), namespace)
+    return namespace['decode']
+
+
+def _intern(decode, data, interned):
+    try:
+        key = (decode, tuple(data.items()))
+        instance = interned.get(key)
+    except TypeError:
+        # nested lists or objects, not worth sharing
+        return decode(data, interned)
+
+    if instance is None:
+        instance = interned.setdefault(key, decode(data, interned))
+    return instance
+
+
+def _optional_type(field_type):
+    # Optional[X] is Union[X, None]
+    if getattr(field_type, '__origin__', None) is Union:
+        args = field_type.__args__
+        if len(args) == 2 and type(None) in args:
+            return args[0] if args[1] is type(None) else args[1]
+    return None
+
+
+def _value_code(field_type, variable, namespace, depth):
+    """
+    Python expression building the value of `field_type` from `variable`, mirroring dacite's `_build_value`.
+    """
+    inner_type = _optional_type(field_type)
+    if inner_type is not None:
+        code = _value_code(inner_type, variable, namespace, depth)
+        if code == variable:
+            return variable
+        return '(None if {0} is None else {1})'.format(variable, code)
+
+    if is_dataclass(field_type):
+        name = 'decode_{0}'.format(len(namespace))
+        namespace[name] = compile_decoder(field_type)
+        return '(({0}({1}) if interned is None else intern({0}, {1}, interned)) if isinstance({1}, dict) else {1})'.format(name, variable)
+
+    if getattr(field_type, '__origin__', None) is list and getattr(field_type, '__args__', None):
+        item = 'item_{0}'.format(depth)
+        code = _value_code(field_type.__args__[0], item, namespace, depth + 1)
+        if code == item:
+            return variable
+        return '[{0} for {1} in {2}]'.format(code, item, variable)
+
+    return variable
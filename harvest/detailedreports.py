@@ -1,21 +1,148 @@
 
 # Copyright 2020 Bradbase
 
+import csv
 import itertools
+import json
+import logging
+import warnings
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from datetime import datetime, timedelta, date
 from calendar import monthrange
-from harvest import Harvest
+from types import MappingProxyType
+from typing import List, Optional
+from harvest import Harvest, HarvestError
+from .cache import ReferenceCache
 from .harvestdataclasses import *
 
+logger = logging.getLogger(__name__)
+
+DETAILED_TIME_FORMATS = ('csv', 'jsonl')
+
+# time entry filters and the reference each one matches
+TIME_ENTRY_FILTERS = (('client_id', 'client'), ('project_id', 'project'), ('user_id', 'user'))
+
+
+@dataclass
+class QueryPlan:
+    """
+    How `detailed_time` requests the time entries, either each filter
+    combination on its own (`filters`) or one scan of the time frame
+    filtered locally (`scan`). Request counts are those still needed after
+    the first pages the estimate was made from.
+    """
+    strategy: str
+    queries: List[dict]
+    requests: int
+    scan_requests: int
+    filter_requests: Optional[int] = None
+
+
+def remaining_pages(page):
+    return max(page.total_pages, 1) - 1
+
+
+def plan_time_entries(filters, scan_query, scan_page, filter_pages=None):
+    """
+    Picks the cheaper way of requesting the time entries of `filters`.
+    `filter_pages` are the first pages of `filters`, left `None` when the
+    scan needs no more requests than there are filters, as requesting their
+    first pages alone would already cost as much.
+
+    :rtype: QueryPlan
+    """
+    scan_requests = remaining_pages(scan_page)
+    if filter_pages is None:
+        plan = QueryPlan('scan', [scan_query], scan_requests, scan_requests)
+    else:
+        filter_requests = sum(remaining_pages(page) for page in filter_pages)
+        if filter_requests <= scan_requests:
+            plan = QueryPlan('filters', filters, filter_requests, scan_requests, filter_requests)
+        else:
+            plan = QueryPlan('scan', [scan_query], scan_requests, scan_requests, filter_requests)
+
+    logger.info('detailed_time plan: %s of %d filter combinations, %d more requests (scan %d, filters %s)',
+        plan.strategy, len(filters), plan.requests, plan.scan_requests, 'not probed' if plan.filter_requests is None else plan.filter_requests)
+    return plan
+
+
+def remaining_requests(first_pages):
+    """
+    `(query index, page)` of every page after the first of each query.
+    """
+    return [(index, page) for index, first_page in enumerate(first_pages) for page in range(2, first_page.total_pages + 1)]
+
+
+def ordered_pages(first_pages, requests, pages):
+    """
+    Every page of the queries, in query then page order.
+    """
+    ordered = [((index, 1), first_page) for index, first_page in enumerate(first_pages)] + list(zip(requests, pages))
+    return [page for _, page in sorted(ordered, key=lambda item: item[0])]
+
+
+def filter_key(config):
+    """
+    `config` with its ids as strings, so `5` and `'5'` are the same filter.
+    """
+    return {name: str(value) for name, value in config.items()}
+
+
+def matches_filters(time_entry, filters):
+    return any(all(str(getattr(time_entry, reference).id) == str(config[name]) for name, reference in TIME_ENTRY_FILTERS if name in config) for config in filters)
+
+
+def detailed_time_row(detailed_time_entry):
+    """
+    :return: The fields of a `DetailedTimeEntry` as a dict of plain values, the external reference as its permalink.
+    :rtype: dict
+    """
+    row = {detailed_field.name: getattr(detailed_time_entry, detailed_field.name) for detailed_field in fields(DetailedTimeEntry)}
+    external_reference = row['external_reference_url']
+    if external_reference is not None and not isinstance(external_reference, str):
+        row['external_reference_url'] = external_reference.permalink
+    return row
+
+
 class DetailedReports(Harvest):
 
-    def __init__(self, uri, auth):
-        super().__init__(uri, auth)
-        self.client_cache = {}
-        self.project_cache = {}
-        self.task_cache = {}
-        self.user_cache = {}
+    # above this many users missing from the cache the user directory is listed instead of getting each
+    USER_PREFETCH_THRESHOLD = 10
+
+    def __init__(self, uri, auth, cache=None, **kwargs):
+        """
+        :param cache: Cache of the users and other entities looked up for the reports, defaults to a `ReferenceCache()` of this client
+        :type cache: ReferenceCache or None
+        """
+        super().__init__(uri, auth, cache=cache if cache is not None else ReferenceCache(), **kwargs)
+
+    def _cached_entities(self, kind):
+        warnings.warn('{0}_cache is deprecated and read only, the entities are kept in cache.'.format(kind), DeprecationWarning, stacklevel=3)
+        entities = {}
+        if self.cache is not None:
+            for (cached_kind, key, decode), value in self.cache.items():
+                if cached_kind == kind and decode == 'dataclass':
+                    entities[int(key) if key.isdigit() else key] = value
+        return MappingProxyType(entities)
+
+    # read only views of `cache` standing in for the dicts the reports used to keep
+    @property
+    def client_cache(self):
+        return self._cached_entities('client')
+
+    @property
+    def project_cache(self):
+        return self._cached_entities('project')
+
+    @property
+    def task_cache(self):
+        return self._cached_entities('task')
+
+    @property
+    def user_cache(self):
+        return self._cached_entities('user')
 
     def timeframe(self, timeframe, from_date=None, to_date=None):
         quarters = [None,
@@ -123,64 +250,222 @@ class DetailedReports(Harvest):
         return {'from_date': start_date, 'to_date': end_date}
 
 
-    # team is user
-    def detailed_time(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], include_archived_items=False, group_by='Date', activeProject_only=False):
-        arg_configs = []
-        time_entry_results = DetailedTimeReport([])
-
-        for element in itertools.product(clients, projects, team):
-            kwargs = {}
-
-            if element[0] !=None:
-                kwargs['client_id'] = element[0]
-
-            if element[1] !=None:
-                kwargs['project_id'] = element[1]
-
-            if element[2] !=None:
-                kwargs['user_id'] = element[2]
-
-            kwargs = dict(self.timeframe(time_frame), **kwargs)
-
-            arg_configs.append(kwargs)
+    def _cached_users(self, user_ids):
+        users = {}
+        for user_id in user_ids:
+            user = self.cache.get(('user', str(user_id), 'dataclass'))
+            if user is not None:
+                users[user_id] = user
+        return users
+
+    def _prefetch_users(self, harvest, user_ids):
+        """
+        Users in `user_ids` from the cache, or from the paginated user
+        directory when more than `USER_PREFETCH_THRESHOLD` of them aren't
+        cached. Users missing from the result are left to `get_user`.
+        """
+        users = self._cached_users(user_ids)
+
+        if self._lists_users(user_ids, users):
+            for user in harvest.iter_users():
+                self._listed_user(harvest, user, user_ids, users)
+
+        return users
+
+    def _lists_users(self, user_ids, users):
+        """
+        Whether enough of `user_ids` are missing from `users` to list the user directory.
+        """
+        return len(user_ids) - len(users) > self.USER_PREFETCH_THRESHOLD
+
+    @staticmethod
+    def _listed_user(harvest, user, user_ids, users):
+        harvest._remember('user', user.id, user)
+        if user.id in user_ids:
+            users[user.id] = user
+
+    @staticmethod
+    def _detailed_time_entry(time_entry, user):
+        hours = time_entry.hours
+        billable_amount = 0.0
+        cost_amount = 0.0
+        billable_rate = time_entry.billable_rate
+        cost_rate = time_entry.cost_rate
+
+        if hours is not None:
+            if billable_rate is not None:
+                billable_amount = billable_rate * hours
+            if cost_rate is not None:
+                cost_amount = cost_rate * hours
+
+        return DetailedTimeEntry(date=time_entry.spent_date, client=time_entry.client.name, project=time_entry.project.name, project_code=time_entry.project.code, task=time_entry.task.name, notes=time_entry.notes, hours=hours, billable=str(time_entry.billable), invoiced='', approved='', first_name=user.first_name, last_name=user.last_name, roles=user.roles, employee='Yes', billable_rate=billable_rate, billable_amount=billable_amount, cost_rate=cost_rate, cost_amount=cost_amount, currency=time_entry.client.currency, external_reference_url=time_entry.external_reference)
+
+    def _time_entry_filters(self, time_frame, clients, projects, team):
+        """
+        Filters of every `clients` x `projects` x `team` combination for
+        `time_entries`. Repeated combinations are dropped, as are those
+        narrowing another combination, eg. a project of a client whose
+        time entries are all requested anyway.
+        """
+        combinations = []
+        keys = []
+        for client_id, project_id, user_id in itertools.product(clients, projects, team):
+            combination = {name: value for name, value in (('client_id', client_id), ('project_id', project_id), ('user_id', user_id)) if value is not None}
+            key = filter_key(combination)
+            if key not in keys:
+                combinations.append(combination)
+                keys.append(key)
+
+        if combinations == []:
+            return [{}]
+
+        timeframe = self.timeframe(time_frame)
+        return [dict(timeframe, **combination) for combination, key in zip(combinations, keys)
+            if not any(other != key and other.items() <= key.items() for other in keys)]
+
+    @staticmethod
+    def _merge_time_entries(results):
+        """
+        Time entries of every filter's results in order, each id only once.
+        """
+        time_entries = {}
+        for result in results:
+            for time_entry in result:
+                time_entries.setdefault(time_entry.id, time_entry)
+        return list(time_entries.values())
+
+    def _plan_queries(self, harvest, time_frame, filters, executor):
+        """
+        :return: The `QueryPlan`, `None` for a single filter combination, the queries to request and their first pages.
+        :rtype: tuple
+        """
+        if len(filters) == 1:
+            return None, filters, [harvest.time_entries(**filters[0])]
+
+        scan_query = self.timeframe(time_frame)
+        scan_page = harvest.time_entries(**scan_query)
+        filter_pages = None
+        if self._wants_filter_pages(filters, scan_page):
+            filter_pages = list(executor.map(lambda config: harvest.time_entries(**config), filters))
+        return self._chosen_queries(filters, scan_query, scan_page, filter_pages)
+
+    @staticmethod
+    def _wants_filter_pages(filters, scan_page):
+        """
+        Whether the first page of every filter is requested for the estimate, see `plan_time_entries`.
+        """
+        return remaining_pages(scan_page) > len(filters)
+
+    @staticmethod
+    def _chosen_queries(filters, scan_query, scan_page, filter_pages):
+        """
+        :return: The `QueryPlan`, the queries to request and their first pages.
+        :rtype: tuple
+        """
+        plan = plan_time_entries(filters, scan_query, scan_page, filter_pages)
+        return plan, plan.queries, [scan_page] if plan.strategy == 'scan' else filter_pages
+
+    @classmethod
+    def _report_time_entries(cls, plan, filters, pages):
+        """
+        Time entries of every page, each once, only those matching `filters` when the time frame was scanned.
+        """
+        time_entries = cls._merge_time_entries(page.time_entries for page in pages)
+        if plan is not None and plan.strategy == 'scan':
+            time_entries = [time_entry for time_entry in time_entries if matches_filters(time_entry, filters)]
+        return time_entries
+
+    @classmethod
+    def _detailed_time_report(cls, time_entries, users):
+        return DetailedTimeReport([cls._detailed_time_entry(time_entry, users[time_entry.user.id]) for time_entry in time_entries])
+
+    def _time_entry_users(self, harvest, time_entries):
+        users = self._prefetch_users(harvest, {time_entry.user.id for time_entry in time_entries})
+        for time_entry in time_entries:
+            if time_entry.user.id not in users:
+                users[time_entry.user.id] = harvest.get_user(time_entry.user.id)
+        return users
 
-        tmp_time_entry_results = []
-        if arg_configs == []:
-            time_entries = self.time_entries()
-            tmp_time_entry_results.extend(time_entries.time_entries)
-            if time_entries.total_pages > 1:
-                for page in range(2, time_entries.total_pages + 1):
-                    time_entries = self.time_entries(page=page)
-                    tmp_time_entry_results.extend(time_entries.time_entries)
-        else:
-            for config in arg_configs:
-                time_entries = self.time_entries(**kwargs)
-                tmp_time_entry_results.extend(time_entries.time_entries)
-                if time_entries.total_pages > 1:
-                    for page in range(2, time_entries.total_pages + 1):
-                        time_entries = self.time_entries(page=page, **kwargs)
-                        tmp_time_entry_results.extend(time_entries.time_entries)
-
-        for time_entry in tmp_time_entry_results:
-            user = None
-            if time_entry.user.id not in self.user_cache.keys():
-                user = self.get_user(time_entry.user.id)
-                self.user_cache[time_entry.user.id] = user
-            else:
-                user = self.user_cache[time_entry.user.id]
-
-            hours = time_entry.hours
-            billable_amount = 0.0
-            cost_amount = 0.0
-            billable_rate = time_entry.billable_rate
-            cost_rate = time_entry.cost_rate
-
-            if hours is not None:
-                if billable_rate is not None:
-                    billable_amount = billable_rate * hours
-                if cost_rate is not None:
-                    cost_amount = cost_rate * hours
-
-            time_entry_results.detailed_time_entries.append( DetailedTimeEntry(date=time_entry.spent_date, client=time_entry.client.name, project=time_entry.project.name, project_code=time_entry.project.code, task=time_entry.task.name, notes=time_entry.notes, hours=hours, billable=str(time_entry.billable), invoiced='', approved='', first_name=user.first_name, last_name=user.last_name, roles=user.roles, employee='Yes', billable_rate=billable_rate, billable_amount=billable_amount, cost_rate=cost_rate, cost_amount=cost_amount, currency=time_entry.client.currency, external_reference_url=time_entry.external_reference) )
+    # team is user
+    def detailed_time(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], include_archived_items=False, group_by='Date', activeProject_only=False, concurrency=4):
+        """
+        Requests every filter combination on its own or, when the estimate
+        from the first pages says it takes fewer requests, scans the whole
+        time frame and keeps the matching time entries, see `QueryPlan`.
+
+        :param concurrency: Maximum number of requests in flight at once, defaults to `4`
+        :type concurrency: int
+        """
+        filters = self._time_entry_filters(time_frame, clients, projects, team)
+
+        harvest = self.with_decode('dataclass')
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            plan, queries, first_pages = self._plan_queries(harvest, time_frame, filters, executor)
+            requests = remaining_requests(first_pages)
+            pages = ordered_pages(first_pages, requests, executor.map(lambda request: harvest.time_entries(**dict(queries[request[0]], page=request[1])), requests))
+
+        time_entries = self._report_time_entries(plan, filters, pages)
+        users = self._time_entry_users(harvest, time_entries)
+        return self._detailed_time_report(time_entries, users)
+
+    def iter_detailed_time(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], include_archived_items=False, group_by='Date', activeProject_only=False, concurrency=4):
+        """
+        Lazily yields the `DetailedTimeEntry` rows of `detailed_time`, a page
+        of time entries at a time, so only the ids of the entries already
+        yielded are kept. Pages after the first of each query are requested
+        one by one as the rows are consumed.
+
+        :param concurrency: Maximum number of first pages requested at once while planning, defaults to `4`
+        :type concurrency: int
+        """
+        filters = self._time_entry_filters(time_frame, clients, projects, team)
+
+        harvest = self.with_decode('dataclass')
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            plan, queries, first_pages = self._plan_queries(harvest, time_frame, filters, executor)
+        scan = plan is not None and plan.strategy == 'scan'
+
+        seen_ids = set()
+        for index, config in enumerate(queries):
+            first_page, first_pages[index] = first_pages[index], None
+            for page_number in range(1, max(first_page.total_pages, 1) + 1):
+                page = first_page if page_number == 1 else harvest.time_entries(**dict(config, page=page_number))
+                time_entries = [time_entry for time_entry in page.time_entries
+                    if time_entry.id not in seen_ids and (not scan or matches_filters(time_entry, filters))]
+                seen_ids.update(time_entry.id for time_entry in time_entries)
+
+                users = self._time_entry_users(harvest, time_entries)
+                for time_entry in time_entries:
+                    yield self._detailed_time_entry(time_entry, users[time_entry.user.id])
+
+    def write_detailed_time(self, path, format='csv', **kwargs):
+        """
+        Writes the rows of `iter_detailed_time` to a CSV or JSON Lines file as
+        they arrive.
+
+        :param path: File to write
+        :type path: str
+        :param format: `csv` or `jsonl`, defaults to `csv`
+        :type format: str
+        :param kwargs: Arguments of `iter_detailed_time`, eg. `time_frame` or `team`
+        :return: Number of rows written.
+        :rtype: int
+        """
+        if format not in DETAILED_TIME_FORMATS:
+            raise HarvestError('Unknown format "{0}", expected one of {1}.'.format(format, ', '.join(DETAILED_TIME_FORMATS)))
+
+        count = 0
+        # untranslated newlines, CSV rows end in \r\n and JSON Lines in \n on every platform
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            if format == 'csv':
+                writer = csv.DictWriter(output, fieldnames=[detailed_field.name for detailed_field in fields(DetailedTimeEntry)])
+                writer.writeheader()
+            for detailed_time_entry in self.iter_detailed_time(**kwargs):
+                row = detailed_time_row(detailed_time_entry)
+                if format == 'csv':
+                    writer.writerow({name: ', '.join(value) if isinstance(value, list) else value for name, value in row.items()})
+                else:
+                    output.write(json.dumps(row) + '\n')
+                count += 1
 
-        return time_entry_results
+        return count
@@ -2,17 +2,28 @@
 # Copyright 2020 Bradbase
 
 import json
-from dataclasses import asdict
-from collections import deque
-from datetime import timedelta, datetime
+from dataclasses import asdict, fields
+from typing import get_type_hints
+from datetime import datetime
 import time
 import copy
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests_oauthlib import OAuth2Session
-from dacite import from_dict
+from .decoder import InternTable, from_dict
 
 from .harvestdataclasses import *
+from .cache import ReferenceCache
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 try:
     from urllib.parse import urlparse
@@ -38,9 +49,141 @@ def assemble_query_string(**kwargs):
     return output_query_string
 
 
+def records_field(page_class):
+    """
+    Name of the list of records carried by a `BasePage` subclass, eg. `time_entries` for `TimeEntries`.
+    """
+    return next(page_field.name for page_field in fields(page_class) if not page_field.init)
+
+
+def list_field(data_class):
+    """
+    :return: `(name, record dataclass)` of the list of records carried by a page or report results dataclass, eg. `('results', TimeReportResult)`, `None` for other dataclasses.
+    :rtype: tuple or None
+    """
+    hints = get_type_hints(data_class)
+    if issubclass(data_class, BasePage):
+        name = records_field(data_class)
+    else:
+        name = next((data_field.name for data_field in fields(data_class) if getattr(hints[data_field.name], '__origin__', None) is list), None)
+        if name is None:
+            return None
+    return name, hints[name].__args__[0]
+
+
+class PageParser(object):
+    """
+    Builds the records of the `field_name` list of a page from the events of
+    `ijson.parse`, and notes the page's `links.next` on the way.
+    """
+
+    def __init__(self, field_name):
+        self.item_prefix = field_name + '.item'
+        self.next_link = None
+        self._builder = None
+
+    def feed(self, prefix, event, value):
+        """
+        :return: The record completed by the event, otherwise `None`.
+        :rtype: dict or None
+        """
+        if self._builder is not None:
+            self._builder.event(event, value)
+            if prefix == self.item_prefix and event == 'end_map':
+                record, self._builder = self._builder.value, None
+                return record
+        elif prefix == self.item_prefix and event == 'start_map':
+            self._builder = ijson.ObjectBuilder()
+            self._builder.event(event, value)
+        elif prefix == 'links.next' and event in ('string', 'null'):
+            self.next_link = value
+        return None
+
+
+def page_records(page, data_class=None):
+    """
+    Records carried by a page decoded in any of the `decode` modes. A raw page
+    is returned whole as its records can't be split without parsing it.
+
+    :param data_class: Dataclass the page decodes to, eg. `TimeEntries`, needed for pages decoded as `dict`
+    :type data_class: type or None
+    """
+    if isinstance(page, BasePage):
+        return getattr(page, records_field(type(page)))
+    if isinstance(page, dict):
+        records = list_field(data_class) if data_class is not None else None
+        if records is None:
+            raise HarvestError('The records of a dict page are found through its page dataclass, got {0}.'.format(data_class))
+        return page.get(records[0], [])
+    return [page]
+
+
+def pagination(page):
+    """
+    :return: `(page, total_pages, next_link)` of a page decoded in any of the `decode` modes, `None` when the response isn't a page.
+    :rtype: tuple or None
+    """
+    if isinstance(page, BasePage):
+        return page.page, page.total_pages, page.links.next if page.links is not None else None
+    if isinstance(page, bytes):
+        page = json.loads(page)
+    if isinstance(page, dict) and 'total_pages' in page:
+        return page.get('page'), page['total_pages'], (page.get('links') or {}).get('next')
+    return None
+
+
 class HarvestError(Exception):
     pass
 
+BULK_PREFIXES = ('create_', 'update_', 'delete_')
+
+# raised by a bulk call given the wrong arguments or failing to reach Harvest
+BULK_ERRORS = (TypeError, requests.RequestException)
+
+TIME_ENTRY_PERMISSION_MESSAGE = "Your user account does not have permission to create a time entry this way."
+
+def time_entry_error(time_entry):
+    """
+    :return: An `ErrorMessage` naming the fields a time entry to create is missing, `None` when it has them all.
+    """
+    missing = [name for name in ('project_id', 'task_id', 'spent_date') if time_entry.get(name) is None]
+    if missing:
+        return ErrorMessage('Time entry is missing {0}.'.format(', '.join(missing)))
+    return None
+
+def bulk_error(method, error):
+    return HarvestError('{0} failed. {1}: {2}'.format(method.__name__, type(error).__name__, error))
+
+def bulk_result(result):
+    """
+    :return: What a bulk call returned, an `ErrorMessage` turned into the `HarvestError` it stands for.
+    """
+    if isinstance(result, ErrorMessage):
+        return HarvestError(result.message)
+    return result
+
+def raise_for_status(status_code, url, text):
+    """
+    Raises the `HarvestError` matching an unsuccessful HTTP response.
+    """
+    if status_code == 500:
+        raise HarvestError('There was a server error for your request. Contact support@getharvest.com for help. url: {0}'.format(url))
+
+    elif status_code == 429:
+        raise HarvestError('Your request has been throttled. Raise an issue on the project in GitHub. https://github.com/bradbase/python-harvest_apiv2')
+
+    elif status_code == 422:
+        raise HarvestError('There were errors processing your request. {0} {1}'.format(url, text))
+
+    elif status_code == 404:
+        raise HarvestError('The object you requested can’t be found. {0}'.format(url))
+
+    elif status_code == 403:
+        raise HarvestError('The object you requested was found but you don’t have authorization to perform your request. {0}'.format(url))
+
+    else:
+        raise HarvestError('Unsupported HTTP response code. {0} {1} {2}'.format(status_code, url, text))
+
 class Harvest(object):
 
     # 15 seconds is from the Harvest API doco https://help.getharvest.com/api-v2/introduction/overview/general/
@@ -50,7 +193,41 @@ class Harvest(object):
 
     RATE_LIMIT_REQUEST_COUNT = 100
 
-    def __init__(self, uri, auth):
+    DECODE_MODES = ('dataclass', 'dict', 'raw')
+
+    def __init__(self, uri, auth, pool_connections=10, pool_maxsize=10, max_retries=0, rate_limiter=None, reports_rate_limiter=None, retry_policy=None, intern_refs=False, decode='dataclass', cache=None, company_ttl=3600, response_cache=None, archive=None, account_id=None):
+        """
+        :param uri: Base uri of the Harvest API, eg. `https://api.harvestapp.com/api/v2`
+        :type uri: str
+        :param auth: One of `PersonalAccessToken`, `OAuth2_ClientSide_Token` or `OAuth2_ServerSide`
+        :type auth: Auth
+        :param pool_connections: Number of connection pools to cache, defaults to `10`
+        :type pool_connections: int
+        :param pool_maxsize: Maximum number of keep-alive connections per host, defaults to `10`
+        :type pool_maxsize: int
+        :param max_retries: Connection level retries handed to the transport adapter, an int or a `urllib3.util.retry.Retry`, defaults to `0`
+        :type max_retries: int or Retry
+        :param rate_limiter: Limiter for general requests, share one between clients of the same account, defaults to 100 requests per 15 seconds
+        :type rate_limiter: RateLimiter or None
+        :param reports_rate_limiter: Limiter for `/reports/` requests, defaults to 100 requests per 15 minutes
+        :type reports_rate_limiter: RateLimiter or None
+        :param retry_policy: Retries for throttled and failed responses, `RetryPolicy(max_retries=0)` raises straight away, defaults to `RetryPolicy()`
+        :type retry_policy: RetryPolicy or None
+        :param intern_refs: Share identical objects nested in records, eg. the `client` of time entries, instead of decoding a copy per record. The most recently used 4096 are kept, shared objects must not be modified, defaults to `False`
+        :type intern_refs: bool
+        :param decode: How responses are returned, `dataclass`, `dict` for the parsed JSON or `raw` for the bytes of GET responses, defaults to `dataclass`
+        :type decode: str
+        :param cache: Cache of `get_user`, `get_client`, `get_project`, `get_task`, `get_role`, the category getters and `company`, emptied of an entity when it is updated or deleted, defaults to `None` for no caching
+        :type cache: ReferenceCache or None
+        :param company_ttl: Seconds the account settings read by `create_time_entry` are reused for, `None` to keep them for the life of the client, defaults to `3600`
+        :type company_ttl: float or None
+        :param response_cache: Keeps GET responses with an `ETag` or `Last-Modified` and revalidates them with conditional requests, defaults to `None`
+        :type response_cache: ResponseCache or None
+        :param archive: Answers GET requests of closed periods, eg. last quarter's reports, without sending them, defaults to `None`
+        :type archive: ClosedPeriodCache or None
+        :param account_id: Harvest account requested, sent as `Harvest-Account-ID` with OAuth2 tokens and keying `response_cache` and `archive`, defaults to the account of a `PersonalAccessToken`, otherwise responses are kept by the user of the token looked up once from `/users/me`
+        :type account_id: str or None
+        """
         self.__uri = uri.rstrip('/')
         parsed = urlparse(uri)
 
@@ -62,6 +239,9 @@ class Harvest(object):
         if not (parsed.scheme and parsed.netloc):
             raise HarvestError('Invalid harvest uri "{0}".'.format(uri))
 
+        if decode not in self.DECODE_MODES:
+            raise HarvestError('Invalid decode "{0}", expected one of {1}.'.format(decode, ', '.join(self.DECODE_MODES)))
+
         if isinstance(auth, PersonalAccessToken):
             self.__headers['Authorization'] = auth.access_token
             self.__headers['Harvest-Account-ID'] = auth.account_id
@@ -75,11 +255,68 @@ class Harvest(object):
         else:
             raise HarvestError('Invalid authorization type "{0}".'.format(type(auth)))
 
+        if account_id is not None:
+            self.__headers['Harvest-Account-ID'] = account_id
+
         self.__auth = auth
-        self.request_throttle = deque()
-        self.reports_throttle = deque()
-        self.request_time_limit = timedelta(seconds=self.RATE_LIMIT_REQUESTS_DURATION_SECONDS)
-        self.reports_time_limit = timedelta(seconds=self.RATE_LIMIT_REPORTS_DURATION_SECONDS)
+
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(self.RATE_LIMIT_REQUEST_COUNT, self.RATE_LIMIT_REQUESTS_DURATION_SECONDS)
+        if reports_rate_limiter is None:
+            reports_rate_limiter = RateLimiter(self.RATE_LIMIT_REQUEST_COUNT, self.RATE_LIMIT_REPORTS_DURATION_SECONDS)
+        self.rate_limiter = rate_limiter
+        self.reports_rate_limiter = reports_rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.interned = InternTable() if intern_refs else None
+        self.decode = decode
+        self.cache = cache
+        # shared with the copies made by `with_decode`
+        self._company_settings = ReferenceCache(maxsize=1, ttl=company_ttl)
+        self.response_cache = response_cache
+        self.archive = archive
+        # shared with the copies made by `with_decode`
+        self._token_user = {}
+
+        # One keep-alive session for the life of the client so paginated
+        # calls reuse the TCP/TLS connection instead of handshaking each time.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def with_decode(self, decode, caches=True):
+        """
+        Client returning responses as `decode` which shares this client's
+        session, rate limiters and retry policy, eg. for a single call
+        `harvest.with_decode('raw').time_entries(page=2)`.
+
+        :param decode: One of `dataclass`, `dict` or `raw`
+        :type decode: str
+        :param caches: Whether the client reads and keeps responses in `response_cache` and `archive`, defaults to `True`
+        :type caches: bool
+        :return: This client when it already decodes as `decode` with the same caches, otherwise a copy.
+        :rtype: Harvest
+        """
+        if decode not in self.DECODE_MODES:
+            raise HarvestError('Invalid decode "{0}", expected one of {1}.'.format(decode, ', '.join(self.DECODE_MODES)))
+        if decode == self.decode and (caches or (self.response_cache is None and self.archive is None)):
+            return self
+
+        client = copy.copy(self)
+        client.decode = decode
+        if not caches:
+            client.response_cache = None
+            client.archive = None
+        return client
 
     @property
     def uri(self):
@@ -103,19 +340,19 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=ClientContacts, data=self._get(url))
+        return self._from_dict(data_class=ClientContacts, data=self._get(url))
 
     def get_client_contact(self, contact_id):
-        return from_dict(data_class=ClientContact, data=self._get('/contacts/{0}'.format(contact_id)))
+        return self._from_dict(data_class=ClientContact, data=self._get('/contacts/{0}'.format(contact_id)))
 
     def create_client_contact(self, client_id, first_name, **kwargs):
         url  = '/contacts'
         kwargs.update({'client_id': client_id, 'first_name': first_name})
-        return from_dict(data_class=ClientContact, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=ClientContact, data=self._post(url, data=kwargs))
 
     def update_client_contact(self, contact_id, **kwargs):
         url = '/contacts/{0}'.format(contact_id)
-        return from_dict(data_class=ClientContact, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=ClientContact, data=self._patch(url, data=kwargs))
 
     def delete_client_contact(self, contact_id):
         self._delete('/contacts/{0}'.format(contact_id))
@@ -138,10 +375,10 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=Clients, data=self._get(url))
+        return self._from_dict(data_class=Clients, data=self._get(url))
 
     def get_client(self, client_id):
-        return from_dict(data_class=Client, data=self._get('/clients/{0}'.format(client_id)))
+        return self._cached('client', client_id, lambda: self._from_dict(data_class=Client, data=self._get('/clients/{0}'.format(client_id))))
 
     def create_client(self, name, **kwargs):
         url  = '/clients'
@@ -149,16 +386,19 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=Client, data=response)
+        return self._from_dict(data_class=Client, data=response)
 
     def update_client(self, client_id, **kwargs):
         url = '/clients/{0}'.format(client_id)
-        return from_dict(data_class=Client, data=self._patch(url, data=kwargs))
+        result = self._from_dict(data_class=Client, data=self._patch(url, data=kwargs))
+        self._invalidate('client', client_id)
+        return result
 
     def delete_client(self, client_id):
         self._delete('/clients/{0}'.format(client_id))
+        self._invalidate('client', client_id)
 
     ## Company
 
@@ -179,7 +419,7 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=Company, data=self._get(url))
+        return self._cached('company', query_string, lambda: self._from_dict(data_class=Company, data=self._get(url)))
 
     ## Invoices
 
@@ -191,7 +431,7 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=InvoiceMessages, data=self._get(url))
+        return self._from_dict(data_class=InvoiceMessages, data=self._get(url))
 
     def create_invoice_message(self, invoice_id, recipients, **kwargs):
         url  = '/invoices/{0}/messages'.format(invoice_id)
@@ -199,13 +439,13 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=InvoiceMessage, data=response)
+        return self._from_dict(data_class=InvoiceMessage, data=response)
 
     def mark_draft_invoice(self, invoice_id, event_type):
         url = '/invoices/{0}/messages'.format(invoice_id)
-        return from_dict(data_class=InvoiceMessage, data=self._post(url, data={'event_type': event_type}))
+        return self._from_dict(data_class=InvoiceMessage, data=self._post(url, data={'event_type': event_type}))
 
     def mark_draft_invoice_as_sent(self, invoice_id):
         return self.mark_draft_invoice(invoice_id, 'send')
@@ -231,7 +471,7 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=InvoicePayments, data=self._get(url))
+        return self._from_dict(data_class=InvoicePayments, data=self._get(url))
 
     def create_invoice_payment(self, invoice_id, amount, **kwargs):
         url  = '/invoices/{0}/payments'.format(invoice_id)
@@ -239,9 +479,9 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=InvoicePayment, data=response)
+        return self._from_dict(data_class=InvoicePayment, data=response)
 
     def delete_invoice_payment(self, invoice_id, payment_id):
         self._delete('/invoices/{0}/payments/{1}'.format(invoice_id, payment_id))
@@ -264,15 +504,15 @@ class Harvest(object):
         if state is not None:
             url = '{0}&state={1}'.format(url, state)
 
-        return from_dict(data_class=Invoices, data=self._get(url))
+        return self._from_dict(data_class=Invoices, data=self._get(url))
 
     def get_invoice(self, invoice_id):
-        return from_dict(data_class=Invoice, data=self._get('/invoices/{0}'.format(invoice_id)))
+        return self._from_dict(data_class=Invoice, data=self._get('/invoices/{0}'.format(invoice_id)))
 
     def create_invoice(self, client_id, **kwargs):
         url = '/invoices'
         kwargs.update({'client_id': client_id})
-        return from_dict(data_class=Invoice, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Invoice, data=self._post(url, data=kwargs))
 
     def create_free_form_invoice(self, invoice : FreeFormInvoice):
         invoice_dict = asdict(invoice)
@@ -293,9 +533,9 @@ class Harvest(object):
         response = self._patch(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=Invoice, data=response)
+        return self._from_dict(data_class=Invoice, data=response)
 
     def create_invoice_line_item(self, invoice_id, line_items):
         if not isinstance(line_items, list):
@@ -316,7 +556,7 @@ class Harvest(object):
         for item in line_items:
             delete_line_item.append({'id':item['id'], '_destroy':True})
 
-        return from_dict(data_class=Invoice, data=self._patch(url, data={'line_items': delete_line_item}))
+        return self._from_dict(data_class=Invoice, data=self._patch(url, data={'line_items': delete_line_item}))
 
     def delete_invoice(self, invoice_id):
         self._delete('/invoices/{0}'.format(invoice_id))
@@ -328,22 +568,25 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=InvoiceItemCategories, data=self._get(url))
+        return self._from_dict(data_class=InvoiceItemCategories, data=self._get(url))
 
     def get_invoice_item_category(self, category_id):
         url = '/invoice_item_categories/{0}'.format(category_id)
-        return from_dict(data_class=InvoiceItemCategory, data=self._get(url))
+        return self._cached('invoice_item_category', category_id, lambda: self._from_dict(data_class=InvoiceItemCategory, data=self._get(url)))
 
     def create_invoice_item_category(self, name):
         url = '/invoice_item_categories'
-        return from_dict(data_class=InvoiceItemCategory, data=self._post(url, data={'name': name}))
+        return self._from_dict(data_class=InvoiceItemCategory, data=self._post(url, data={'name': name}))
 
     def update_invoice_item_category(self, category_id, name):
         url = '/invoice_item_categories/{0}'.format(category_id)
-        return from_dict(data_class=InvoiceItemCategory, data=self._patch(url, data={'name': name}))
+        result = self._from_dict(data_class=InvoiceItemCategory, data=self._patch(url, data={'name': name}))
+        self._invalidate('invoice_item_category', category_id)
+        return result
 
     def delete_invoice_item_category(self, invoice_category_id):
         self._delete('/invoice_item_categories/{0}'.format(invoice_category_id))
+        self._invalidate('invoice_item_category', invoice_category_id)
 
      ## Estimates
 
@@ -355,7 +598,7 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=EstimateMessages, data=self._get(url))
+        return self._from_dict(data_class=EstimateMessages, data=self._get(url))
 
     # recipients is a list of Recipient
     def create_estimate_message(self, estimate_id, recipients, **kwargs):
@@ -364,16 +607,16 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=EstimateMessage, data=response)
+        return self._from_dict(data_class=EstimateMessage, data=response)
 
     def delete_estimate_message(self, estimate_id, message_id):
         self._delete('/estimates/{0}/messages/{1}'.format(estimate_id, message_id))
 
     def mark_draft_estimate(self, estimate_id, event_type):
         url  = '/estimates/{0}/messages'.format(estimate_id)
-        return from_dict(data_class=EstimateMessage, data=self._post(url, data={'event_type': event_type}))
+        return self._from_dict(data_class=EstimateMessage, data=self._post(url, data={'event_type': event_type}))
 
     def mark_draft_estimate_as_sent(self, estimate_id):
         return self.mark_draft_estimate(estimate_id, 'send')
@@ -400,21 +643,21 @@ class Harvest(object):
         if to_date is not None:
             url = '{0}&to={1}'.format(url, to_date)
 
-        return from_dict(data_class=Estimates, data=self._get(url))
+        return self._from_dict(data_class=Estimates, data=self._get(url))
 
     def get_estimte(self, estimate_id):
         url = '/estimates/{0}'.format(estimate_id)
-        return from_dict(data_class=Estimate, data=self._get(url))
+        return self._from_dict(data_class=Estimate, data=self._get(url))
 
     def create_estimate(self, client_id, **kwargs):
         url  = '/estimates'
         kwargs.update({'client_id': client_id})
 
-        return from_dict(data_class=Estimate, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Estimate, data=self._post(url, data=kwargs))
 
     def update_estimate(self, estimate_id, **kwargs):
         url = '/estimates/{0}'.format(estimate_id)
-        return from_dict(data_class=Estimate, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=Estimate, data=self._patch(url, data=kwargs))
 
     def create_estimate_line_item(self, estimate_id, line_items):
         if not isinstance(line_items, list):
@@ -434,7 +677,7 @@ class Harvest(object):
         for item in line_items:
             delete_line_item.append({'id':item.id, '_destroy':True})
 
-        return from_dict(data_class=Estimate, data=self._patch(url, data={'line_items': delete_line_item}))
+        return self._from_dict(data_class=Estimate, data=self._patch(url, data={'line_items': delete_line_item}))
 
     def delete_estimate(self, estimate_id):
         self._delete('/estimates/{0}'.format(estimate_id))
@@ -446,22 +689,25 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=EstimateItemCategories, data=self._get(url))
+        return self._from_dict(data_class=EstimateItemCategories, data=self._get(url))
 
     def get_estimate_item_category(self, estimate_item_category_id):
         url = '/estimate_item_categories/{0}'.format(estimate_item_category_id)
-        return from_dict(data_class=EstimateItemCategory, data=self._get(url))
+        return self._cached('estimate_item_category', estimate_item_category_id, lambda: self._from_dict(data_class=EstimateItemCategory, data=self._get(url)))
 
     def create_estimate_item_category(self, name):
         url = '/estimate_item_categories'
-        return from_dict(data_class=EstimateItemCategory, data=self._post(url, data={'name': name}))
+        return self._from_dict(data_class=EstimateItemCategory, data=self._post(url, data={'name': name}))
 
     def update_estimate_item_category(self, estimate_item_category_id, name):
         url = '/estimate_item_categories/{0}'.format(estimate_item_category_id)
-        return from_dict(data_class=EstimateItemCategory, data=self._patch(url, data={'name': name}))
+        result = self._from_dict(data_class=EstimateItemCategory, data=self._patch(url, data={'name': name}))
+        self._invalidate('estimate_item_category', estimate_item_category_id)
+        return result
 
     def delete_estimate_item_category(self, estimate_item_id):
         self._delete('/estimate_item_categories/{0}'.format(estimate_item_id))
+        self._invalidate('estimate_item_category', estimate_item_id)
 
     ## Expenses
 
@@ -501,10 +747,10 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=Expenses, data=self._get(url))
+        return self._from_dict(data_class=Expenses, data=self._get(url))
 
     def get_expense(self, expense_id):
-        return from_dict(data_class=Expense, data=self._get('/expenses/{0}'.format(expense_id)))
+        return self._from_dict(data_class=Expense, data=self._get('/expenses/{0}'.format(expense_id)))
 
     def create_expense(self, project_id, expense_category_id, spent_date, **kwargs):
         url = '/expenses'
@@ -517,9 +763,9 @@ class Harvest(object):
             response = self._post(url, data=kwargs)
 
             if 'message' in response.keys():
-                return from_dict(data_class=ErrorMessage, data=response)
+                return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=Expense, data=response)
+        return self._from_dict(data_class=Expense, data=response)
 
     def update_expense(self, expense_id, **kwargs):
         url = '/expenses/{0}'.format(expense_id)
@@ -530,7 +776,7 @@ class Harvest(object):
         else:
             response = self._patch(url, data=kwargs)
 
-        return from_dict(data_class=Expense, data=response)
+        return self._from_dict(data_class=Expense, data=response)
 
     def delete_expense(self, expense_id):
         self._delete('/expenses/{0}'.format(expense_id))
@@ -552,22 +798,25 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=ExpenseCategories, data=self._get(url))
+        return self._from_dict(data_class=ExpenseCategories, data=self._get(url))
 
     def get_expense_category(self, expense_category_id):
-        return from_dict(data_class=ExpenseCategory, data=self._get('/expense_categories/{0}'.format(expense_category_id)))
+        return self._cached('expense_category', expense_category_id, lambda: self._from_dict(data_class=ExpenseCategory, data=self._get('/expense_categories/{0}'.format(expense_category_id))))
 
     def create_expense_category(self, name, **kwargs):
         url = '/expense_categories'
         kwargs.update({'name': name})
-        return from_dict(data_class=ExpenseCategory, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=ExpenseCategory, data=self._post(url, data=kwargs))
 
     def update_expense_category(self, expense_category_id, **kwargs):
         url = '/expense_categories/{0}'.format(expense_category_id)
-        return from_dict(data_class=ExpenseCategory, data=self._patch(url, data=kwargs))
+        result = self._from_dict(data_class=ExpenseCategory, data=self._patch(url, data=kwargs))
+        self._invalidate('expense_category', expense_category_id)
+        return result
 
     def delete_expense_category(self, expense_category_id):
         self._delete('/expense_categories/{0}'.format(expense_category_id))
+        self._invalidate('expense_category', expense_category_id)
 
     ## Tasks
     def tasks(self, **kwargs):
@@ -587,22 +836,25 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=Tasks, data=self._get(url))
+        return self._from_dict(data_class=Tasks, data=self._get(url))
 
     def get_task(self, task_id):
-        return from_dict(data_class=Task, data=self._get('/tasks/{0}'.format(task_id)))
+        return self._cached('task', task_id, lambda: self._from_dict(data_class=Task, data=self._get('/tasks/{0}'.format(task_id))))
 
     def create_task(self, name, **kwargs):
         url = '/tasks'
         kwargs.update({'name': name})
-        return from_dict(data_class=Task, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Task, data=self._post(url, data=kwargs))
 
     def update_task(self, task_id, **kwargs):
         url = '/tasks/{0}'.format(task_id)
-        return from_dict(data_class=Task, data=self._patch(url, data=kwargs))
+        result = self._from_dict(data_class=Task, data=self._patch(url, data=kwargs))
+        self._invalidate('task', task_id)
+        return result
 
     def delete_task(self, task_id):
         self._delete('/tasks/{0}'.format(task_id))
+        self._invalidate('task', task_id)
 
     ## Time Entries
 
@@ -648,25 +900,82 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=TimeEntries, data=self._get(url))
+        return self._from_dict(data_class=TimeEntries, data=self._get(url))
 
     def get_time_entry(self, time_entry_id):
-        return from_dict(data_class=TimeEntry, data=self._get('/time_entries/{0}'.format(time_entry_id)))
+        return self._from_dict(data_class=TimeEntry, data=self._get('/time_entries/{0}'.format(time_entry_id)))
 
-    def create_time_entry(self, wants_timestamp_timers, project_id, task_id, spent_date, **kwargs):
-        company = self.company()
+    def company_settings(self, refresh=False):
+        """
+        The account settings, eg. `wants_timestamp_timers`, requested at most
+        once per `company_ttl` seconds whatever the client's `cache`.
 
-        if company.wants_timestamp_timers == wants_timestamp_timers:
-            url = '/time_entries'
-            kwargs.update({'project_id': project_id, 'task_id': task_id, 'spent_date': spent_date})
-            response = self._post(url, data=kwargs)
+        :param refresh: Request the settings even when they are still fresh, defaults to `False`
+        :type refresh: bool
+        :rtype: Company
+        """
+        company = None if refresh else self._company_settings.get('company')
+        if company is None:
+            if refresh:
+                # the client's `cache` may hold the settings just as long
+                self._invalidate('company', assemble_query_string())
+            company = self.with_decode('dataclass').company()
+            self._company_settings.set('company', company)
+        return company
+
+    def _wants_timestamp_timers(self, wants_timestamp_timers):
+        """
+        Whether the account creates time entries the way `wants_timestamp_timers` says, asking again once when the settings say no in case they changed.
+        """
+        if self.company_settings().wants_timestamp_timers == wants_timestamp_timers:
+            return True
+        return self.company_settings(refresh=True).wants_timestamp_timers == wants_timestamp_timers
 
-            if 'message' in response.keys():
-                return from_dict(data_class=ErrorMessage, data=response)
+    def _create_time_entry(self, data):
+        response = self._post('/time_entries', data=data)
+
+        if 'message' in response.keys():
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-            return from_dict(data_class=TimeEntry, data=response)
+        return self._from_dict(data_class=TimeEntry, data=response)
+
+    def create_time_entry(self, wants_timestamp_timers, project_id, task_id, spent_date, **kwargs):
+        if self._wants_timestamp_timers(wants_timestamp_timers):
+            kwargs.update({'project_id': project_id, 'task_id': task_id, 'spent_date': spent_date})
+            return self._create_time_entry(kwargs)
         else:
-            return ErrorMessage("Your user account does not have permission to create a time entry this way.")
+            return ErrorMessage(TIME_ENTRY_PERMISSION_MESSAGE)
+
+    def create_time_entries(self, wants_timestamp_timers, time_entries, concurrency=4):
+        """
+        Creates many time entries, checking the account settings once and
+        then posting the entries concurrently within the client's rate limit.
+        A failed entry doesn't stop the others.
+
+        :param wants_timestamp_timers: `True` for entries with `started_time` and `ended_time`, `False` for entries with `hours`
+        :type wants_timestamp_timers: bool
+        :param time_entries: Fields of each time entry, each with `project_id`, `task_id` and `spent_date`
+        :type time_entries: list
+        :param concurrency: Maximum number of entries posted at once, defaults to `4`
+        :type concurrency: int
+        :return: The `TimeEntry` created for each of `time_entries` in order, or an `ErrorMessage` for those which failed.
+        :rtype: list
+        """
+        time_entries = list(time_entries)
+        if not self._wants_timestamp_timers(wants_timestamp_timers):
+            return [ErrorMessage(TIME_ENTRY_PERMISSION_MESSAGE) for _ in time_entries]
+
+        def create(time_entry):
+            error = time_entry_error(time_entry)
+            if error is not None:
+                return error
+            try:
+                return self._create_time_entry(dict(time_entry))
+            except HarvestError as error:
+                return ErrorMessage(str(error))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(create, time_entries))
 
     def create_time_entry_via_start_and_end_time(self, project_id, task_id, spent_date, **kwargs):
         return self.create_time_entry(True, project_id, task_id, spent_date, **kwargs)
@@ -676,7 +985,7 @@ class Harvest(object):
 
     def update_time_entry(self, time_entry_id, **kwargs):
         url = '/time_entries/{0}'.format(time_entry_id)
-        return from_dict(data_class=TimeEntry, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=TimeEntry, data=self._patch(url, data=kwargs))
 
     def delete_time_entry_external_reference(self, time_entry_id):
         self._delete('/time_entries/{0}/external_reference'.format(time_entry_id))
@@ -685,10 +994,10 @@ class Harvest(object):
         self._delete('/time_entries/{0}'.format(time_entry_id))
 
     def restart_a_stopped_time_entry(self, time_entry_id):
-        return from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/restart'.format(time_entry_id)))
+        return self._from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/restart'.format(time_entry_id)))
 
     def stop_a_running_time_entry(self, time_entry_id):
-        return from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/stop'.format(time_entry_id)))
+        return self._from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/stop'.format(time_entry_id)))
 
     ## Projects
     def user_assignments(self, **kwargs):
@@ -708,7 +1017,7 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=UserAssignments, data=self._get(url))
+        return self._from_dict(data_class=UserAssignments, data=self._get(url))
 
     def project_user_assignments(self, project_id, **kwargs):
         """
@@ -727,19 +1036,19 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=UserAssignments, data=self._get(url))
+        return self._from_dict(data_class=UserAssignments, data=self._get(url))
 
     def get_user_assignment(self, project_id, user_assignment_id):
-        return from_dict(data_class=UserAssignment, data=self._get('/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id)))
+        return self._from_dict(data_class=UserAssignment, data=self._get('/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id)))
 
     def create_user_assignment(self, project_id, user_id, **kwargs):
         url = '/projects/{0}/user_assignments'.format(project_id)
         kwargs.update({'user_id': user_id})
-        return from_dict(data_class=UserAssignment, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=UserAssignment, data=self._post(url, data=kwargs))
 
     def update_user_assignment(self, project_id, user_assignment_id, **kwargs):
         url = '/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id)
-        return from_dict(data_class=UserAssignment, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=UserAssignment, data=self._patch(url, data=kwargs))
 
     def delete_user_assignment(self, project_id, user_assignment_id):
         self._delete('/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id))
@@ -761,7 +1070,7 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=TaskAssignments, data=self._get(url))
+        return self._from_dict(data_class=TaskAssignments, data=self._get(url))
 
     def project_task_assignments(self, project_id, **kwargs):
         """
@@ -780,10 +1089,10 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=TaskAssignments, data=self._get(url))
+        return self._from_dict(data_class=TaskAssignments, data=self._get(url))
 
     def get_task_assignment(self, project_id, task_assignment_id):
-        return from_dict(data_class=TaskAssignment, data=self._get('/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id)))
+        return self._from_dict(data_class=TaskAssignment, data=self._get('/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id)))
 
     def create_task_assignment(self, project_id, task_id, **kwargs):
         url = '/projects/{0}/task_assignments'.format(project_id)
@@ -792,13 +1101,13 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=TaskAssignment, data=response)
+        return self._from_dict(data_class=TaskAssignment, data=response)
 
     def update_task_assignment(self, project_id, task_assignment_id, **kwargs):
         url = '/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id)
-        return from_dict(data_class=TaskAssignment, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=TaskAssignment, data=self._patch(url, data=kwargs))
 
     def delete_task_assignment(self, project_id, task_assignment_id):
         self._delete('/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id))
@@ -820,22 +1129,25 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=Projects, data=self._get(url))
+        return self._from_dict(data_class=Projects, data=self._get(url))
 
     def get_project(self, project_id):
-        return from_dict(data_class=Project, data=self._get('/projects/{0}'.format(project_id)))
+        return self._cached('project', project_id, lambda: self._from_dict(data_class=Project, data=self._get('/projects/{0}'.format(project_id))))
 
     def create_project(self, client_id, name, is_billable, bill_by, budget_by, **kwargs):
         url = '/projects'
         kwargs.update({'client_id': client_id, 'name': name, 'is_billable': str(is_billable).lower(), 'bill_by': bill_by, 'budget_by': budget_by})
-        return from_dict(data_class=Project, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Project, data=self._post(url, data=kwargs))
 
     def update_project(self, project_id, **kwargs):
         url = '/projects/{0}'.format(project_id)
-        return from_dict(data_class=Project, data=self._patch(url, data=kwargs))
+        result = self._from_dict(data_class=Project, data=self._patch(url, data=kwargs))
+        self._invalidate('project', project_id)
+        return result
 
     def delete_project(self, project_id):
         self._delete('/projects/{0}'.format(project_id))
+        self._invalidate('project', project_id)
 
      ## Roles
 
@@ -843,23 +1155,26 @@ class Harvest(object):
         url = '/roles?page={0}'.format(page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=Roles, data=self._get(url))
+        return self._from_dict(data_class=Roles, data=self._get(url))
 
     def get_role(self, role_id):
-        return from_dict(data_class=Role, data=self._get('/roles/{0}'.format(role_id)))
+        return self._cached('role', role_id, lambda: self._from_dict(data_class=Role, data=self._get('/roles/{0}'.format(role_id))))
 
     def create_role(self, name, **kwargs):
         url = '/roles'
         kwargs.update({'name': name})
-        return from_dict(data_class=Role, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Role, data=self._post(url, data=kwargs))
 
     def update_role(self, role_id, name, **kwargs):
         url = '/roles/{0}'.format(role_id)
         kwargs.update({'name': name})
-        return from_dict(data_class=Role, data=self._patch(url, data=kwargs))
+        result = self._from_dict(data_class=Role, data=self._patch(url, data=kwargs))
+        self._invalidate('role', role_id)
+        return result
 
     def delete_role(self, role_id):
         self._delete('/roles/{0}'.format(role_id))
+        self._invalidate('role', role_id)
 
      ## Users
 
@@ -868,32 +1183,32 @@ class Harvest(object):
         url = '{0}?page={1}'.format(url, page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=BillableRates, data=self._get(url))
+        return self._from_dict(data_class=BillableRates, data=self._get(url))
 
     def get_billable_rate(self, user_id, billable_rate_id):
         url = '/users/{0}/billable_rates/{1}'.format(user_id, billable_rate_id)
-        return from_dict(data_class=BillableRate, data=self._get(url))
+        return self._from_dict(data_class=BillableRate, data=self._get(url))
 
     def create_billable_rate(self, user_id, amount, **kwargs):
         url = '/users/{0}/billable_rates'.format(user_id)
         kwargs.update({'amount': amount})
-        return from_dict(data_class=BillableRate, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=BillableRate, data=self._post(url, data=kwargs))
 
     def user_cost_rates(self, user_id, page=1, per_page=100):
         url = '/users/{0}/cost_rates'.format(user_id)
         url = '{0}?page={1}'.format(url, page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=UserCostRates, data=self._get(url))
+        return self._from_dict(data_class=UserCostRates, data=self._get(url))
 
     def get_user_cost_rate(self, user_id, cost_rate_id):
         url = '/users/{0}/cost_rates/{1}'.format(user_id, cost_rate_id)
-        return from_dict(data_class=CostRate, data=self._get(url))
+        return self._from_dict(data_class=CostRate, data=self._get(url))
 
     def create_user_cost_rate(self, user_id, amount, **kwargs):
         url = '/users/{0}/cost_rates'.format(user_id)
         kwargs.update({'amount': amount})
-        return from_dict(data_class=CostRate, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=CostRate, data=self._post(url, data=kwargs))
 
     def project_assignments(self, user_id, page=1, per_page=100, updated_since=None):
         url = '/users/{0}/project_assignments'.format(user_id)
@@ -903,13 +1218,13 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=ProjectAssignments, data=self._get(url))
+        return self._from_dict(data_class=ProjectAssignments, data=self._get(url))
 
     def my_project_assignments(self, page=1, per_page=100):
         url = '/users/me/project_assignments?page={0}'.format(page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=ProjectAssignments, data=self._get(url))
+        return self._from_dict(data_class=ProjectAssignments, data=self._get(url))
 
     def users(self, **kwargs):
         """
@@ -928,13 +1243,13 @@ class Harvest(object):
         query_string = assemble_query_string(**kwargs)
         url = f"{baseurl}{query_string}"
 
-        return from_dict(data_class=Users, data=self._get(url))
+        return self._from_dict(data_class=Users, data=self._get(url))
 
     def get_user(self, user_id):
-        return from_dict(data_class=User, data=self._get('/users/{0}'.format(user_id)))
+        return self._cached('user', user_id, lambda: self._from_dict(data_class=User, data=self._get('/users/{0}'.format(user_id))))
 
     def get_currently_authenticated_user(self):
-        return from_dict(data_class=User, data=self._get('/users/me'))
+        return self._from_dict(data_class=User, data=self._get('/users/me'))
 
     def create_user(self, first_name, last_name, email, **kwargs):
         url = '/users'
@@ -942,58 +1257,361 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=User, data=response)
+        return self._from_dict(data_class=User, data=response)
 
     def update_user(self, user_id, **kwargs):
         url = '/users/{0}'.format(user_id)
-        return from_dict(data_class=User, data=self._patch(url, data=kwargs))
+        result = self._from_dict(data_class=User, data=self._patch(url, data=kwargs))
+        self._invalidate('user', user_id)
+        return result
 
     def delete_user(self, user_id):
         self._delete('/users/{0}'.format(user_id))
+        self._invalidate('user', user_id)
 
     ## Reports
 
     def reports_expenses_clients(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/expenses/clients?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=ExpenseReportResults, data=self._get(url))
+        return self._from_dict(data_class=ExpenseReportResults, data=self._get(url))
 
     def reports_expenses_projects(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/expenses/projects?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=ExpenseReportResults, data=self._get(url))
+        return self._from_dict(data_class=ExpenseReportResults, data=self._get(url))
 
     def reports_expenses_categories(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/expenses/categories?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=ExpenseReportResults, data=self._get(url))
+        return self._from_dict(data_class=ExpenseReportResults, data=self._get(url))
 
     def reports_expenses_team(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/expenses/team?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=ExpenseReportResults, data=self._get(url))
+        return self._from_dict(data_class=ExpenseReportResults, data=self._get(url))
 
     def reports_uninvoiced(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/uninvoiced?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=UninvoicedReportResults, data=self._get(url))
+        return self._from_dict(data_class=UninvoicedReportResults, data=self._get(url))
 
     def reports_time_clients(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/time/clients?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=TimeReportResults, data=self._get(url))
+        return self._from_dict(data_class=TimeReportResults, data=self._get(url))
 
     def reports_time_projects(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/time/projects?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=TimeReportResults, data=self._get(url))
+        return self._from_dict(data_class=TimeReportResults, data=self._get(url))
 
     def reports_time_tasks(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/time/tasks?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=TimeReportResults, data=self._get(url))
+        return self._from_dict(data_class=TimeReportResults, data=self._get(url))
 
     def reports_time_team(self, from_date, to_date, page=1, per_page=1000):
         url = '/reports/time/team?from={0}&to={1}&page={2}&per_page={3}'.format(from_date, to_date, page, per_page)
-        return from_dict(data_class=TimeReportResults, data=self._get(url))
+        return self._from_dict(data_class=TimeReportResults, data=self._get(url))
 
     def reports_project_budget(self, page=1, per_page=1000):
         url = '/reports/project_budget?page={0}&per_page={1}'.format(page, per_page)
-        return from_dict(data_class=ProjectBudgetReportResults, data=self._get(url))
+        return self._from_dict(data_class=ProjectBudgetReportResults, data=self._get(url))
+
+    ## Pagination
+
+    def iter_client_contacts(self, **kwargs):
+        return self._iter_records(self.client_contacts, **kwargs)
+
+    def iter_clients(self, **kwargs):
+        return self._iter_records(self.clients, **kwargs)
+
+    def iter_invoice_messages(self, invoice_id, **kwargs):
+        return self._iter_records(self.invoice_messages, invoice_id, **kwargs)
+
+    def iter_invoice_payments(self, invoice_id, **kwargs):
+        return self._iter_records(self.invoice_payments, invoice_id, **kwargs)
+
+    def iter_invoices(self, **kwargs):
+        return self._iter_records(self.invoices, **kwargs)
+
+    def iter_invoice_item_categories(self, **kwargs):
+        return self._iter_records(self.invoice_item_categories, **kwargs)
+
+    def iter_estimate_messages(self, estimate_id, **kwargs):
+        return self._iter_records(self.estimate_messages, estimate_id, **kwargs)
+
+    def iter_estimates(self, **kwargs):
+        return self._iter_records(self.estimates, **kwargs)
+
+    def iter_estimate_item_categories(self, **kwargs):
+        return self._iter_records(self.estimate_item_categories, **kwargs)
+
+    def iter_expenses(self, **kwargs):
+        return self._iter_records(self.expenses, **kwargs)
+
+    def iter_expense_categories(self, **kwargs):
+        return self._iter_records(self.expense_categories, **kwargs)
+
+    def iter_tasks(self, **kwargs):
+        return self._iter_records(self.tasks, **kwargs)
+
+    def iter_time_entries(self, **kwargs):
+        return self._iter_records(self.time_entries, **kwargs)
+
+    def iter_user_assignments(self, **kwargs):
+        return self._iter_records(self.user_assignments, **kwargs)
+
+    def iter_project_user_assignments(self, project_id, **kwargs):
+        return self._iter_records(self.project_user_assignments, project_id, **kwargs)
+
+    def iter_task_assignments(self, **kwargs):
+        return self._iter_records(self.task_assignments, **kwargs)
+
+    def iter_project_task_assignments(self, project_id, **kwargs):
+        return self._iter_records(self.project_task_assignments, project_id, **kwargs)
+
+    def iter_projects(self, **kwargs):
+        return self._iter_records(self.projects, **kwargs)
+
+    def iter_roles(self, **kwargs):
+        return self._iter_records(self.roles, **kwargs)
+
+    def iter_billable_rates(self, user_id, **kwargs):
+        return self._iter_records(self.billable_rates, user_id, **kwargs)
+
+    def iter_user_cost_rates(self, user_id, **kwargs):
+        return self._iter_records(self.user_cost_rates, user_id, **kwargs)
+
+    def iter_project_assignments(self, user_id, **kwargs):
+        return self._iter_records(self.project_assignments, user_id, **kwargs)
+
+    def iter_my_project_assignments(self, **kwargs):
+        return self._iter_records(self.my_project_assignments, **kwargs)
+
+    def iter_users(self, **kwargs):
+        return self._iter_records(self.users, **kwargs)
+
+    def _bulk_method(self, operation):
+        """
+        :return: The write method named by `operation` and its keyword arguments, or the `HarvestError` of an invalid operation.
+        """
+        try:
+            name, kwargs = operation
+        except (TypeError, ValueError):
+            return HarvestError('Invalid bulk operation {0!r}, expected (method name, keyword arguments).'.format(operation))
+        if not isinstance(name, str) or not name.startswith(BULK_PREFIXES) or not callable(getattr(self, name, None)):
+            return HarvestError('Unknown bulk operation "{0}", expected a create_, update_ or delete_ method.'.format(name))
+        if not isinstance(kwargs, Mapping):
+            return HarvestError('Invalid keyword arguments {0!r} of bulk operation "{1}", expected a mapping.'.format(kwargs, name))
+        return getattr(self, name), kwargs
+
+    def bulk(self, operations, concurrency=4):
+        """
+        Runs many create, update and delete calls concurrently within the
+        client's rate limit, eg.
+
+            harvest.bulk([('create_client', {'name': 'ABC Corp'}), ('delete_time_entry', {'time_entry_id': 636708723})])
+
+        A failed operation doesn't stop the others, a `HarvestError` takes
+        its place in the results instead. Calls given the wrong arguments,
+        failing to reach Harvest or returning an `ErrorMessage` fail this way
+        too.
+
+        :param operations: `(method name, keyword arguments)` of each call, the method one of the `create_`, `update_` or `delete_` methods
+        :type operations: list
+        :param concurrency: Maximum number of calls in flight at once, defaults to `4`
+        :type concurrency: int
+        :return: What each call returned, or the `HarvestError` it raised, in the order of `operations`.
+        :rtype: list
+        """
+        calls = [self._bulk_method(operation) for operation in operations]
+        if any(not isinstance(call, HarvestError) and call[0].__name__.startswith('create_time_entry') for call in calls):
+            # read the settings before the calls checking them run concurrently
+            self.company_settings()
+
+        def run(call):
+            if isinstance(call, HarvestError):
+                return call
+            method, kwargs = call
+            try:
+                return bulk_result(method(**kwargs))
+            except HarvestError as error:
+                return error
+            except BULK_ERRORS as error:
+                return bulk_error(method, error)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(run, calls))
+
+    def fetch_all(self, resource, *args, concurrency=4, **kwargs):
+        """
+        Fetches every page of a list endpoint. The first page is requested to
+        learn `total_pages`, the remaining pages are then requested concurrently
+        within the client's rate limit and the records reassembled in page order.
+
+        :param resource: Name of the list method, eg. `time_entries` or `invoice_messages`
+        :type resource: str
+        :param args: Positional arguments of the list method, eg. the `invoice_id` of `invoice_messages`
+        :param concurrency: Maximum number of pages in flight at once, defaults to `4`
+        :type concurrency: int
+        :param kwargs: Filters handed to the list method on every page
+        :return: Return a list of every record across all pages, or of the body of every page when decoding `raw`.
+        :rtype: list
+        """
+        list_method = getattr(self, resource, None)
+        if resource.startswith('_') or not callable(list_method):
+            raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+        data_class = self._list_request(resource, *args, **kwargs)[1]
+        first_page = list_method(*args, **kwargs)
+        first_pagination = pagination(first_page)
+        if first_pagination is None:
+            raise HarvestError('Resource "{0}" is not paginated.'.format(resource))
+
+        records = list(page_records(first_page, data_class))
+        page, total_pages, _ = first_pagination
+
+        if total_pages is None or page >= total_pages:
+            return records
+
+        def fetch_page(page):
+            return list_method(*args, **dict(kwargs, page=page))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for page in executor.map(fetch_page, range(page + 1, total_pages + 1)):
+                records.extend(page_records(page, data_class))
+
+        return records
+
+    def _iter_pages(self, list_method, *args, **kwargs):
+        """
+        Lazily yields the page returned by `list_method` and every page after
+        it by following `links.next`. Only one page is held at a time.
+        """
+        page = list_method(*args, **kwargs)
+        yield page
+
+        data_class = type(page)
+        next_link = pagination(page)[2]
+        while next_link is not None:
+            page = self._from_dict(data_class=data_class, data=self._get(next_link))
+            yield page
+            next_link = pagination(page)[2]
+
+    def _iter_records(self, list_method, *args, **kwargs):
+        """
+        Lazily yields the individual records of every page from `list_method`,
+        or the body of every page when decoding `raw`.
+        """
+        data_class = self._list_request(list_method.__name__, *args, **kwargs)[1]
+        for page in self._iter_pages(list_method, *args, **kwargs):
+            yield from page_records(page, data_class)
+
+    def _list_request(self, resource, *args, **kwargs):
+        """
+        :return: `(path, data class)` of the GET request the list method `resource` makes, found by running it without any I/O.
+        :rtype: tuple
+        """
+        calls = []
+
+        def request(method='GET', path='/', data=None, files=None):
+            if method != 'GET':
+                raise HarvestError('Resource "{0}" is not a list.'.format(resource))
+            calls.append(path)
+
+        # a copy which can't touch this client's caches or settings
+        client = copy.copy(self)
+        client.cache = None
+        client._company_settings = ReferenceCache(maxsize=1, ttl=None)
+        client._request = request
+        client._from_dict = lambda data_class, data: calls.append(data_class)
+        getattr(client, resource)(*args, **kwargs)
+        if len(calls) != 2:
+            raise HarvestError('Resource "{0}" does not make a single request.'.format(resource))
+        if list_field(calls[1]) is None:
+            raise HarvestError('Resource "{0}" is not a list.'.format(resource))
+        return tuple(calls)
+
+    def stream_records(self, resource, *args, **kwargs):
+        """
+        Lazily yields the records of every page of a list or report endpoint,
+        eg. `time_entries` or `reports_time_clients`, decoding each record
+        as soon as it has been received. With ijson installed a page is
+        parsed while it downloads, so a `per_page=2000` page is never held
+        whole in memory. Without it each page is parsed once downloaded.
+        Records are dataclasses, or dicts unless decoding `dataclass`.
+
+        :param resource: Name of the list method
+        :type resource: str
+        :param args: Positional arguments of the list method
+        :param kwargs: Filters handed to the list method
+        """
+        list_method = getattr(self, resource, None)
+        if resource.startswith('_') or not callable(list_method):
+            raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+        path, data_class = self._list_request(resource, *args, **kwargs)
+        records = list_field(data_class)
+        if records is None:
+            raise HarvestError('Resource "{0}" is not paginated.'.format(resource))
+        field_name, record_class = records
+
+        while path is not None:
+            resp = self._request('GET', path, stream=True)
+            try:
+                path = yield from self._stream_page(resp, field_name, record_class)
+            finally:
+                resp.close()
+
+    def _stream_page(self, resp, field_name, record_class):
+        """
+        Yields the records of the `field_name` list of a streamed page.
+
+        :return: The `links.next` of the page.
+        """
+        if ijson is None:
+            page = resp.json()
+            for record in page.get(field_name, []):
+                yield self._decode_record(record_class, record)
+            return (page.get('links') or {}).get('next')
+
+        resp.raw.decode_content = True
+        parser = PageParser(field_name)
+        for prefix, event, value in ijson.parse(resp.raw, use_float=True):
+            record = parser.feed(prefix, event, value)
+            if record is not None:
+                yield self._decode_record(record_class, record)
+        return parser.next_link
+
+    def _decode_record(self, record_class, record):
+        if self.decode != 'dataclass':
+            return record
+        return from_dict(data_class=record_class, data=record, interned=self.interned)
+
+    def _cached(self, kind, key, load):
+        """
+        Returns the `kind` entity `key` from the cache, or calls `load` and caches what it returns.
+        Keys are kept as strings, so `get_user('5')` and `get_user(5)` are the same entry.
+        """
+        if self.cache is None:
+            return load()
+
+        cache_key = (kind, str(key), self.decode)
+        value = self.cache.get(cache_key)
+        if value is None:
+            value = load()
+            self.cache.set(cache_key, value)
+        return value
+
+    def _remember(self, kind, key, value):
+        if self.cache is not None:
+            self.cache.set((kind, str(key), self.decode), value)
+
+    def _invalidate(self, kind, key):
+        if self.cache is not None:
+            for decode in self.DECODE_MODES:
+                self.cache.invalidate((kind, str(key), decode))
+
+    def _from_dict(self, data_class, data):
+        if self.decode != 'dataclass':
+            return data
+        return from_dict(data_class=data_class, data=data, interned=self.interned)
 
     def _get(self, path='/', data=None):
         return self._request('GET', path, data)
@@ -1007,13 +1625,59 @@ class Harvest(object):
     def _patch(self, path='/', data=None, files=None):
         return self._request('PATCH', path, data, files)
 
-    def _request(self, method='GET', path='/', data=None, files=None):
-        url = '{self.uri}{path}'.format(self=self, path=path)
+    def _rate_limiter(self, url):
+        # Reports requests have a limit of 100 request in 15 mins, general requests 100 in 15 seconds
+        if '/reports/' in url:
+            return self.reports_rate_limiter
+        return self.rate_limiter
+
+    def _url(self, path):
+        # pagination links from the API are absolute urls
+        if urlparse(path).scheme:
+            return path
+        return '{self.uri}{path}'.format(self=self, path=path)
+
+    def _token_expired(self):
+        return isinstance(self.__auth, OAuth2_ServerSide) and (datetime.utcfromtimestamp(self.__auth.token.expires_at) <= datetime.now())
+
+    def _refresh_token(self):
+        # "auto" refresh_token. Currently only works on Authorization Code flow
+        new_session = OAuth2Session(client_id=self.__auth.client_id, token=asdict(self.__auth.token))
+        oauth_token = new_session.refresh_token(self.__auth.refresh_url, client_id=self.__auth.client_id, client_secret=self.__auth.client_secret)
+        self.__auth = from_dict(data_class=OAuth2_ServerSide_Token, data=oauth_token)
+
+    def _account_key(self):
+        """
+        What `response_cache` and `archive` keep responses by, the account
+        or, for OAuth2 tokens without one, the user they were issued to, so
+        responses outlive a refreshed or reissued token.
+        """
+        account_id = self.__headers.get('Harvest-Account-ID')
+        if account_id is not None:
+            return account_id
+
+        if 'id' not in self._token_user:
+            self._token_user['id'] = self.with_decode('dict', caches=False)._get('/users/me')['id']
+        return 'user {0}'.format(self._token_user['id'])
+
+    def _response_cache_key(self, url):
+        return self.response_cache.key(self._account_key(), url)
+
+    def _decode_body(self, body):
+        return body if self.decode == 'raw' else json.loads(body)
+
+    def _request(self, method='GET', path='/', data=None, files=None, stream=False):
+        """
+        :param stream: Return the successful `requests.Response` with its body still to be read, bypassing `response_cache` and `archive`, defaults to `False`
+        :type stream: bool
+        """
+        url = self._url(path)
 
         kwargs = {
             'method': method,
-            'url': '{self.uri}{path}'.format(self=self, path=path),
-            'headers': copy.deepcopy(self.__headers)
+            'url': url,
+            'headers': copy.deepcopy(self.__headers),
+            'stream': stream
         }
 
         # patch to get the file object working
@@ -1023,66 +1687,66 @@ class Harvest(object):
             kwargs['data'] = data
         if data is not None:
             kwargs['data'] = json.dumps(data)
-            
 
-        requestor = requests
-
-
-        # request throttling
-        if '/reports/' in url:
-            # Reports requests have a limit of 100 request in 15 mins
-            now = datetime.now()
-            self.reports_throttle.append(now)
-            oldest_time = self.reports_throttle.popleft()
-            aged_delta = now - oldest_time
-            if aged_delta <= self.reports_time_limit:
-                self.reports_throttle.appendleft(oldest_time)
-
-                if (len(self.reports_throttle) > self.RATE_LIMIT_REQUEST_COUNT):
-                    time.sleep(self.RATE_LIMIT_REPORTS_DURATION_SECONDS * (aged_delta / self.reports_time_limit))
-        else:
-            # General requests have a limit of 100 request in 15 seconds
-            now = datetime.now()
-            self.request_throttle.append(now)
-            oldest_time = self.request_throttle.popleft()
-            aged_delta = now - oldest_time
-            if aged_delta <= self.request_time_limit:
-                self.request_throttle.appendleft(oldest_time)
-
-                if (len(self.request_throttle) > self.RATE_LIMIT_REQUEST_COUNT):
-                    time.sleep(self.RATE_LIMIT_REQUESTS_DURATION_SECONDS * (aged_delta / self.request_time_limit))
-
-        # "auto" refresh_token. Currently only works on Authorization Code flow
-        if isinstance(self.__auth, OAuth2_ServerSide) and (datetime.utcfromtimestamp(self.__auth.token.expires_at) <= datetime.now()):
-            new_session = OAuth2Session(client_id=self.__auth.client_id, token=asdict(self.__auth.token))
-            oauth_token = new_session.refresh_token(self.__auth.refresh_url, client_id=self.__auth.client_id, client_secret=self.__auth.client_secret)
-            self.__auth = from_dict(data_class=OAuth2_ServerSide_Token, data=oauth_token)
-
-        resp = requestor.request(**kwargs)
-
-        if resp.status_code == 500:
-            raise HarvestError('There was a server error for your request. Contact support@getharvest.com for help. url: {0}'.format(resp.url))
-
-        elif resp.status_code == 429:
-            raise HarvestError('Your request has been throttled. Raise an issue on the project in GitHub. https://github.com/bradbase/python-harvest_apiv2')
-
-        elif resp.status_code == 422:
-            raise HarvestError('There were errors processing your request. {0} {1}'.format(resp.url, resp.text))
-
-        elif resp.status_code == 404:
-            raise HarvestError('The object you requested can’t be found. {0}'.format(resp.url))
-
-        elif resp.status_code == 403:
-            raise HarvestError('The object you requested was found but you don’t have authorization to perform your request. {0}'.format(resp.url))
-
-        elif resp.status_code in [200, 201]:
-
-            if 'DELETE' not in method:
-                try:
-                    return resp.json()
-                except:
+        archive_key = None
+        if method == 'GET' and self.archive is not None and not stream:
+            archive_key = self.archive.closed_key(self._account_key(), url)
+            if archive_key is not None:
+                body = self.archive.get(archive_key)
+                if body is not None:
+                    return self._decode_body(body)
+
+        cache_key = None
+        if method == 'GET' and self.response_cache is not None and not stream:
+            cache_key = self._response_cache_key(url)
+            kwargs['headers'].update(self.response_cache.request_headers(cache_key))
+
+        attempt = 0
+        while True:
+            rate_limiter = self._rate_limiter(url)
+            rate_limiter.acquire()
+
+            if self._token_expired():
+                self._refresh_token()
+
+            resp = self.session.request(**kwargs)
+            rate_limiter.update_from_headers(resp.headers)
+
+            if resp.status_code == 304 and cache_key is not None:
+                body = self.response_cache.not_modified(cache_key)
+                if body is not None:
+                    return self._decode_body(body)
+                # dropped from the store since the request was sent, ask again for the whole response
+                kwargs['headers'].pop('If-None-Match', None)
+                kwargs['headers'].pop('If-Modified-Since', None)
+                continue
+
+            if resp.status_code in [200, 201]:
+
+                if stream:
                     return resp
-            return resp
 
-        else:
-            raise HarvestError('Unsupported HTTP response code. {0} {1} {2}'.format(resp.status_code, resp.url, resp.text))
+                if cache_key is not None:
+                    self.response_cache.update(cache_key, resp.headers, resp.content)
+                if archive_key is not None:
+                    self.archive.set(archive_key, resp.content)
+
+                if method == 'GET' and self.decode == 'raw':
+                    return resp.content
+
+                if 'DELETE' not in method:
+                    try:
+                        return resp.json()
+                    except:
+                        return resp
+                return resp
+
+            # uploaded file objects can't be rewound, so those requests aren't retried
+            delay = None
+            if files is None:
+                delay = self.retry_policy.retry_delay(method, resp.status_code, resp.headers.get('Retry-After'), attempt)
+            if delay is None:
+                raise_for_status(resp.status_code, resp.url, resp.text)
+
+            time.sleep(delay)
+            attempt += 1
@@ -1,10 +1,24 @@
 
 # Copyright 2020 Bradbase
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Optional, List
 from dataclasses_json import config, dataclass_json
 
+def slotted(cls):
+    """
+    Rebuilds a dataclass with `__slots__` instead of a per-instance `__dict__`,
+    like `@dataclass(slots=True)` on Python 3.10+. Used on the records a full
+    export holds by the hundred thousand and the references nested in them.
+    Apply above `@dataclass`.
+    """
+    field_names = tuple(data_field.name for data_field in fields(cls))
+    namespace = dict(cls.__dict__)
+    for name in field_names + ('__dict__', '__weakref__'):
+        namespace.pop(name, None)
+    namespace['__slots__'] = field_names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
 @dataclass
 class Auth:
     auth_type: str
@@ -115,6 +129,7 @@ class Company:
     thousands_separator: str = None
     color_scheme: str = None
 
+@slotted
 @dataclass
 class ExpenseCategory:
     unit_name: Optional[str]
@@ -125,11 +140,13 @@ class ExpenseCategory:
     created_at: str = None
     updated_at: str = None
 
+@slotted
 @dataclass
 class InvoiceRef:
     id: int = None
     number: str = None
 
+@slotted
 @dataclass
 class Receipt:
     url: str = None
@@ -137,16 +154,19 @@ class Receipt:
     file_size: int = None
     content_type: str = None
 
+@slotted
 @dataclass
 class User:
     id: int = None
     name: str = None
 
+@slotted
 @dataclass
 class ClientRef:
     id: int = None
     name: str = None
 
+@slotted
 @dataclass
 class Client:
     address: Optional[str]
@@ -158,6 +178,7 @@ class Client:
     updated_at: str = None
 
 
+@slotted
 @dataclass
 class UserAssignment:
     budget: Optional[float]
@@ -168,12 +189,14 @@ class UserAssignment:
     updated_at: str = None
     hourly_rate: float = None
 
+@slotted
 @dataclass
 class ProjectRef:
     code: Optional[str]
     id: int = None
     name: str = None
 
+@slotted
 @dataclass
 class Expense:
     locked_reason: Optional[str]
@@ -196,6 +219,7 @@ class Expense:
     expense_category: ExpenseCategory = None
     client: Client = None
 
+@slotted
 @dataclass
 class LineItem:
     project: Optional[ProjectRef]
@@ -231,11 +255,13 @@ class LineItemImport:
     expenses: Optional[ExpenseImport]
     project_ids: List[int]
 
+@slotted
 @dataclass
 class Creator:
     id: int = None
     name: str = None
 
+@slotted
 @dataclass
 class Estimate:
     purchase_order: Optional[str]
@@ -263,6 +289,7 @@ class Estimate:
     currency: str = None
     creator: Creator = None
 
+@slotted
 @dataclass
 class Invoice:
     purchase_order: Optional[str]
@@ -437,11 +464,13 @@ class EstimateItemCategory:
     created_at: str = None
     updated_at: str = None
 
+@slotted
 @dataclass
 class TaskRef:
     id: str = None
     name: str = None
 
+@slotted
 @dataclass
 class Task:
     default_hourly_rate: Optional[float]
@@ -453,11 +482,13 @@ class Task:
     created_at: str = None
     updated_at: str = None
 
+@slotted
 @dataclass
 class TaskAssignmentRef:
     id: int = None
     name: str = None
 
+@slotted
 @dataclass
 class TaskAssignment:
     budget: Optional[float]
@@ -470,6 +501,7 @@ class TaskAssignment:
     project: ProjectRef = None
     task: TaskAssignmentRef = None
 
+@slotted
 @dataclass
 class UserAssignment:
     budget: Optional[float]
@@ -482,6 +514,7 @@ class UserAssignment:
     project: ProjectRef = None
     user: User = None
 
+@slotted
 @dataclass
 class ProjectTaskAssignments:
     hourly_rate: Optional[float]
@@ -493,6 +526,7 @@ class ProjectTaskAssignments:
     updated_at: str = None
     task: TaskRef = None
 
+@slotted
 @dataclass
 class ExternalRef:
     id: str = None
@@ -501,6 +535,7 @@ class ExternalRef:
     service: str = None
     service_icon_url: str = None
 
+@slotted
 @dataclass
 class TimeEntry:
     notes: Optional[str]
@@ -597,6 +632,7 @@ class ProjectAssignment:
     client: ClientRef = None
     task_assignment: List[ProjectTaskAssignments] = None
 
+@slotted
 @dataclass
 class User:
     default_hourly_rate: Optional[float]
@@ -621,6 +657,7 @@ class User:
     roles: List[str] = None
     avatar_url: str = None
 
+@slotted
 @dataclass
 class DetailedTimeEntry:
     notes: Optional[str]
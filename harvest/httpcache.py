@@ -0,0 +1,300 @@
+# Copyright 2020 Bradbase
+
+"""
+Conditional GET support. The body of every GET response carrying an `ETag`
+or `Last-Modified` header is kept, later requests for the same url and
+account send `If-None-Match` and `If-Modified-Since`, and a `304 Not
+Modified` answer is served from the kept body, eg.
+
+    harvest = Harvest(uri, auth, response_cache=ResponseCache())
+
+Every request still reaches Harvest and counts against the rate limit, but
+unchanged pages aren't downloaded or sent again.
+
+`ClosedPeriodCache` goes further for requests of periods ending before a
+lock horizon, eg. month-end reruns of last month's reports. They are
+answered from the store without any request, eg.
+
+    harvest = Harvest(uri, auth, archive=ClosedPeriodCache(DirectoryResponseStore('harvest-archive'), lock_days=45))
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .cache import ReferenceCache
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class MemoryResponseStore(object):
+    """
+    Keeps the most recently used responses in memory.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        :param maxsize: Number of responses kept before the least recently used is dropped, defaults to `1024`
+        :type maxsize: int
+        """
+        self._responses = ReferenceCache(maxsize=maxsize, ttl=None)
+
+    def get(self, key):
+        return self._responses.get(key)
+
+    def set(self, key, response):
+        self._responses.set(key, response)
+
+    def clear(self):
+        self._responses.clear()
+
+
+class SQLiteResponseStore(object):
+    """
+    Keeps responses in a SQLite database so they outlive the process.
+    """
+
+    def __init__(self, path, timeout=30):
+        """
+        :param path: Path of the SQLite database file, created if missing
+        :type path: str
+        :param timeout: Seconds to wait for another process holding the database lock, defaults to `30`
+        :type timeout: float
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connection().execute('CREATE TABLE IF NOT EXISTS http_responses (key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL)')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """
+        Closes the calling thread's connection to the database.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def get(self, key):
+        row = self._connection().execute('SELECT body, etag, last_modified FROM http_responses WHERE key = ?', (key,)).fetchone()
+        return CachedResponse(*row) if row is not None else None
+
+    def set(self, key, response):
+        self._connection().execute('INSERT OR REPLACE INTO http_responses (key, etag, last_modified, body) VALUES (?, ?, ?, ?)',
+            (key, response.etag, response.last_modified, response.body))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM http_responses')
+
+
+class DirectoryResponseStore(object):
+    """
+    Keeps each response body in its own gzip compressed file of a directory.
+    Validators aren't kept, it's meant for a `ClosedPeriodCache`.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Directory of the files, created if missing
+        :type path: str
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json.gz')
+
+    def get(self, key):
+        try:
+            with gzip.open(self._file(key), 'rb') as response_file:
+                return CachedResponse(response_file.read())
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, response):
+        # written aside and renamed so a reader never sees half a file
+        path = self._file(key)
+        partial_path = '{0}.{1}.partial'.format(path, threading.get_ident())
+        with gzip.open(partial_path, 'wb') as response_file:
+            response_file.write(response.body)
+        os.replace(partial_path, path)
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith('.json.gz'):
+                os.remove(os.path.join(self.path, name))
+
+
+class ResponseCache(object):
+    """
+    Sends conditional GET requests for the responses in `store` and counts
+    how many were answered `304 Not Modified`. One cache can be shared by
+    clients of different accounts, responses are kept by url and account.
+    """
+
+    def __init__(self, store=None):
+        """
+        :param store: Where responses are kept, defaults to a `MemoryResponseStore()`
+        :type store: MemoryResponseStore or SQLiteResponseStore or None
+        """
+        self.store = store if store is not None else MemoryResponseStore()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(account_id, url):
+        return '{0} {1}'.format(account_id or '', url)
+
+    def request_headers(self, key):
+        """
+        :return: The `If-None-Match` and `If-Modified-Since` headers for the response kept for `key`.
+        :rtype: dict
+        """
+        response = self.store.get(key)
+        if response is None:
+            return {}
+
+        headers = {}
+        if response.etag is not None:
+            headers['If-None-Match'] = response.etag
+        if response.last_modified is not None:
+            headers['If-Modified-Since'] = response.last_modified
+        return headers
+
+    def not_modified(self, key):
+        """
+        :return: The body kept for `key`, answered `304 Not Modified`, or `None` when there's none.
+        :rtype: bytes or None
+        """
+        response = self.store.get(key)
+        if response is not None:
+            with self._lock:
+                self.hits += 1
+            return response.body
+        return None
+
+    def update(self, key, headers, body):
+        """
+        Keeps `body` when `headers` hold an `ETag` or `Last-Modified` to revalidate it with.
+        """
+        with self._lock:
+            self.misses += 1
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if etag is not None or last_modified is not None:
+            self.store.set(key, CachedResponse(bytes(body), etag, last_modified))
+
+    def stats(self):
+        """
+        :return: Counts of `hits`, answered `304 Not Modified`, `misses`, downloaded in full, and the `hit_rate`.
+        :rtype: dict
+        """
+        requests = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / requests if requests else 0.0}
+
+
+# resources whose records of a closed period stay as they are, unlike eg. invoices still to be paid
+ARCHIVED_RESOURCES = ('reports', 'time_entries', 'expenses')
+
+
+def period_end(url):
+    """
+    :return: The date of the `to` or `to_date` filter of `url`, `None` without one.
+    :rtype: date or None
+    """
+    query = parse_qs(urlsplit(url).query)
+    for name in ('to', 'to_date'):
+        for value in query.get(name, []):
+            for date_format in ('%Y-%m-%d', '%Y%m%d'):
+                try:
+                    return datetime.strptime(value, date_format).date()
+                except ValueError:
+                    pass
+    return None
+
+
+class ClosedPeriodCache(object):
+    """
+    Answers GET requests of periods closed to changes from `store` without
+    sending them. A period is closed when its `to` date is more than
+    `lock_days` days ago, requests of open periods, without a `to` date or
+    of other resources than `resources` are always sent. The first request
+    of a closed period is sent and its response kept for good, so
+    `lock_days` must be long enough that time and expenses of a period are
+    no longer changed, eg. marked billed, by then.
+    """
+
+    def __init__(self, store=None, lock_days=30, clock=time.time, resources=ARCHIVED_RESOURCES):
+        """
+        :param store: Where responses are kept, eg. `SQLiteResponseStore` or `DirectoryResponseStore`, defaults to a `MemoryResponseStore()`
+        :param lock_days: Days after its `to` date a period is closed, defaults to `30`
+        :type lock_days: int
+        :param clock: Function returning the current time in seconds since the epoch, defaults to `time.time`
+        :type clock: callable
+        :param resources: Resources whose requests are archived, matched against the segments of the url path, defaults to `reports`, `time_entries` and `expenses`
+        :type resources: tuple
+        """
+        self.store = store if store is not None else MemoryResponseStore()
+        self.lock_days = lock_days
+        self.clock = clock
+        self.resources = frozenset(resources)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def closed_key(self, account_id, url):
+        """
+        :return: The key `url` is kept under when it requests a closed period, otherwise `None`.
+        :rtype: str or None
+        """
+        if self.resources.isdisjoint(urlsplit(url).path.split('/')):
+            return None
+        to_date = period_end(url)
+        if to_date is None or to_date > date.fromtimestamp(self.clock()) - timedelta(days=self.lock_days):
+            return None
+        return ResponseCache.key(account_id, url)
+
+    def get(self, key):
+        """
+        :return: The body kept for `key`, `None` when it's still to be requested.
+        :rtype: bytes or None
+        """
+        response = self.store.get(key)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return response.body
+
+    def set(self, key, body):
+        self.store.set(key, CachedResponse(bytes(body)))
+
+    def stats(self):
+        """
+        :return: Counts of `hits`, answered from the store, `misses`, sent, and the `hit_rate` of requests of closed periods.
+        :rtype: dict
+        """
+        requests = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / requests if requests else 0.0}
@@ -0,0 +1,134 @@
+# Copyright 2020 Bradbase
+
+"""
+Time and expense reports computed from records synced into a `SQLiteStore`.
+They return the same results as the `reports_time_*` and
+`reports_expenses_*` methods without spending any of the reports rate
+limit, eg.
+
+    sync.sync_all(('time_entries', 'expenses', 'users'))
+    reports = LocalReports(sync.store)
+    reports.reports_time_projects('20170101', '20171231')
+
+Each report is a single `GROUP BY` over the stored JSON, one result per
+group and currency. Users are joined in for `is_contractor` when synced.
+"""
+
+from dataclasses import fields
+from datetime import date
+
+from .harvestdataclasses import *
+
+# report name, columns of the result and the JSON path each one is read from
+TIME_REPORT_GROUPS = {
+    'clients': (('client_id', '$.client.id'), ('client_name', '$.client.name')),
+    'projects': (('client_id', '$.client.id'), ('client_name', '$.client.name'), ('project_id', '$.project.id'), ('project_name', '$.project.name')),
+    'tasks': (('task_id', '$.task.id'), ('task_name', '$.task.name')),
+    'team': (('user_id', '$.user.id'), ('user_name', '$.user.name')),
+}
+
+EXPENSE_REPORT_GROUPS = {
+    'clients': (('client_id', '$.client.id'), ('client_name', '$.client.name')),
+    'projects': (('client_id', '$.client.id'), ('client_name', '$.client.name'), ('project_id', '$.project.id'), ('project_name', '$.project.name')),
+    'categories': (('expense_category_id', '$.expense_category.id'), ('expense_category_name', '$.expense_category.name')),
+    'team': (('user_id', '$.user.id'), ('user_name', '$.user.name')),
+}
+
+TIME_TOTALS = (
+    ('total_hours', "SUM(json_extract(synced.record, '$.hours'))"),
+    ('billable_hours', "SUM(CASE WHEN json_extract(synced.record, '$.billable') THEN json_extract(synced.record, '$.hours') ELSE 0 END)"),
+    ('billable_amount', "SUM(CASE WHEN json_extract(synced.record, '$.billable') THEN json_extract(synced.record, '$.hours') * COALESCE(json_extract(synced.record, '$.billable_rate'), 0) ELSE 0 END)"),
+)
+
+EXPENSE_TOTALS = (
+    ('total_amount', "SUM(json_extract(synced.record, '$.total_cost'))"),
+    ('billable_amount', "SUM(CASE WHEN json_extract(synced.record, '$.billable') THEN json_extract(synced.record, '$.total_cost') ELSE 0 END)"),
+)
+
+
+def report_date(value):
+    """
+    :param value: A date, or a string formatted `YYYYMMDD` like the reports endpoints take or `YYYY-MM-DD`
+    :return: `value` formatted `YYYY-MM-DD` like the stored `spent_date`.
+    :rtype: str
+    """
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    value = str(value)
+    if len(value) == 8 and value.isdigit():
+        return '{0}-{1}-{2}'.format(value[:4], value[4:6], value[6:])
+    return value
+
+
+class LocalReports(object):
+    """
+    The time and expense reports of `Harvest` answered from a `SQLiteStore`
+    kept up to date by `Sync`. Results are only as current as the last sync.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: Store holding the synced `time_entries`, `expenses` and optionally `users`
+        :type store: SQLiteStore
+        """
+        self.store = store
+
+    def _report(self, resource, groups, totals, result_class, from_date, to_date):
+        columns = ["json_extract(synced.record, '{0}')".format(path) for _, path in groups]
+        columns.append("json_extract(synced.record, '$.client.currency')")
+        names = [name for name, _ in groups] + ['currency']
+
+        if groups[0][0] == 'user_id':
+            columns.append("json_extract(synced_user.record, '$.is_contractor')")
+            names.append('is_contractor')
+            join = "LEFT JOIN sync_records AS synced_user ON synced_user.resource = 'users' AND synced_user.id = json_extract(synced.record, '$.user.id')"
+        else:
+            join = ''
+
+        sql = ("SELECT {columns}, {totals} FROM sync_records AS synced {join} "
+            "WHERE synced.resource = ? AND json_extract(synced.record, '$.spent_date') BETWEEN ? AND ? "
+            "GROUP BY {group_by} ORDER BY {group_by}").format(
+                columns=', '.join(columns),
+                totals=', '.join(total for _, total in totals),
+                join=join,
+                group_by=', '.join(str(position) for position in range(1, len(columns) + 1)))
+        names.extend(name for name, _ in totals)
+
+        empty = {result_field.name: None for result_field in fields(result_class)}
+        results = []
+        for row in self.store.query(sql, (resource, report_date(from_date), report_date(to_date))):
+            result = dict(empty, **dict(zip(names, row)))
+            if result['is_contractor'] is not None:
+                result['is_contractor'] = bool(result['is_contractor'])
+            results.append(result_class(**result))
+        return results
+
+    def _time_report(self, report, from_date, to_date):
+        return TimeReportResults(self._report('time_entries', TIME_REPORT_GROUPS[report], TIME_TOTALS, TimeReportResult, from_date, to_date))
+
+    def _expense_report(self, report, from_date, to_date):
+        return ExpenseReportResults(self._report('expenses', EXPENSE_REPORT_GROUPS[report], EXPENSE_TOTALS, ExpenseReportResult, from_date, to_date))
+
+    def reports_time_clients(self, from_date, to_date):
+        return self._time_report('clients', from_date, to_date)
+
+    def reports_time_projects(self, from_date, to_date):
+        return self._time_report('projects', from_date, to_date)
+
+    def reports_time_tasks(self, from_date, to_date):
+        return self._time_report('tasks', from_date, to_date)
+
+    def reports_time_team(self, from_date, to_date):
+        return self._time_report('team', from_date, to_date)
+
+    def reports_expenses_clients(self, from_date, to_date):
+        return self._expense_report('clients', from_date, to_date)
+
+    def reports_expenses_projects(self, from_date, to_date):
+        return self._expense_report('projects', from_date, to_date)
+
+    def reports_expenses_categories(self, from_date, to_date):
+        return self._expense_report('categories', from_date, to_date)
+
+    def reports_expenses_team(self, from_date, to_date):
+        return self._expense_report('team', from_date, to_date)
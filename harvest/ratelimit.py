@@ -0,0 +1,229 @@
+# Copyright 2020 Bradbase
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# leading number and optional window of headers like `100` or `100;w=15`
+_HEADER_VALUE = re.compile(r'^\s*(\d+(?:\.\d+)?)(?:.*?;\s*w=(\d+(?:\.\d+)?))?')
+
+
+class MemoryBackend(object):
+    """
+    Keeps a `RateLimiter`'s state in memory, shared by the threads of one process.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def state(self):
+        """
+        Yields the limiter state, a dict the caller may change, holding a lock until the block exits.
+        """
+        with self._lock:
+            yield self._state
+
+
+class SQLiteBackend(object):
+    """
+    Keeps a `RateLimiter`'s state in a SQLite database so every process on a
+    host pointing at the same file draws from one budget. Each reservation is
+    a short `BEGIN IMMEDIATE` transaction. Timestamps come from the wall clock
+    as monotonic clocks are not comparable between processes.
+    """
+
+    clock = staticmethod(time.time)
+
+    def __init__(self, path, key, timeout=30):
+        """
+        :param path: Path of the SQLite database file, created if missing
+        :type path: str
+        :param key: Name of the budget, one per account and window, eg. `ACCOUNT_ID:requests:15` and `ACCOUNT_ID:reports:900`. Limiters of different windows must not share a key
+        :type key: str
+        :param timeout: Seconds to wait for another process holding the database lock, defaults to `30`
+        :type timeout: float
+        """
+        self.path = path
+        self.key = key
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, state TEXT NOT NULL)')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """
+        Closes the calling thread's connection to the database.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    @contextmanager
+    def state(self):
+        """
+        Yields the limiter state, a dict the caller may change, inside a write transaction.
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT state FROM rate_limits WHERE key = ?', (self.key,)).fetchone()
+            state = json.loads(row[0]) if row is not None else {}
+            yield state
+            connection.execute('INSERT OR REPLACE INTO rate_limits (key, state) VALUES (?, ?)', (self.key, json.dumps(state)))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+
+class RateLimiter(object):
+    """
+    Sliding window rate limiter allowing at most `count` requests in any
+    `period` seconds. Slots are reserved atomically in the limiter's backend,
+    so one limiter can be shared by threads and by several `Harvest`
+    instances using the same account. With a `SQLiteBackend` several
+    processes share the budget too.
+
+    When the server reports its rate limit in response headers the limiter
+    adapts to them, see `update_from_headers`. Otherwise `count` and `period`
+    apply.
+    """
+
+    def __init__(self, count, period, clock=None, backend=None):
+        """
+        :param count: Number of requests allowed per window
+        :type count: int
+        :param period: Length of the window in seconds
+        :type period: float
+        :param clock: Function returning the current time in seconds, defaults to the backend's clock
+        :type clock: callable or None
+        :param backend: Where the limiter state lives, defaults to `MemoryBackend()`
+        :type backend: MemoryBackend or SQLiteBackend or None
+        """
+        self.count = count
+        self.period = period
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.clock = clock if clock is not None else self.backend.clock
+        self.requests = 0
+        self.wait_time = 0.0
+        # the counters are this limiter's own, the backend's lock may be in another process
+        self._counters_lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Reserves the next free slot.
+
+        :return: Seconds the caller has to wait before sending its request.
+        :rtype: float
+        """
+        with self.backend.state() as state:
+            now = self.clock()
+            # start times of the most recent `count` slots, some may be in the future
+            slots = state.get('slots', [])[-self.count:]
+            start = now
+            if len(slots) == self.count:
+                start = max(now, slots[0] + self.period)
+
+            # requests the server says are left before `budget_reset`
+            budget_reset = state.get('budget_reset')
+            if budget_reset is not None and start < budget_reset:
+                if state['budget'] > 0:
+                    state['budget'] -= 1
+                else:
+                    start = budget_reset
+
+            slots.append(start)
+            state['slots'] = slots[-self.count:]
+
+            delay = start - now
+
+        with self._counters_lock:
+            self.requests += 1
+            self.wait_time += delay
+        return delay
+
+    def acquire(self):
+        """
+        Reserves the next free slot and sleeps until it starts.
+
+        :return: Seconds spent waiting.
+        :rtype: float
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def update(self, limit=None, remaining=None, reset=None, period=None):
+        """
+        Adapts the limiter to the rate limit reported by the server.
+
+        :param limit: Requests allowed per window
+        :type limit: int or None
+        :param remaining: Requests left in the current window
+        :type remaining: int or None
+        :param reset: Seconds until the current window resets
+        :type reset: float or None
+        :param period: Length of the window in seconds
+        :type period: float or None
+        """
+        if period is not None and period > 0:
+            self.period = period
+
+        if limit is not None and limit > 0:
+            self.count = limit
+
+        if remaining is not None and reset is not None:
+            with self.backend.state() as state:
+                state['budget'] = remaining
+                state['budget_reset'] = self.clock() + reset
+
+    def update_from_headers(self, headers):
+        """
+        Reads `X-RateLimit-Limit`, `X-RateLimit-Remaining` and `X-RateLimit-Reset`
+        (or their `RateLimit-*` equivalents) from a response and calls `update`.
+        A reset larger than a day is taken as a unix timestamp.
+
+        :return: Whether any rate limit header was present.
+        :rtype: bool
+        """
+        limit, period = self._header_value(headers, 'Limit')
+        remaining, _ = self._header_value(headers, 'Remaining')
+        reset, _ = self._header_value(headers, 'Reset')
+
+        if limit is None and remaining is None and reset is None:
+            return False
+
+        if reset is not None and reset > 86400:
+            reset = max(0.0, reset - time.time())
+
+        self.update(limit=int(limit) if limit is not None else None,
+            remaining=int(remaining) if remaining is not None else None,
+            reset=reset,
+            period=period)
+        return True
+
+    @staticmethod
+    def _header_value(headers, name):
+        value = headers.get('X-RateLimit-' + name) or headers.get('RateLimit-' + name)
+        match = _HEADER_VALUE.match(value) if value else None
+        if match is None:
+            return None, None
+        return float(match.group(1)), float(match.group(2)) if match.group(2) else None
@@ -0,0 +1,96 @@
+# Copyright 2020 Bradbase
+
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed response is retried and how long to wait first.
+
+    Throttled (429) responses were never processed by Harvest so they are
+    retried for every method. Server errors are only retried for `methods`,
+    which defaults to the idempotent GET and DELETE; add POST or PATCH to
+    opt in. The wait honours `Retry-After` on 429 and 503 responses and is
+    otherwise a jittered exponential backoff.
+    """
+
+    def __init__(self, max_retries=5, backoff_factor=0.5, max_backoff=60, methods=('GET', 'DELETE'), statuses=(429, 500, 502, 503, 504)):
+        """
+        :param max_retries: Retries per request before the error is raised, defaults to `5`
+        :type max_retries: int
+        :param backoff_factor: Seconds to wait before the first retry, doubled for every retry after it, defaults to `0.5`
+        :type backoff_factor: float
+        :param max_backoff: Upper bound on a backoff in seconds, a `Retry-After` from the server is always honoured, defaults to `60`
+        :type max_backoff: float
+        :param methods: HTTP methods retried on server errors, defaults to `('GET', 'DELETE')`
+        :type methods: tuple
+        :param statuses: HTTP status codes which are retried, defaults to `(429, 500, 502, 503, 504)`
+        :type statuses: tuple
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.methods = tuple(method.upper() for method in methods)
+        self.statuses = tuple(statuses)
+        self.retries = 0
+        self.retry_wait = 0.0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def retry_delay(self, method, status_code, retry_after=None, attempt=0):
+        """
+        :param method: HTTP method of the failed request
+        :type method: str
+        :param status_code: HTTP status code of the response
+        :type status_code: int
+        :param retry_after: Value of the `Retry-After` response header, defaults to `None`
+        :type retry_after: str or None
+        :param attempt: Number of retries already made for this request, defaults to `0`
+        :type attempt: int
+        :return: Seconds to wait before retrying, or `None` when the response should be raised.
+        :rtype: float or None
+        """
+        if status_code not in self.statuses or (status_code != 429 and method.upper() not in self.methods):
+            return None
+
+        if attempt >= self.max_retries:
+            with self._lock:
+                self.failures += 1
+            return None
+
+        delay = None
+        if status_code in (429, 503):
+            delay = self.parse_retry_after(retry_after)
+        if delay is None:
+            backoff = min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+
+        with self._lock:
+            self.retries += 1
+            self.retry_wait += delay
+        return delay
+
+    @staticmethod
+    def parse_retry_after(retry_after):
+        """
+        :return: Seconds requested by a `Retry-After` header given in seconds or as an HTTP date, `None` if absent or invalid.
+        :rtype: float or None
+        """
+        if not retry_after:
+            return None
+
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
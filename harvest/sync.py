@@ -0,0 +1,319 @@
+# Copyright 2020 Bradbase
+
+"""
+Incremental sync of list endpoints into a local store. The first sync of a
+resource downloads every record, later syncs only ask for records updated
+since the newest `updated_at` already stored.
+"""
+
+import json
+import sqlite3
+import threading
+from calendar import monthrange
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List
+
+from .harvest import HarvestError, page_records
+from .localreports import report_date
+
+SYNC_RESOURCES = ('time_entries', 'expenses', 'invoices', 'clients', 'projects', 'users', 'tasks')
+
+# date filtered by `from_date` and `to_date`, reconciliation compares one month of these at a time
+WINDOW_FIELDS = {'time_entries': 'spent_date', 'expenses': 'spent_date', 'invoices': 'issue_date'}
+
+
+@dataclass
+class SyncResult:
+    resource: str
+    updated_since: str
+    checkpoint: str
+    fetched: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+
+@dataclass
+class ReconcileResult:
+    resource: str
+    windows: int = 0
+    scanned: int = 0
+    deleted: List[int] = field(default_factory=list)
+    restored: int = 0
+
+
+class SQLiteStore(object):
+    """
+    Keeps the checkpoint and a copy of every record of each synced resource
+    in a SQLite database. Records are stored as the JSON sent by Harvest.
+    """
+
+    def __init__(self, path, timeout=30):
+        """
+        :param path: Path of the SQLite database file, created if missing
+        :type path: str
+        :param timeout: Seconds to wait for another process holding the database lock, defaults to `30`
+        :type timeout: float
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with self.transaction() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS sync_checkpoints (resource TEXT PRIMARY KEY, updated_since TEXT, filters TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS sync_records (resource TEXT NOT NULL, id INTEGER NOT NULL, updated_at TEXT, record TEXT NOT NULL, PRIMARY KEY (resource, id))')
+            # stores created before the filters were kept
+            if 'filters' not in [column[1] for column in connection.execute('PRAGMA table_info(sync_checkpoints)')]:
+                connection.execute('ALTER TABLE sync_checkpoints ADD COLUMN filters TEXT')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """
+        Closes the calling thread's connection to the database.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    @contextmanager
+    def transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def checkpoint(self, resource):
+        """
+        :return: The `updated_at` of the newest stored record of `resource`, `None` before its first sync.
+        :rtype: str or None
+        """
+        row = self._connection().execute('SELECT updated_since FROM sync_checkpoints WHERE resource = ?', (resource,)).fetchone()
+        return row[0] if row is not None else None
+
+    def sync_filters(self, resource):
+        """
+        :return: The filters `resource` was synced with, `{}` before its first sync or when synced unfiltered.
+        :rtype: dict
+        """
+        row = self._connection().execute('SELECT filters FROM sync_checkpoints WHERE resource = ?', (resource,)).fetchone()
+        return json.loads(row[0]) if row is not None and row[0] is not None else {}
+
+    def set_checkpoint(self, resource, updated_since, connection=None, filters=None):
+        """
+        :param filters: Filters the records of `resource` are synced with, dates are kept as strings, defaults to `None` for none
+        :type filters: dict or None
+        """
+        (connection or self._connection()).execute('INSERT OR REPLACE INTO sync_checkpoints (resource, updated_since, filters) VALUES (?, ?, ?)',
+            (resource, updated_since, json.dumps(filters, sort_keys=True, default=str) if filters else None))
+
+    def upsert(self, resource, records, connection=None):
+        """
+        Stores `records`, replacing the stored copy of records already present.
+
+        :return: Number of records `(inserted, updated, unchanged)`, a record is unchanged when its `updated_at` is.
+        :rtype: tuple
+        """
+        connection = connection or self._connection()
+        inserted = updated = unchanged = 0
+        for record in records:
+            row = connection.execute('SELECT updated_at FROM sync_records WHERE resource = ? AND id = ?', (resource, record['id'])).fetchone()
+            if row is None:
+                inserted += 1
+            elif row[0] == record.get('updated_at'):
+                unchanged += 1
+                continue
+            else:
+                updated += 1
+            connection.execute('INSERT OR REPLACE INTO sync_records (resource, id, updated_at, record) VALUES (?, ?, ?, ?)',
+                (resource, record['id'], record.get('updated_at'), json.dumps(record)))
+        return inserted, updated, unchanged
+
+    def delete(self, resource, ids, connection=None):
+        """
+        Removes the stored copies of the records `ids`.
+
+        :return: Number of records removed.
+        :rtype: int
+        """
+        connection = connection or self._connection()
+        return sum(connection.execute('DELETE FROM sync_records WHERE resource = ? AND id = ?', (resource, record_id)).rowcount for record_id in ids)
+
+    def records(self, resource):
+        """
+        Lazily yields the stored records of `resource` as dicts, ordered by id.
+        """
+        for row in self._connection().execute('SELECT record FROM sync_records WHERE resource = ? ORDER BY id', (resource,)):
+            yield json.loads(row[0])
+
+    def count(self, resource):
+        return self._connection().execute('SELECT COUNT(*) FROM sync_records WHERE resource = ?', (resource,)).fetchone()[0]
+
+    def query(self, sql, parameters=()):
+        """
+        :return: The rows of a read only query of the store's tables, eg. `sync_records`.
+        :rtype: list
+        """
+        return self._connection().execute(sql, parameters).fetchall()
+
+    def window_counts(self, resource, date_field=None):
+        """
+        :return: Number of stored records of `resource` by month of `date_field`, eg. `{'2017-03': 120}`, or `{None: count}` without a `date_field`.
+        :rtype: dict
+        """
+        if date_field is None:
+            count = self.count(resource)
+            return {None: count} if count else {}
+        return dict(self._connection().execute('SELECT substr(json_extract(record, ?), 1, 7), COUNT(*) FROM sync_records WHERE resource = ? GROUP BY 1',
+            ('$.' + date_field, resource)))
+
+    def window_ids(self, resource, date_field=None, month=None):
+        """
+        :return: Ids of the stored records of `resource` whose `date_field` falls in `month`, all of them without a `date_field`.
+        :rtype: set
+        """
+        if date_field is None:
+            rows = self._connection().execute('SELECT id FROM sync_records WHERE resource = ?', (resource,))
+        else:
+            rows = self._connection().execute('SELECT id FROM sync_records WHERE resource = ? AND substr(json_extract(record, ?), 1, 7) = ?',
+                (resource, '$.' + date_field, month))
+        return {row[0] for row in rows}
+
+
+class Sync(object):
+    """
+    Syncs list endpoints of a `Harvest` client into a store, eg.
+
+        sync = Sync(harvest, SQLiteStore('harvest.sqlite'))
+        result = sync.sync('time_entries')
+
+    Each page is stored in its own transaction. The checkpoint only advances
+    once every page is stored, so an interrupted sync is simply run again.
+    """
+
+    def __init__(self, harvest, store, per_page=100):
+        """
+        :param harvest: Client to request the records with, its `response_cache` and `archive` are not used
+        :type harvest: Harvest
+        :param store: Where checkpoints and records are kept
+        :type store: SQLiteStore
+        :param per_page: Records requested per page, defaults to `100`
+        :type per_page: int
+        """
+        # a sync must see the records as they are now, never an archived or cached copy
+        self.harvest = harvest.with_decode('dict', caches=False)
+        self.store = store
+        self.per_page = per_page
+
+    def sync(self, resource, **kwargs):
+        """
+        :param resource: Name of the list method, eg. `time_entries`, see `SYNC_RESOURCES`
+        :type resource: str
+        :param kwargs: Filters handed to the list method on every page, keep them the same between syncs of a resource as they share its checkpoint
+        :return: Counts of the records fetched, inserted, updated and unchanged.
+        :rtype: SyncResult
+        """
+        list_method = getattr(self.harvest, resource, None)
+        if resource.startswith('_') or not callable(list_method):
+            raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+        updated_since = self.store.checkpoint(resource)
+        result = SyncResult(resource, updated_since, updated_since)
+        filters = json.loads(json.dumps({name: value for name, value in kwargs.items() if name != 'per_page'}, default=str))
+        kwargs = dict(kwargs, per_page=self.per_page)
+        if updated_since is not None:
+            kwargs['updated_since'] = updated_since
+
+        data_class = self.harvest._list_request(resource, **kwargs)[1]
+        for page in self.harvest._iter_pages(list_method, **kwargs):
+            records = page_records(page, data_class)
+            with self.store.transaction() as connection:
+                inserted, updated, unchanged = self.store.upsert(resource, records, connection)
+            result.fetched += len(records)
+            result.inserted += inserted
+            result.updated += updated
+            result.unchanged += unchanged
+            for record in records:
+                if record.get('updated_at') is not None and (result.checkpoint is None or record['updated_at'] > result.checkpoint):
+                    result.checkpoint = record['updated_at']
+
+        if result.checkpoint != updated_since or filters != self.store.sync_filters(resource):
+            self.store.set_checkpoint(resource, result.checkpoint, filters=filters)
+        return result
+
+    def reconcile(self, resource, scan_per_page=2000):
+        """
+        Removes stored records deleted on the server, which `updated_since`
+        never reports. The stored records are counted by month and each month
+        compared with the `total_entries` of a one record page for the same
+        `from_date` and `to_date`. Only months whose counts differ are scanned
+        in full. Resources without a date filter are compared as one window.
+        Both requests carry the filters the resource was synced with, months
+        are narrowed to its `from_date` and `to_date`.
+        A deletion hidden by a creation in the same month, that wasn't synced
+        yet, goes unnoticed until that creation is synced.
+
+        :param resource: Name of the list method, eg. `time_entries`
+        :type resource: str
+        :param scan_per_page: Records requested per page when scanning a window, defaults to `2000`
+        :type scan_per_page: int
+        :return: Windows compared and scanned, ids deleted and records stored which were missing.
+        :rtype: ReconcileResult
+        """
+        list_method = getattr(self.harvest, resource, None)
+        if resource.startswith('_') or not callable(list_method):
+            raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+        data_class = self.harvest._list_request(resource)[1]
+        date_field = WINDOW_FIELDS.get(resource)
+        result = ReconcileResult(resource)
+        filters = self.store.sync_filters(resource)
+
+        for month, count in sorted(self.store.window_counts(resource, date_field).items(), key=lambda item: item[0] or ''):
+            if date_field is not None and month is None:
+                continue
+
+            window = dict(filters)
+            if month is not None:
+                year, month_number = int(month[:4]), int(month[5:7])
+                # YYYY-MM-DD strings compare like the dates
+                window['from_date'] = max(report_date(value) for value in ('{0}-01'.format(month), filters.get('from_date')) if value is not None)
+                window['to_date'] = min(report_date(value) for value in ('{0}-{1:02d}'.format(month, monthrange(year, month_number)[1]), filters.get('to_date')) if value is not None)
+
+            result.windows += 1
+            if list_method(per_page=1, **window)['total_entries'] == count:
+                continue
+
+            result.scanned += 1
+            records = [record for page in self.harvest._iter_pages(list_method, per_page=scan_per_page, **window) for record in page_records(page, data_class)]
+            server_ids = {record['id'] for record in records}
+            stored_ids = self.store.window_ids(resource, date_field, month)
+
+            deleted = sorted(stored_ids - server_ids)
+            missing = [record for record in records if record['id'] not in stored_ids]
+            with self.store.transaction() as connection:
+                self.store.delete(resource, deleted, connection)
+                self.store.upsert(resource, missing, connection)
+            result.deleted.extend(deleted)
+            result.restored += len(missing)
+
+        return result
+
+    def sync_all(self, resources=SYNC_RESOURCES):
+        """
+        :return: `SyncResult` of each resource by name.
+        :rtype: dict
+        """
+        return {resource: self.sync(resource) for resource in resources}
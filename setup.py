@@ -72,6 +72,16 @@ setup(
         build=[
             'pip-tools',
         ],
+        asyncio=[
+            'aiohttp',
+        ],
+        arrow=[
+            'pyarrow',
+        ],
+        streaming=[
+            'ijson',
+            'brotli',
+        ],
     ),
     python_requires='>=3.7',
     tests_require=TESTS_REQUIRE,
@@ -0,0 +1,355 @@
+# Copyright 2020 Bradbase
+
+import os, sys
+import unittest
+import asyncio
+import json
+import tempfile
+import threading
+from dacite import from_dict
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import HarvestError, TIME_ENTRY_PERMISSION_MESSAGE
+from harvest.harvestdataclasses import *
+from harvest.httpcache import ResponseCache
+from harvest.ratelimit import RateLimiter, SQLiteBackend
+from harvest.retry import RetryPolicy
+
+try:
+    from aiohttp import web
+    from harvest.asyncharvest import AsyncHarvest, AsyncDetailedReports
+except ImportError:
+    web = None
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class TestAsyncHarvest(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+
+        self.user_1782959_dict = {
+                "id":1782959,
+                "first_name":"Kim",
+                "last_name":"Allen",
+                "email":"kimallen@example.com",
+                "telephone":"",
+                "timezone":"Eastern Time (US & Canada)",
+                "has_access_to_all_future_projects":True,
+                "is_contractor":False,
+                "is_admin":False,
+                "is_project_manager":True,
+                "can_see_rates":False,
+                "can_create_projects":False,
+                "can_create_invoices":False,
+                "is_active":True,
+                "created_at":"2017-06-26T22:32:52Z",
+                "updated_at":"2017-06-26T22:33:31Z",
+                "weekly_capacity":126000,
+                "default_hourly_rate":100.0,
+                "cost_rate":50.0,
+                "roles":["Designer"],
+                "avatar_url":"https://cache.harvestapp.com/assets/profile_images/big_ben.png?1485372046"
+            }
+
+        self.company_dict = {
+                "base_uri":"https://{ACCOUNT_SUBDOMAIN}.harvestapp.com",
+                "full_domain":"{ACCOUNT_SUBDOMAIN}.harvestapp.com",
+                "name":"API Examples",
+                "is_active":True,
+                "week_start_day":"Monday",
+                "wants_timestamp_timers":False
+            }
+
+        self.time_entry_dict = {
+                "id":636708723,
+                "spent_date":"2017-03-01",
+                "user":{"id":1782959, "name":"Kim Allen"},
+                "client":{"id":5735774, "name":"ABC Corp", "currency":"USD", "address":None},
+                "project":{"id":14307913, "name":"Marketing Website", "code":"MW"},
+                "task":{"id":8083365, "name":"Graphic Design", "default_hourly_rate":None},
+                "hours":2.0,
+                "notes":"Adding CSS styling",
+                "locked_reason":None,
+                "timer_started_at":None,
+                "started_time":None,
+                "ended_time":None,
+                "invoice":None,
+                "external_reference":None,
+                "billable":True,
+                "billable_rate":100.0,
+                "cost_rate":50.0
+            }
+
+    def page(self, page, total_pages):
+        return {
+                "time_entries":[dict(self.time_entry_dict, id=page)],
+                "per_page":1,
+                "total_pages":total_pages,
+                "total_entries":total_pages,
+                "next_page":None,
+                "previous_page":None,
+                "page":page,
+                "links":{
+                        "first":"",
+                        "next":"{0}/api/v2/time_entries?page={1}&per_page=1".format(self.base_url, page + 1) if page < total_pages else None,
+                        "previous":None,
+                        "last":""
+                    }
+            }
+
+    async def serve(self, handler):
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        self.base_url = 'http://127.0.0.1:{0}'.format(site._server.sockets[0].getsockname()[1])
+        return runner
+
+    async def handler(self, request):
+        self.requests.append((request.method, request.path_qs, await request.text()))
+
+        if request.path in ('/api/v2/users/1782959', '/api/v2/users/me'):
+            return web.json_response(self.user_1782959_dict)
+        elif request.path == '/api/v2/company':
+            if request.headers.get('If-None-Match') == '"company"':
+                return web.Response(status=304)
+            return web.json_response(self.company_dict, headers={'ETag': '"company"'})
+        elif request.path == '/api/v2/time_entries' and request.method == 'POST':
+            return web.json_response(self.time_entry_dict, status=201)
+        elif request.path == '/api/v2/time_entries':
+            return web.json_response(self.page(int(request.query['page']), 3))
+        elif request.path == '/api/v2/time_entries/1' and request.method == 'DELETE':
+            return web.Response(status=200)
+        return web.Response(status=404)
+
+    def run_async(self, coroutine):
+        async def with_server():
+            runner = await self.serve(self.handler)
+            try:
+                return await coroutine()
+            finally:
+                await runner.cleanup()
+        return asyncio.run(with_server())
+
+    def test_mirrors_harvest_methods(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+
+        async def scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token) as harvest:
+                user = await harvest.get_user(1782959)
+                # create_time_entry makes two requests, company() then the POST
+                time_entry = await harvest.create_time_entry_via_duration(14307913, 8083365, '2017-03-01', hours=2.0)
+                deleted = await harvest.delete_time_entry(1)
+                with self.assertRaises(HarvestError):
+                    await harvest.get_user(404)
+                return user, time_entry, deleted
+
+        user, time_entry, deleted = self.run_async(scenario)
+
+        self.assertEqual(user, from_dict(data_class=User, data=self.user_1782959_dict))
+        self.assertEqual(time_entry, from_dict(data_class=TimeEntry, data=self.time_entry_dict))
+        self.assertIsNone(deleted)
+        self.assertEqual([(method, path) for method, path, body in self.requests], [
+                ('GET', '/api/v2/users/1782959'),
+                ('GET', '/api/v2/company?page=1&per_page=100'),
+                ('POST', '/api/v2/time_entries'),
+                ('DELETE', '/api/v2/time_entries/1'),
+                ('GET', '/api/v2/users/404'),
+            ])
+        self.assertEqual(json.loads(self.requests[2][2]), {'hours':2.0, 'project_id':14307913, 'task_id':8083365, 'spent_date':'2017-03-01'})
+
+    def test_create_time_entries(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+
+        async def scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token) as harvest:
+                results = await harvest.create_time_entries(False, [
+                        {"project_id":14307913, "task_id":8083365, "spent_date":"2017-03-01", "hours":2.0},
+                        {"project_id":14307913, "spent_date":"2017-03-01", "hours":2.0},
+                    ])
+                time_entry = await harvest.create_time_entry_via_duration(14307913, 8083365, '2017-03-02', hours=1.0)
+                return results, time_entry
+
+        results, time_entry = self.run_async(scenario)
+
+        self.assertEqual(results, [from_dict(data_class=TimeEntry, data=self.time_entry_dict), ErrorMessage("Time entry is missing task_id.")])
+        self.assertEqual(time_entry, from_dict(data_class=TimeEntry, data=self.time_entry_dict))
+        self.assertEqual([(method, path) for method, path, body in self.requests], [
+                ('GET', '/api/v2/company?page=1&per_page=100'),
+                ('POST', '/api/v2/time_entries'),
+                ('POST', '/api/v2/time_entries'),
+            ])
+
+    def test_bulk(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+
+        async def scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token) as harvest:
+                return await harvest.bulk([
+                        ('create_time_entry_via_duration', {'project_id': 14307913, 'task_id': 8083365, 'spent_date': '2017-03-01', 'hours': 2.0}),
+                        ('delete_time_entry', {'time_entry_id': 1}),
+                        ('delete_time_entry', {'time_entry_id': 2}),
+                        ('users', {}),
+                        ('create_client', {'nam': 'typo'}),
+                        ('create_time_entry_via_start_and_end_time', {'project_id': 14307913, 'task_id': 8083365, 'spent_date': '2017-03-01', 'started_time': '8:00am'}),
+                    ])
+
+        results = self.run_async(scenario)
+
+        self.assertEqual(results[0], from_dict(data_class=TimeEntry, data=self.time_entry_dict))
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], HarvestError)
+        self.assertIsInstance(results[3], HarvestError)
+        self.assertIn('create_client failed. TypeError', str(results[4]))
+        self.assertEqual(str(results[5]), TIME_ENTRY_PERMISSION_MESSAGE)
+        self.assertEqual(sorted((method, path) for method, path, body in self.requests), [
+                ('DELETE', '/api/v2/time_entries/1'),
+                ('DELETE', '/api/v2/time_entries/2'),
+                ('GET', '/api/v2/company?page=1&per_page=100'),
+                ('GET', '/api/v2/company?page=1&per_page=100'),
+                ('POST', '/api/v2/time_entries'),
+            ])
+
+    def test_response_cache(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        response_cache = ResponseCache()
+
+        async def scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token, response_cache=response_cache) as harvest:
+                return [await harvest.company(), await harvest.company()]
+
+        companies = self.run_async(scenario)
+
+        self.assertEqual(companies[0], companies[1])
+        self.assertEqual(response_cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+        # responses of OAuth2 tokens are kept by the user of the token
+        self.requests = []
+
+        async def oauth_scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', OAuth2_ClientSide_Token('ACCESS_TOKEN', 1209600, 'bearer', []), response_cache=response_cache) as harvest:
+                return [await harvest.company(), await harvest.company()]
+
+        self.run_async(oauth_scenario)
+
+        self.assertEqual([path for method, path, body in self.requests], ['/api/v2/users/me', '/api/v2/company?page=1&per_page=100', '/api/v2/company?page=1&per_page=100'])
+        self.assertEqual(response_cache.stats(), {'hits': 2, 'misses': 2, 'hit_rate': 0.5})
+
+    def test_rate_limiters(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        reserving_threads = []
+
+        class RecordingBackend(SQLiteBackend):
+            def state(self):
+                reserving_threads.append(threading.get_ident())
+                return super().state()
+
+        with tempfile.TemporaryDirectory() as directory:
+            backend = RecordingBackend(os.path.join(directory, 'limits.sqlite'), key='ACCOUNT_NUMBER:requests:15')
+            rate_limiter = RateLimiter(100, 15, backend=backend)
+            reports_rate_limiter = RateLimiter(100, 15)
+
+            async def scenario():
+                async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token, rate_limiter=rate_limiter, reports_rate_limiter=reports_rate_limiter) as harvest:
+                    self.assertIs(harvest._harvest.rate_limiter, rate_limiter)
+                    self.assertIs(harvest._harvest.reports_rate_limiter, reports_rate_limiter)
+                    await harvest.company()
+                    return threading.get_ident()
+
+            loop_thread = self.run_async(scenario)
+
+        self.assertEqual(rate_limiter.requests, 1)
+        self.assertEqual(reports_rate_limiter.requests, 0)
+        # the blocking SQLite transactions run off the event loop
+        self.assertTrue(reserving_threads)
+        self.assertNotIn(loop_thread, reserving_threads)
+
+    def test_retry_policy_and_company_ttl(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        handler = self.handler
+        throttled = []
+
+        async def throttling_handler(request):
+            if request.path == '/api/v2/users/1782959' and not throttled:
+                throttled.append(request.path)
+                return web.Response(status=429, headers={'Retry-After': '0'})
+            return await handler(request)
+
+        self.handler = throttling_handler
+
+        async def scenario(retry_policy):
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token, retry_policy=retry_policy) as harvest:
+                return await harvest.get_user(1782959)
+
+        with self.assertRaises(HarvestError):
+            self.run_async(lambda: scenario(RetryPolicy(max_retries=0)))
+
+        self.assertEqual(self.run_async(lambda: scenario(None)), from_dict(data_class=User, data=self.user_1782959_dict))
+
+        # the company settings are read again once `company_ttl` has passed
+        self.requests = []
+
+        async def company_scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token, company_ttl=0) as harvest:
+                await harvest.create_time_entry_via_duration(14307913, 8083365, '2017-03-01')
+                await harvest.create_time_entry_via_duration(14307913, 8083365, '2017-03-01')
+
+        self.run_async(company_scenario)
+
+        self.assertEqual([path for method, path, body in self.requests if path.startswith('/api/v2/company')], ['/api/v2/company?page=1&per_page=100'] * 2)
+
+    def test_pagination(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+
+        async def scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token) as harvest:
+                iterated = [time_entry.id async for time_entry in harvest.iter_time_entries(per_page=1)]
+                fetched = [time_entry.id for time_entry in await harvest.fetch_all('time_entries', per_page=1, concurrency=2)]
+                streamed = [time_entry async for time_entry in harvest.stream_records('time_entries', per_page=1)]
+                return iterated, fetched, streamed
+
+        iterated, fetched, streamed = self.run_async(scenario)
+
+        self.assertEqual(iterated, [1, 2, 3])
+        self.assertEqual(fetched, [1, 2, 3])
+        self.assertEqual(streamed, [from_dict(data_class=TimeEntry, data=dict(self.time_entry_dict, id=page)) for page in range(1, 4)])
+
+    def test_decode(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+
+        async def scenario():
+            async with AsyncHarvest(self.base_url + '/api/v2', personal_access_token, decode='dict') as harvest:
+                user = await harvest.get_user(1782959)
+                iterated = [time_entry['id'] async for time_entry in harvest.iter_time_entries(per_page=1)]
+                raw = harvest.with_decode('raw')
+                raw_user = await raw.get_user(1782959)
+                raw_pages = await raw.fetch_all('time_entries', per_page=1)
+                return user, iterated, raw_user, raw_pages, raw.session is harvest.session
+
+        user, iterated, raw_user, raw_pages, shared_session = self.run_async(scenario)
+
+        self.assertEqual(user, self.user_1782959_dict)
+        self.assertEqual(iterated, [1, 2, 3])
+        self.assertEqual(json.loads(raw_user), self.user_1782959_dict)
+        self.assertEqual([json.loads(page)['page'] for page in raw_pages], [1, 2, 3])
+        self.assertTrue(shared_session)
+
+    def test_detailed_time(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+
+        async def scenario():
+            async with AsyncDetailedReports(self.base_url + '/api/v2', personal_access_token) as detailed_reports:
+                return await detailed_reports.detailed_time()
+
+        report = self.run_async(scenario)
+
+        self.assertEqual(len(report.detailed_time_entries), 3)
+        self.assertEqual(report.detailed_time_entries[0].first_name, 'Kim')
+        self.assertEqual(report.detailed_time_entries[0].billable_amount, 200.0)
+        self.assertEqual(len([request for request in self.requests if request[1] == '/api/v2/users/1782959']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
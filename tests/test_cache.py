@@ -0,0 +1,141 @@
+# Copyright 2020 Bradbase
+
+import sys
+import unittest
+import warnings
+import httpretty
+import json
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import Harvest
+from harvest.cache import ReferenceCache
+from harvest.detailedreports import DetailedReports
+from harvest.harvestdataclasses import *
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestReferenceCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = ReferenceCache(maxsize=2, ttl=None)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        # 'b' is now the least recently used
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'hits':3, 'misses':1, 'evictions':1, 'size':2})
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = ReferenceCache(ttl=60, clock=clock)
+        cache.set('a', 1)
+
+        clock.now += 59
+        self.assertEqual(cache.get('a'), 1)
+        clock.now += 1
+        self.assertEqual(cache.get('a', 'expired'), 'expired')
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = ReferenceCache()
+        cache.set('a', 1)
+        self.assertTrue(cache.invalidate('a'))
+        self.assertFalse(cache.invalidate('a'))
+        self.assertIsNone(cache.get('a'))
+
+class TestHarvestCache(unittest.TestCase):
+
+    def setUp(self):
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.user_dict = {
+                "id":1782959,
+                "first_name":"Kim",
+                "last_name":"Allen",
+                "email":"kimallen@example.com",
+                "default_hourly_rate":100.0,
+                "cost_rate":50.0,
+                "roles":["Designer"]
+            }
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/users/1782959",
+                body=json.dumps(self.user_dict),
+                status=200
+            )
+        httpretty.register_uri(httpretty.PATCH,
+                "https://api.harvestapp.com/api/v2/users/1782959",
+                body=json.dumps(dict(self.user_dict, first_name="Kimberly")),
+                status=200
+            )
+
+    def tearDown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def user_requests(self):
+        return len([request for request in httpretty.latest_requests() if request.method == 'GET'])
+
+    def test_cached_until_updated(self):
+        cache = ReferenceCache()
+        harvest = Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), cache=cache)
+
+        user = harvest.get_user(1782959)
+        self.assertIs(harvest.get_user(1782959), user)
+        self.assertEqual(self.user_requests(), 1)
+        # each decode mode is cached separately
+        self.assertEqual(harvest.with_decode('dict').get_user(1782959), self.user_dict)
+        self.assertEqual(self.user_requests(), 2)
+
+        harvest.update_user(1782959, first_name="Kimberly")
+        self.assertEqual(len(cache), 0)
+        harvest.get_user(1782959)
+        self.assertEqual(self.user_requests(), 3)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_keys_normalised(self):
+        cache = ReferenceCache()
+        harvest = Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), cache=cache)
+
+        harvest.get_user(1782959)
+        harvest.get_user('1782959')
+        self.assertEqual(self.user_requests(), 1)
+
+        harvest.update_user('1782959', first_name="Kimberly")
+        self.assertEqual(len(cache), 0)
+
+    def test_deprecated_detailed_reports_caches(self):
+        detailed_reports = DetailedReports('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'))
+        user = detailed_reports.get_user(1782959)
+
+        with self.assertWarns(DeprecationWarning):
+            user_cache = detailed_reports.user_cache
+        self.assertEqual(dict(user_cache), {1782959: user})
+        with self.assertRaises(TypeError):
+            user_cache[1] = user
+        with self.assertWarns(DeprecationWarning):
+            self.assertEqual(len(detailed_reports.client_cache), 0)
+
+    def test_not_cached_by_default(self):
+        harvest = Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'))
+        harvest.get_user(1782959)
+        harvest.get_user(1782959)
+        self.assertEqual(self.user_requests(), 2)
+
+        detailed_reports = DetailedReports('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'))
+        self.assertIsInstance(detailed_reports.cache, ReferenceCache)
+
+if __name__ == '__main__':
+    unittest.main()
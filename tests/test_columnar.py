@@ -0,0 +1,158 @@
+# Copyright 2020 Bradbase
+
+import os, sys
+import unittest
+import tempfile
+import warnings
+import httpretty
+import json
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import Harvest, HarvestError
+from harvest.decoder import from_dict
+from harvest.columnar import ColumnBuffer, export, iter_column_buffers, record_class, pyarrow
+from harvest.harvestdataclasses import *
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        self.harvest = Harvest('https://api.harvestapp.com/api/v2', personal_access_token)
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.time_entry_dict = {
+                "id":636708723,
+                "spent_date":"2017-03-01",
+                "user":{"id":1782959, "name":"Kim Allen"},
+                "client":{"id":5735774, "name":"ABC Corp", "currency":"USD"},
+                "project":{"id":14307913, "name":"Marketing Website", "code":"MW"},
+                "task":{"id":8083365, "name":"Graphic Design"},
+                "task_assignment":{"id":155502709, "task":{"id":8083365, "name":"Graphic Design"}},
+                "hours":2.0,
+                "notes":"Adding CSS styling",
+                "locked_reason":None,
+                "timer_started_at":None,
+                "started_time":None,
+                "ended_time":None,
+                "invoice":None,
+                "external_reference":None,
+                "billable":True,
+                "billable_rate":100.0,
+                "cost_rate":50.0
+            }
+
+        for page in (1, 2):
+            httpretty.register_uri(httpretty.GET,
+                    "https://api.harvestapp.com/api/v2/time_entries?page={0}&per_page=1".format(page),
+                    body=json.dumps(self.time_entries_page(page)),
+                    status=200,
+                    match_querystring=True
+                )
+
+    def tearDown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def time_entries_page(self, page):
+        return {
+                "time_entries":[dict(self.time_entry_dict, id=page, hours=float(page))],
+                "per_page":1,
+                "total_pages":2,
+                "total_entries":2,
+                "next_page":None,
+                "previous_page":None,
+                "page":page,
+                "links":{
+                        "first":"https://api.harvestapp.com/api/v2/time_entries?page=1&per_page=1",
+                        "next":"https://api.harvestapp.com/api/v2/time_entries?page=2&per_page=1" if page == 1 else None,
+                        "previous":None,
+                        "last":"https://api.harvestapp.com/api/v2/time_entries?page=2&per_page=1"
+                    }
+            }
+
+    def test_column_buffer(self):
+        self.assertIs(record_class(TimeEntries), TimeEntry)
+
+        buffer = ColumnBuffer(TimeEntry)
+        buffer.append(self.time_entry_dict)
+        # dataclasses flatten the same as the dicts they came from
+        buffer.append(from_dict(data_class=TimeEntry, data=self.time_entry_dict))
+
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.data['user.id'], [1782959, 1782959])
+        self.assertEqual(buffer.data['project.name'], ['Marketing Website', 'Marketing Website'])
+        self.assertEqual(buffer.data['task_assignment.task.name'], ['Graphic Design', 'Graphic Design'])
+        self.assertEqual(buffer.data['invoice.number'], [None, None])
+        # TaskRef declares its id a str
+        self.assertEqual(buffer.data['task_assignment.task.id'], ['8083365', '8083365'])
+
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+
+    def test_iter_column_buffers(self):
+        pages = [(len(buffer), list(buffer.data['id']), list(buffer.data['hours'])) for buffer in iter_column_buffers(self.harvest, 'time_entries', per_page=1)]
+        self.assertEqual(pages, [(1, [1], [1.0]), (1, [2], [2.0])])
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/company",
+                body=json.dumps({"name":"API Examples"}),
+                status=200
+            )
+        with self.assertRaises(HarvestError):
+            list(iter_column_buffers(self.harvest, 'company'))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_export(self):
+        import pyarrow.feather
+        import pyarrow.parquet
+
+        with tempfile.TemporaryDirectory() as directory:
+            parquet_path = os.path.join(directory, 'time_entries.parquet')
+            self.assertEqual(export(self.harvest, 'time_entries', parquet_path, per_page=1), 2)
+            table = pyarrow.parquet.read_table(parquet_path)
+            self.assertEqual(table.column('id').to_pylist(), [1, 2])
+            self.assertEqual(table.column('client.name').to_pylist(), ['ABC Corp', 'ABC Corp'])
+            self.assertEqual(table.schema.field('hours').type, pyarrow.float64())
+
+            feather_path = os.path.join(directory, 'time_entries.feather')
+            self.assertEqual(export(self.harvest, 'time_entries', feather_path, format='feather', per_page=1), 2)
+            self.assertEqual(pyarrow.feather.read_table(feather_path).column('user.name').to_pylist(), ['Kim Allen', 'Kim Allen'])
+
+            with self.assertRaises(HarvestError):
+                export(self.harvest, 'time_entries', feather_path, format='csv')
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_export_invoices(self):
+        import pyarrow.parquet
+
+        line_items = [
+                {"id":53341602, "kind":"Service", "description":"03/01/2017 - Project Management: [9:00am - 11:00am] Planning meetings", "quantity":2.0, "unit_price":100.0, "amount":200.0, "taxed":False, "taxed2":False, "project":{"id":14308069, "name":"Online Store - Phase 1", "code":"OS1"}},
+                {"id":53341603, "kind":"Service", "description":"Programming", "quantity":3.0, "unit_price":100.0, "amount":300.0, "taxed":False, "taxed2":False, "project":None},
+            ]
+        invoice_dict = {"id":13150403, "client_key":"21312da13d457947a217da6775477afee8c2eba8", "number":"1001", "purchase_order":"", "amount":500.0, "due_amount":500.0, "tax":None, "tax_amount":0.0, "tax2":None, "tax2_amount":0.0, "discount":None, "discount_amount":0.0, "subject":"Online Store - Phase 1", "notes":"Some notes about the invoice.", "state":"open", "period_start":None, "period_end":None, "issue_date":"2017-04-01", "due_date":"2017-04-01", "payment_term":"upon receipt", "sent_at":"2017-08-23T22:25:59Z", "paid_at":None, "paid_date":None, "closed_at":None, "created_at":"2017-06-27T16:27:16Z", "updated_at":"2017-08-23T22:25:59Z", "currency":"EUR", "client":{"id":5735776, "name":"123 Industries"}, "estimate":None, "retainer":None, "creator":{"id":1782884, "name":"Bob Powell"}, "line_items":line_items}
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/invoices?page=1&per_page=100",
+                body=json.dumps({"invoices":[invoice_dict], "per_page":100, "total_pages":1, "total_entries":1, "next_page":None, "previous_page":None, "page":1, "links":{"first":"", "next":None, "previous":None, "last":""}}),
+                status=200,
+                match_querystring=True
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            parquet_path = os.path.join(directory, 'invoices.parquet')
+            self.assertEqual(export(self.harvest, 'invoices', parquet_path), 1)
+            table = pyarrow.parquet.read_table(parquet_path)
+
+        # lists of nested objects are written as JSON
+        self.assertEqual(table.schema.field('line_items').type, pyarrow.string())
+        self.assertEqual(json.loads(table.column('line_items').to_pylist()[0]), line_items)
+        self.assertEqual(table.column('estimate.line_items').to_pylist(), [None])
+
+        buffer = ColumnBuffer(Invoice)
+        buffer.append(from_dict(data_class=Invoice, data=invoice_dict))
+        self.assertEqual(json.loads(buffer.to_record_batch().column(buffer.schema().get_field_index('line_items'))[0].as_py()), line_items)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,6 +15,7 @@ import json
 sys.path.insert(0, sys.path[0]+"/..")
 
 import harvest
+from harvest.cache import ReferenceCache
 from harvest.harvestdataclasses import *
 
 """
@@ -94,3 +95,20 @@ class TestCompany(unittest.TestCase):
         self.assertEqual(requested_company, company)
 
         httpretty.reset()
+
+    def test_company_settings_refresh(self):
+        company_dict = {"base_uri":"https://{ACCOUNT_SUBDOMAIN}.harvestapp.com", "full_domain":"{ACCOUNT_SUBDOMAIN}.harvestapp.com", "name":"API Examples", "is_active":True, "week_start_day":"Monday", "wants_timestamp_timers":False, "time_format":"hours_minutes", "plan_type":"sponsored", "expense_feature":True, "invoice_feature":True, "estimate_feature":True, "approval_required":True, "clock":"12h", "decimal_symbol":".", "thousands_separator":",", "color_scheme":"orange"}
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/company", body=json.dumps(company_dict), status=200)
+
+        client = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), cache=ReferenceCache())
+        self.assertFalse(client.company_settings().wants_timestamp_timers)
+
+        # refreshing asks Harvest again rather than the client's cache
+        company_dict["wants_timestamp_timers"] = True
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/company", body=json.dumps(company_dict), status=200)
+        self.assertFalse(client.company_settings().wants_timestamp_timers)
+        self.assertTrue(client.company_settings(refresh=True).wants_timestamp_timers)
+        self.assertTrue(client.company().wants_timestamp_timers)
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+
+        httpretty.reset()
@@ -0,0 +1,241 @@
+# Copyright 2020 Bradbase
+
+import sys
+import unittest
+import copy
+import pickle
+import dacite
+import threading
+from dataclasses import dataclass
+from mock import patch
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import decoder
+from harvest.decoder import from_dict, compile_decoder, InternTable, MissingValueError
+from harvest.harvestdataclasses import *
+
+class TestDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.time_entry_dict = {
+                "id":636708723,
+                "spent_date":"2017-03-01",
+                "user":{"id":1782959, "name":"Kim Allen"},
+                "client":{"id":5735774, "name":"ABC Corp", "currency":"USD", "address":None},
+                "project":{"id":14307913, "name":"Marketing Website", "code":"MW"},
+                "task":{"id":8083365, "name":"Graphic Design", "default_hourly_rate":None},
+                "hours":2.0,
+                "notes":"Adding CSS styling",
+                "created_at":"2017-06-27T15:50:15Z",
+                "updated_at":"2017-06-27T16:47:14Z",
+                "is_locked":True,
+                "locked_reason":"Item Approved and Locked for this Time Period",
+                "is_closed":True,
+                "is_billed":False,
+                "timer_started_at":None,
+                "started_time":None,
+                "ended_time":None,
+                "is_running":False,
+                "invoice":{"id":13150378, "number":"1001"},
+                "external_reference":None,
+                "billable":True,
+                "budgeted":True,
+                "billable_rate":100.0,
+                "cost_rate":50.0
+            }
+
+        self.time_entries_dict = {
+                "time_entries":[dict(self.time_entry_dict, id=636708723 + i) for i in range(3)],
+                "per_page":100,
+                "total_pages":1,
+                "total_entries":3,
+                "next_page":None,
+                "previous_page":None,
+                "page":1,
+                "links":{
+                        "first":"https://api.harvestapp.com/v2/time_entries?page=1&per_page=100",
+                        "next":None,
+                        "previous":None,
+                        "last":"https://api.harvestapp.com/v2/time_entries?page=1&per_page=100"
+                    }
+            }
+
+        self.invoice_dict = {
+                "id":13150403,
+                "client_key":"21312da13d457947a217da6775477afee8c2eba8",
+                "number":"1001",
+                "purchase_order":"",
+                "amount":288.9,
+                "due_amount":288.9,
+                "tax":5.0,
+                "tax_amount":13.5,
+                "tax2":2.0,
+                "tax2_amount":5.4,
+                "discount":None,
+                "discount_amount":0.0,
+                "subject":"Online Store - Phase 1",
+                "notes":"Some notes about the invoice.",
+                "state":"open",
+                "period_start":"2017-03-01",
+                "period_end":"2017-03-01",
+                "issue_date":"2017-04-01",
+                "due_date":"2017-04-01",
+                "payment_term":"custom",
+                "sent_at":"2017-08-23T22:25:59Z",
+                "paid_at":None,
+                "paid_date":None,
+                "closed_at":None,
+                "created_at":"2017-06-27T16:27:16Z",
+                "updated_at":"2017-08-23T22:25:59Z",
+                "currency":"EUR",
+                "client":{"id":5735776, "name":"123 Industries"},
+                "estimate":None,
+                "retainer":None,
+                "creator":{"id":1782884, "name":"Bob Powell"},
+                "line_items":[
+                        {
+                            "id":53341602,
+                            "kind":"Service",
+                            "description":"03/01/2017 - Project Management: [9:00am - 11:00am] Planning meetings",
+                            "quantity":2.0,
+                            "unit_price":100.0,
+                            "amount":200.0,
+                            "taxed":True,
+                            "taxed2":True,
+                            "project":{"id":14308069, "name":"Online Store - Phase 1", "code":"OS1"}
+                        },
+                        {
+                            "id":53341603,
+                            "kind":"Service",
+                            "description":"03/01/2017 - Programming: [1:00pm - 2:00pm] Importing products",
+                            "quantity":1.0,
+                            "unit_price":80.0,
+                            "amount":80.0,
+                            "taxed":True,
+                            "taxed2":True,
+                            "project":None
+                        }
+                    ]
+            }
+
+    def test_matches_dacite(self):
+        self.assertEqual(from_dict(data_class=TimeEntry, data=self.time_entry_dict),
+            dacite.from_dict(data_class=TimeEntry, data=self.time_entry_dict))
+        self.assertEqual(from_dict(data_class=Invoice, data=self.invoice_dict),
+            dacite.from_dict(data_class=Invoice, data=self.invoice_dict))
+        self.assertEqual(from_dict(data_class=Company, data={"name":"API Examples"}),
+            dacite.from_dict(data_class=Company, data={"name":"API Examples"}))
+
+    def test_page(self):
+        time_entries = from_dict(data_class=TimeEntries, data=self.time_entries_dict)
+        expected = dacite.from_dict(data_class=TimeEntries, data=self.time_entries_dict)
+
+        # time_entries is an init=False field set after construction
+        self.assertEqual(time_entries, expected)
+        self.assertEqual(time_entries.time_entries, expected.time_entries)
+        self.assertEqual([time_entry.id for time_entry in time_entries.time_entries], [636708723, 636708724, 636708725])
+        self.assertIsInstance(time_entries.time_entries[0].invoice, InvoiceRef)
+        self.assertIsNone(time_entries.time_entries[0].external_reference)
+        self.assertIsInstance(time_entries.links, Links)
+
+    def test_missing_optional_is_none(self):
+        invoice_dict = dict(self.invoice_dict)
+        del invoice_dict['line_items']
+        del invoice_dict['estimate']
+
+        invoice = from_dict(data_class=Invoice, data=invoice_dict)
+        self.assertIsNone(invoice.line_items)
+        self.assertIsNone(invoice.estimate)
+
+    def test_missing_required_value(self):
+        with self.assertRaises(MissingValueError) as context:
+            from_dict(data_class=ErrorMessage, data={})
+        self.assertEqual(context.exception.field_path, 'message')
+
+    def test_cached(self):
+        self.assertIs(compile_decoder(TimeEntry), compile_decoder(TimeEntry))
+
+    def test_decode_while_compiling(self):
+        @dataclass
+        class Reference:
+            id: int
+            name: str
+
+        generate = decoder._generate
+        compiling = threading.Event()
+        resume = threading.Event()
+
+        def slow_generate(data_class):
+            compiling.set()
+            resume.wait(timeout=5)
+            return generate(data_class)
+
+        decoded = []
+        with patch('harvest.decoder._generate', side_effect=slow_generate):
+            compiler = threading.Thread(target=compile_decoder, args=(Reference,))
+            compiler.start()
+            compiling.wait(timeout=5)
+
+            # waits for the decoder being compiled rather than calling the stand in
+            reader = threading.Thread(target=lambda: decoded.append(from_dict(data_class=Reference, data={"id":1, "name":"Kim Allen"})))
+            reader.start()
+            resume.set()
+            compiler.join()
+            reader.join()
+
+        self.assertEqual(decoded, [Reference(id=1, name="Kim Allen")])
+
+    def test_config_falls_back_to_dacite(self):
+        data = dict(self.time_entry_dict, hours="2.0")
+        time_entry = from_dict(data_class=TimeEntry, data=data, config=dacite.Config(type_hooks={float: float}))
+        self.assertEqual(time_entry.hours, 2.0)
+
+    def test_interned(self):
+        interned = {}
+        time_entries = from_dict(data_class=TimeEntries, data=self.time_entries_dict, interned=interned)
+        time_entry_1, time_entry_2, time_entry_3 = time_entries.time_entries
+
+        self.assertIs(time_entry_1.client, time_entry_2.client)
+        self.assertIs(time_entry_1.project, time_entry_3.project)
+        self.assertIsNot(time_entry_1, time_entry_2)
+        self.assertEqual(time_entries, dacite.from_dict(data_class=TimeEntries, data=self.time_entries_dict))
+
+        # shared with later pages through the same dict
+        time_entry = from_dict(data_class=TimeEntry, data=self.time_entry_dict, interned=interned)
+        self.assertIs(time_entry.client, time_entry_1.client)
+        self.assertIsNot(from_dict(data_class=TimeEntry, data=self.time_entry_dict).client, time_entry_1.client)
+
+        # nested lists can't be keyed and are decoded per record
+        user_dict = {"id":1782959, "first_name":"Kim", "roles":["Designer"], "default_hourly_rate":100.0, "cost_rate":50.0}
+        self.assertIsNot(from_dict(data_class=TimeEntry, data=dict(self.time_entry_dict, user=user_dict), interned=interned).user,
+            from_dict(data_class=TimeEntry, data=dict(self.time_entry_dict, user=user_dict), interned=interned).user)
+
+    def test_intern_table(self):
+        interned = InternTable(maxsize=10)
+        time_entries = from_dict(data_class=TimeEntries, data=self.time_entries_dict, interned=interned)
+        self.assertIs(time_entries.time_entries[0].client, time_entries.time_entries[1].client)
+
+        # many distinct users don't grow the table past its size
+        users = [from_dict(data_class=TimeEntry, data=dict(self.time_entry_dict, user={"id":user_id, "name":"Kim Allen"}), interned=interned).user for user_id in range(1000)]
+        self.assertEqual(len(interned), 10)
+
+        # the least recently used are dropped, the client used by every record is kept
+        self.assertIs(from_dict(data_class=TimeEntry, data=dict(self.time_entry_dict, user={"id":999, "name":"Kim Allen"}), interned=interned).user, users[999])
+        self.assertIsNot(from_dict(data_class=TimeEntry, data=dict(self.time_entry_dict, user={"id":0, "name":"Kim Allen"}), interned=interned).user, users[0])
+        self.assertIs(from_dict(data_class=TimeEntry, data=self.time_entry_dict, interned=interned).client, time_entries.time_entries[0].client)
+        self.assertEqual(len(interned), 10)
+
+    def test_slotted_records(self):
+        time_entry = from_dict(data_class=TimeEntry, data=self.time_entry_dict)
+
+        self.assertFalse(hasattr(time_entry, '__dict__'))
+        self.assertFalse(hasattr(time_entry.client, '__dict__'))
+        self.assertEqual(pickle.loads(pickle.dumps(time_entry.project)), time_entry.project)
+        self.assertEqual(copy.deepcopy(time_entry), time_entry)
+        self.assertEqual(TimeEntry(None, None, None, None, None, None, None, None).hours, None)
+        with self.assertRaises(AttributeError):
+            time_entry.unknown_field = 1
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@
 # Copyright 2020 Bradbase
 
 import os, sys
+import csv
+import tempfile
 import unittest
 import configparser
 from dataclasses import asdict
@@ -13,11 +15,12 @@ from dacite import from_dict
 import json
 from mock import patch, Mock
 from datetime import datetime, timedelta, date
+from types import SimpleNamespace
 
 sys.path.insert(0, sys.path[0]+"/..")
 
-from harvest import Harvest
-from harvest.detailedreports import DetailedReports
+from harvest import Harvest, HarvestError
+from harvest.detailedreports import DetailedReports, QueryPlan, plan_time_entries
 from harvest.harvestdataclasses import *
 
 class TestDetailedReports(unittest.TestCase):
@@ -28,9 +31,9 @@ class TestDetailedReports(unittest.TestCase):
         warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
         httpretty.enable()
 
-    # def teardown(self):
-    #     httpretty.reset()
-    #     httpretty.disable()
+    def tearDown(self):
+        httpretty.reset()
+        httpretty.disable()
 
     def test_timeframe_this_week(self, ):
         with patch('harvest.detailedreports.datetime') as datetime_mock:
@@ -199,3 +202,163 @@ class TestDetailedReports(unittest.TestCase):
             all_time = {}
 
             self.assertEqual(detailed_reports_all_time, all_time)
+
+    # httpretty isn't thread safe, the reports below are requested with concurrency=1
+    @staticmethod
+    def register_page(path, name, records, total_pages=1):
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/{0}".format(path),
+                body=json.dumps({name:records, "per_page":100, "total_pages":total_pages, "total_entries":len(records), "next_page":None, "previous_page":None, "page":1,
+                    "links":{"first":"", "next":None, "previous":None, "last":""}}),
+                status=200,
+                match_querystring=True
+            )
+
+    def users_and_time_entries(self, user_count, total_pages=1):
+        users = [{"id":user_id, "first_name":"First {0}".format(user_id), "last_name":"Last", "roles":["Designer"], "default_hourly_rate":100.0, "cost_rate":50.0} for user_id in range(1, user_count + 1)]
+        time_entries = [{
+                "id":user["id"],
+                "spent_date":"2017-03-01",
+                "user":{"id":user["id"], "name":"First {0} Last".format(user["id"])},
+                "client":{"id":5735774, "name":"ABC Corp", "currency":"USD"},
+                "project":{"id":14307913, "name":"Marketing Website", "code":"MW"},
+                "task":{"id":8083365, "name":"Graphic Design"},
+                "hours":2.0,
+                "notes":None,
+                "locked_reason":None,
+                "timer_started_at":None,
+                "started_time":None,
+                "ended_time":None,
+                "invoice":None,
+                "external_reference":None,
+                "billable":True,
+                "billable_rate":100.0,
+                "cost_rate":50.0
+            } for user in users]
+
+        self.register_page("time_entries?page=1&per_page=100", "time_entries", time_entries, total_pages)
+        self.register_page("users?page=1&per_page=100", "users", users)
+        for user in users:
+            httpretty.register_uri(httpretty.GET,
+                    "https://api.harvestapp.com/api/v2/users/{0}".format(user["id"]),
+                    body=json.dumps(user),
+                    status=200
+                )
+
+        return time_entries
+
+    def test_detailed_time_prefetches_users(self):
+        self.users_and_time_entries(DetailedReports.USER_PREFETCH_THRESHOLD + 2)
+
+        report = self.detailed_reports.detailed_time(concurrency=1)
+
+        self.assertEqual([entry.first_name for entry in report.detailed_time_entries][:2], ["First 1", "First 2"])
+        self.assertEqual([request.path for request in httpretty.latest_requests()], ["/api/v2/time_entries?page=1&per_page=100", "/api/v2/users?page=1&per_page=100"])
+
+        # the directory was cached for the next report
+        self.detailed_reports.detailed_time(concurrency=1)
+        self.assertEqual(len(httpretty.latest_requests()), 3)
+
+    def test_detailed_time_gets_few_users(self):
+        self.users_and_time_entries(2)
+
+        self.detailed_reports.detailed_time(concurrency=1)
+
+        self.assertEqual(sorted(request.path for request in httpretty.latest_requests()), ["/api/v2/time_entries?page=1&per_page=100", "/api/v2/users/1", "/api/v2/users/2"])
+
+    def test_time_entry_filters(self):
+        self.assertEqual(self.detailed_reports._time_entry_filters('All Time', [None], [None], [None]), [{}])
+        self.assertEqual(self.detailed_reports._time_entry_filters('All Time', [1, 1], [None], [None]), [{'client_id': 1}])
+        self.assertEqual(self.detailed_reports._time_entry_filters('All Time', [None, 1], [None], [7, 8]), [{'user_id': 7}, {'user_id': 8}])
+        self.assertEqual(self.detailed_reports._time_entry_filters('All Time', [1], [2, 3], [None]), [{'client_id': 1, 'project_id': 2}, {'client_id': 1, 'project_id': 3}])
+        self.assertEqual(self.detailed_reports._time_entry_filters('All Time', [], [None], [None]), [{}])
+        self.assertEqual(self.detailed_reports._time_entry_filters('All Time', [1, '1'], [None], [None]), [{'client_id': 1}])
+        self.assertEqual(self.detailed_reports._time_entry_filters('All Time', ['1'], [2, None], [None]), [{'client_id': '1'}])
+
+        this_year = self.detailed_reports.timeframe('This Year')
+        self.assertEqual(self.detailed_reports._time_entry_filters('This Year', [None], [None], [7]), [dict(this_year, user_id=7)])
+
+    def test_detailed_time_fans_out_filters(self):
+        # scanning every time entry would take 5 pages
+        time_entries = self.users_and_time_entries(3, total_pages=5)
+        # entry 2 is sent for both users
+        self.register_page("time_entries?user_id=2&page=1&per_page=100", "time_entries", time_entries[:2])
+        self.register_page("time_entries?user_id=3&page=1&per_page=100", "time_entries", time_entries[1:])
+
+        with self.assertLogs('harvest.detailedreports', level='INFO') as logs:
+            report = self.detailed_reports.detailed_time(clients=[5735774, None], team=[2, 3, 2], concurrency=1)
+
+        self.assertIn('detailed_time plan: filters of 2 filter combinations, 0 more requests (scan 4, filters 0)', logs.output[0])
+        self.assertEqual([entry.first_name for entry in report.detailed_time_entries], ["First 1", "First 2", "First 3"])
+        self.assertEqual(sorted(request.path for request in httpretty.latest_requests() if request.path.startswith("/api/v2/time_entries")),
+            ["/api/v2/time_entries?page=1&per_page=100", "/api/v2/time_entries?user_id=2&page=1&per_page=100", "/api/v2/time_entries?user_id=3&page=1&per_page=100"])
+
+    def test_detailed_time_scans_time_frame(self):
+        self.users_and_time_entries(3)
+
+        with self.assertLogs('harvest.detailedreports', level='INFO') as logs:
+            report = self.detailed_reports.detailed_time(team=[1, 3], concurrency=1)
+
+        self.assertIn('detailed_time plan: scan of 2 filter combinations, 0 more requests (scan 0, filters not probed)', logs.output[0])
+        self.assertEqual([entry.first_name for entry in report.detailed_time_entries], ["First 1", "First 3"])
+        self.assertEqual(sorted(request.path for request in httpretty.latest_requests() if request.path.startswith("/api/v2/time_entries")),
+            ["/api/v2/time_entries?page=1&per_page=100"])
+
+    def test_detailed_time_scans_string_ids(self):
+        self.users_and_time_entries(3)
+
+        with self.assertLogs('harvest.detailedreports', level='INFO') as logs:
+            report = self.detailed_reports.detailed_time(clients=['5735774'], team=['1', '3'], concurrency=1)
+
+        self.assertIn('detailed_time plan: scan of 2 filter combinations', logs.output[0])
+        self.assertEqual([entry.first_name for entry in report.detailed_time_entries], ["First 1", "First 3"])
+        self.assertEqual([row.first_name for row in self.detailed_reports.iter_detailed_time(team=['1', '3'], concurrency=1)], ["First 1", "First 3"])
+
+    def test_plan_time_entries(self):
+        def page(total_pages):
+            return SimpleNamespace(total_pages=total_pages)
+
+        filters = [{'user_id': 1}, {'user_id': 2}]
+        self.assertEqual(plan_time_entries(filters, {}, page(10), [page(2), page(3)]), QueryPlan('filters', filters, 3, 9, 3))
+        self.assertEqual(plan_time_entries(filters, {}, page(4), [page(3), page(4)]), QueryPlan('scan', [{}], 3, 3, 5))
+        self.assertEqual(plan_time_entries(filters, {}, page(3)), QueryPlan('scan', [{}], 2, 2, None))
+
+    def test_iter_detailed_time(self):
+        time_entries = self.users_and_time_entries(3, total_pages=2)
+        self.register_page("time_entries?page=2&per_page=100", "time_entries", time_entries[2:] + [dict(time_entries[0], id=4)], total_pages=2)
+
+        rows = self.detailed_reports.iter_detailed_time(concurrency=1)
+        self.assertEqual(next(rows).first_name, "First 1")
+        # the second page is only requested once the first is consumed
+        self.assertNotIn("/api/v2/time_entries?page=2&per_page=100", [request.path for request in httpretty.latest_requests()])
+
+        self.assertEqual([row.first_name for row in rows], ["First 2", "First 3", "First 1"])
+
+    def test_write_detailed_time(self):
+        time_entries = self.users_and_time_entries(2)
+        time_entries[1]["external_reference"] = {"id":"1", "group_id":"2", "permalink":"https://example.com/1", "service":"example.com", "service_icon_url":"https://example.com/icon.png"}
+        self.register_page("time_entries?page=1&per_page=100", "time_entries", time_entries)
+        self.register_page("time_entries?user_id=2&page=1&per_page=100", "time_entries", time_entries[1:])
+
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'detailed_time.csv')
+            self.assertEqual(self.detailed_reports.write_detailed_time(csv_path, concurrency=1), 2)
+            with open(csv_path, newline='') as csv_file:
+                rows = list(csv.DictReader(csv_file))
+            self.assertEqual(rows[0]["first_name"], "First 1")
+            self.assertEqual(rows[0]["roles"], "Designer")
+            self.assertEqual(rows[0]["billable_amount"], "200.0")
+            self.assertEqual(rows[1]["external_reference_url"], "https://example.com/1")
+
+            jsonl_path = os.path.join(directory, 'detailed_time.jsonl')
+            self.assertEqual(self.detailed_reports.write_detailed_time(jsonl_path, format='jsonl', team=[2], concurrency=1), 1)
+            with open(jsonl_path, 'rb') as jsonl_file:
+                self.assertNotIn(b'\r', jsonl_file.read())
+            with open(jsonl_path) as jsonl_file:
+                rows = [json.loads(line) for line in jsonl_file]
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0]["first_name"], "First 2")
+            self.assertEqual(rows[0]["roles"], ["Designer"])
+            self.assertEqual(rows[0]["external_reference_url"], "https://example.com/1")
+
+            self.assertRaises(HarvestError, self.detailed_reports.write_detailed_time, jsonl_path, format='xml')
@@ -11,12 +11,17 @@ import httpretty
 import warnings
 from dacite import from_dict
 import json
+import gzip
+import threading
+import requests
 from mock import patch, Mock
 from datetime import datetime, timedelta, date
 
 sys.path.insert(0, sys.path[0]+"/..")
 
-from harvest import Harvest, HarvestError, assemble_query_string
+from harvest import Harvest, HarvestError, TIME_ENTRY_PERMISSION_MESSAGE, assemble_query_string, page_records
+from harvest.retry import RetryPolicy
+from harvest.cache import ReferenceCache
 from harvest.detailedreports import DetailedReports
 from harvest.harvestdataclasses import *
 
@@ -28,7 +33,7 @@ class TestHarvest(unittest.TestCase):
         warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
         httpretty.enable()
 
-    def teardown(self):
+    def tearDown(self):
         httpretty.reset()
         httpretty.disable()
 
@@ -66,10 +71,15 @@ class TestHarvest(unittest.TestCase):
                 status=500
             )
 
-        with self.assertRaises(HarvestError) as context:
-            self.harvest.get_currently_authenticated_user()
+        with patch('harvest.harvest.time.sleep') as sleep_mock:
+            with self.assertRaises(HarvestError) as context:
+                self.harvest.get_currently_authenticated_user()
 
         self.assertTrue('There was a server error for your request.' in str(context.exception))
+        # GET is retried before the error is raised
+        self.assertEqual(len(httpretty.latest_requests()), self.harvest.retry_policy.max_retries + 1)
+        self.assertEqual(sleep_mock.call_count, self.harvest.retry_policy.max_retries)
+        self.assertEqual(self.harvest.retry_policy.failures, 1)
 
         httpretty.reset()
 
@@ -107,10 +117,12 @@ class TestHarvest(unittest.TestCase):
                 status=429
             )
 
-        with self.assertRaises(HarvestError) as context:
-            self.harvest.get_currently_authenticated_user()
+        with patch('harvest.harvest.time.sleep') as sleep_mock:
+            with self.assertRaises(HarvestError) as context:
+                self.harvest.get_currently_authenticated_user()
 
         self.assertTrue('Your request has been throttled.' in str(context.exception))
+        self.assertEqual(len(httpretty.latest_requests()), self.harvest.retry_policy.max_retries + 1)
 
         httpretty.reset()
 
@@ -254,3 +266,475 @@ class TestHarvest(unittest.TestCase):
         key_words = {'per_page':10}
         query_string = assemble_query_string(**key_words)
         self.assertEqual(query_string, target_query_string)
+
+    def test_session_reused_and_closed(self):
+        company_dict = {
+                "base_uri":"https://{ACCOUNT_SUBDOMAIN}.harvestapp.com",
+                "full_domain":"{ACCOUNT_SUBDOMAIN}.harvestapp.com",
+                "name":"API Examples",
+                "wants_timestamp_timers":False
+            }
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/company?page=1&per_page=100",
+                body=json.dumps(company_dict),
+                status=200
+            )
+
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        harvest = Harvest('https://api.harvestapp.com/api/v2', personal_access_token, pool_maxsize=4)
+        session = harvest.session
+        adapter = session.get_adapter('https://api.harvestapp.com')
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+        with patch.object(session, 'close', wraps=session.close) as close_mock:
+            with harvest:
+                harvest.company()
+                harvest.company()
+                self.assertIs(harvest.session, session)
+
+            close_mock.assert_called_once()
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+
+        httpretty.reset()
+
+    def test_iter_clients_follows_links_next(self):
+        client_5735776_dict = {
+                "id":5735776,
+                "name":"123 Industries",
+                "is_active":True,
+                "address":"123 Main St.\r\nAnytown, LA 71223",
+                "created_at":"2017-06-26T21:02:12Z",
+                "updated_at":"2017-06-26T21:34:11Z",
+                "currency":"EUR"
+            }
+
+        client_5735774_dict = {
+                "id":5735774,
+                "name":"ABC Corp",
+                "is_active":True,
+                "address":"456 Main St.\r\nAnytown, CT 06467",
+                "created_at":"2017-06-26T21:01:52Z",
+                "updated_at":"2017-06-26T21:27:07Z",
+                "currency":"USD"
+            }
+
+        clients_page_1_dict = {
+                "clients":[client_5735776_dict],
+                "per_page":1,
+                "total_pages":2,
+                "total_entries":2,
+                "next_page":2,
+                "previous_page":None,
+                "page":1,
+                "links":{
+                        "first":"https://api.harvestapp.com/v2/clients?page=1&per_page=1",
+                        "next":"https://api.harvestapp.com/v2/clients?page=2&per_page=1",
+                        "previous":None,
+                        "last":"https://api.harvestapp.com/v2/clients?page=2&per_page=1"
+                    }
+            }
+
+        clients_page_2_dict = {
+                "clients":[client_5735774_dict],
+                "per_page":1,
+                "total_pages":2,
+                "total_entries":2,
+                "next_page":None,
+                "previous_page":1,
+                "page":2,
+                "links":{
+                        "first":"https://api.harvestapp.com/v2/clients?page=1&per_page=1",
+                        "next":None,
+                        "previous":"https://api.harvestapp.com/v2/clients?page=1&per_page=1",
+                        "last":"https://api.harvestapp.com/v2/clients?page=2&per_page=1"
+                    }
+            }
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients?page=1&per_page=1",
+                body=json.dumps(clients_page_1_dict),
+                status=200
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/v2/clients?page=2&per_page=1",
+                body=json.dumps(clients_page_2_dict),
+                status=200
+            )
+
+        clients = self.harvest.iter_clients(per_page=1)
+        self.assertEqual(len(httpretty.latest_requests()), 0)
+
+        self.assertEqual(next(clients), from_dict(data_class=Client, data=client_5735776_dict))
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+
+        self.assertEqual(list(clients), [from_dict(data_class=Client, data=client_5735774_dict)])
+        self.assertEqual(httpretty.latest_requests()[-1].url, "https://api.harvestapp.com/v2/clients?page=2&per_page=1")
+
+        httpretty.reset()
+
+    def test_fetch_all_keeps_page_order(self):
+        def clients_page(page):
+            return {
+                    "clients":[{"id":page, "name":"Client {0}".format(page), "address":None, "is_active":True, "currency":"USD"}],
+                    "per_page":1,
+                    "total_pages":3,
+                    "total_entries":3,
+                    "next_page":page + 1 if page < 3 else None,
+                    "previous_page":page - 1 if page > 1 else None,
+                    "page":page,
+                    "links":{
+                            "first":"https://api.harvestapp.com/v2/clients?page=1&per_page=1",
+                            "next":None,
+                            "previous":None,
+                            "last":"https://api.harvestapp.com/v2/clients?page=3&per_page=1"
+                        }
+                }
+
+        # httpretty isn't thread safe, the session is mocked so the pages really are requested from several threads
+        both_in_flight = threading.Event()
+        requested = []
+
+        def request(method, url, **kwargs):
+            page = int(url.rsplit('page=', 1)[1])
+            requested.append(url)
+            if page == 3:
+                both_in_flight.set()
+            # page 2 is held until page 3 has been requested alongside it and answered first
+            elif page == 2:
+                both_in_flight.wait(timeout=5)
+            resp = requests.Response()
+            resp.status_code = 200
+            resp._content = json.dumps(clients_page(page)).encode('utf-8')
+            resp.url = url
+            return resp
+
+        with patch.object(self.harvest.session, 'request', side_effect=request):
+            clients = self.harvest.fetch_all('clients', is_active=True, per_page=1, concurrency=2)
+            self.assertTrue(both_in_flight.is_set())
+            self.assertEqual([client.id for client in clients], [1, 2, 3])
+            self.assertEqual(sorted(requested), ["https://api.harvestapp.com/api/v2/clients?is_active=true&per_page=1&page={0}".format(page) for page in range(1, 4)])
+
+            # dict pages are split by the field of their dataclass, not the first list they hold
+            both_in_flight.clear()
+            clients = self.harvest.with_decode('dict').fetch_all('clients', is_active=True, per_page=1, concurrency=2)
+            self.assertTrue(both_in_flight.is_set())
+            self.assertEqual([client['id'] for client in clients], [1, 2, 3])
+
+        self.assertEqual(page_records(dict(clients_page(1), notices=["Scheduled maintenance"]), Clients), clients_page(1)["clients"])
+        self.assertEqual(page_records({"notices":["Scheduled maintenance"], "results":[{"client_id":1}]}, TimeReportResults), [{"client_id":1}])
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/company?page=1&per_page=100",
+                body=json.dumps({"name":"API Examples"}),
+                status=200
+            )
+        with self.assertRaises(HarvestError):
+            self.harvest.fetch_all('company')
+
+        httpretty.reset()
+
+    def test_list_request_without_side_effects(self):
+        cache = ReferenceCache()
+        harvest = Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), cache=cache)
+        cache.set(('client', '5', 'dataclass'), Client(None, id=5))
+
+        self.assertEqual(harvest._list_request('clients', per_page=1), ('/clients?per_page=1&page=1', Clients))
+
+        # methods which aren't lists are refused before anything is sent, changed or cached
+        for resource, args in [('delete_client', (5,)), ('company_settings', ()), ('get_client', (5,)), ('create_client', ('ABC Corp',))]:
+            with self.assertRaises(HarvestError):
+                harvest.fetch_all(resource, *args)
+
+        self.assertEqual(cache.get(('client', '5', 'dataclass')), Client(None, id=5))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(len(harvest._company_settings), 0)
+        self.assertEqual(httpretty.latest_requests(), [])
+
+    def test_intern_refs(self):
+        def time_entries_page(page):
+            return {
+                    "time_entries":[{
+                            "id":page,
+                            "spent_date":"2017-03-01",
+                            "client":{"id":5735774, "name":"ABC Corp", "currency":"USD"},
+                            "project":{"id":14307913, "name":"Marketing Website", "code":"MW"},
+                            "hours":2.0
+                        }],
+                    "per_page":1,
+                    "total_pages":2,
+                    "total_entries":2,
+                    "next_page":None,
+                    "previous_page":None,
+                    "page":page,
+                    "links":{
+                            "first":"https://api.harvestapp.com/v2/time_entries?page=1&per_page=1",
+                            "next":"https://api.harvestapp.com/v2/time_entries?page=2&per_page=1" if page == 1 else None,
+                            "previous":None,
+                            "last":"https://api.harvestapp.com/v2/time_entries?page=2&per_page=1"
+                        }
+                }
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/time_entries?page=1&per_page=1",
+                body=json.dumps(time_entries_page(1)),
+                status=200
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/v2/time_entries?page=2&per_page=1",
+                body=json.dumps(time_entries_page(2)),
+                status=200
+            )
+
+        time_entry_1, time_entry_2 = self.harvest.iter_time_entries(per_page=1)
+        self.assertIsNone(self.harvest.interned)
+        self.assertEqual(time_entry_1.client, time_entry_2.client)
+        self.assertIsNot(time_entry_1.client, time_entry_2.client)
+
+        harvest = Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), intern_refs=True)
+        time_entry_1, time_entry_2 = harvest.iter_time_entries(per_page=1)
+        self.assertIs(time_entry_1.client, time_entry_2.client)
+        self.assertIs(time_entry_1.project, time_entry_2.project)
+        self.assertEqual(harvest.interned.maxsize, 4096)
+
+        httpretty.reset()
+
+    def test_decode(self):
+        client_dict = {"id":5735776, "name":"123 Industries", "address":None, "is_active":True, "currency":"EUR"}
+
+        def clients_page(page):
+            return {
+                    "clients":[dict(client_dict, id=page)],
+                    "per_page":1,
+                    "total_pages":2,
+                    "total_entries":2,
+                    "next_page":None,
+                    "previous_page":None,
+                    "page":page,
+                    "links":{
+                            "first":"https://api.harvestapp.com/v2/clients?page=1&per_page=1",
+                            "next":"https://api.harvestapp.com/v2/clients?page=2&per_page=1" if page == 1 else None,
+                            "previous":None,
+                            "last":"https://api.harvestapp.com/v2/clients?page=2&per_page=1"
+                        }
+                }
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients/5735776",
+                body=json.dumps(client_dict),
+                status=200
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients?page=1&per_page=1",
+                body=json.dumps(clients_page(1)),
+                status=200,
+                match_querystring=True
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients?per_page=1&page=2",
+                body=json.dumps(clients_page(2)),
+                status=200,
+                match_querystring=True
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/v2/clients?page=2&per_page=1",
+                body=json.dumps(clients_page(2)),
+                status=200,
+                match_querystring=True
+            )
+
+        harvest = Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), decode='dict')
+        self.assertEqual(harvest.get_client(5735776), client_dict)
+        self.assertEqual([client['id'] for client in harvest.iter_clients(per_page=1)], [1, 2])
+        self.assertEqual([client['id'] for client in harvest.fetch_all('clients', per_page=1)], [1, 2])
+
+        raw = harvest.with_decode('raw')
+        self.assertIs(raw.session, harvest.session)
+        self.assertEqual(harvest.decode, 'dict')
+        self.assertEqual(json.loads(raw.get_client(5735776)), client_dict)
+        # raw pages can't be split into records without parsing them
+        self.assertEqual([json.loads(page)['page'] for page in raw.iter_clients(per_page=1)], [1, 2])
+        self.assertEqual([json.loads(page)['page'] for page in raw.fetch_all('clients', per_page=1)], [1, 2])
+
+        self.assertIs(self.harvest.with_decode('dataclass'), self.harvest)
+        self.assertIs(self.harvest.with_decode('dataclass', caches=False), self.harvest)
+        self.assertEqual(self.harvest.get_client(5735776), from_dict(data_class=Client, data=client_dict))
+
+        with self.assertRaises(HarvestError):
+            self.harvest.with_decode('xml')
+        with self.assertRaises(HarvestError):
+            Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), decode='xml')
+
+        httpretty.reset()
+
+    def test_retry_after(self):
+        company_dict = {
+                "name":"API Examples",
+                "wants_timestamp_timers":False
+            }
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/company",
+                responses=[
+                    httpretty.Response(body='', status=429, adding_headers={'Retry-After': '7'}),
+                    httpretty.Response(body='', status=503),
+                    httpretty.Response(body=json.dumps(company_dict), status=200)
+                ]
+            )
+
+        with patch('harvest.harvest.time.sleep') as sleep_mock:
+            company = self.harvest.company()
+
+        self.assertEqual(company, from_dict(data_class=Company, data=company_dict))
+        self.assertEqual(sleep_mock.call_args_list[0][0][0], 7)
+        # without Retry-After the second retry backs off with jitter
+        self.assertTrue(0.5 <= sleep_mock.call_args_list[1][0][0] <= 1.0)
+        self.assertEqual(self.harvest.retry_policy.retries, 2)
+
+        httpretty.reset()
+
+    def test_retry_idempotent_methods_only(self):
+        httpretty.register_uri(httpretty.POST,
+                "https://api.harvestapp.com/api/v2/clients",
+                body='',
+                status=500
+            )
+
+        with patch('harvest.harvest.time.sleep') as sleep_mock:
+            with self.assertRaises(HarvestError):
+                self.harvest.create_client('ABC Corp')
+
+        sleep_mock.assert_not_called()
+        self.assertEqual(self.harvest.retry_policy.retries, 0)
+
+        retry_policy = RetryPolicy(max_retries=2, methods=('GET', 'DELETE', 'POST'))
+        self.assertIsNotNone(retry_policy.retry_delay('POST', 500))
+        self.assertIsNone(retry_policy.retry_delay('PATCH', 500))
+        self.assertIsNotNone(retry_policy.retry_delay('PATCH', 429))
+        self.assertIsNone(retry_policy.retry_delay('GET', 404))
+        self.assertIsNone(retry_policy.retry_delay('GET', 500, attempt=2))
+        self.assertEqual(RetryPolicy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+        httpretty.reset()
+
+    def test_bulk(self):
+        company_dict = {"base_uri":"https://{ACCOUNT_SUBDOMAIN}.harvestapp.com", "full_domain":"{ACCOUNT_SUBDOMAIN}.harvestapp.com", "name":"API Examples", "is_active":True, "week_start_day":"Monday", "wants_timestamp_timers":False}
+
+        # httpretty isn't thread safe, the session is mocked so the calls really run in several threads
+        lock = threading.Lock()
+        both_in_flight = threading.Event()
+        in_flight = []
+
+        def response(status_code, body=None):
+            resp = requests.Response()
+            resp.status_code = status_code
+            resp._content = json.dumps(body).encode('utf-8') if body is not None else b''
+            resp.url = "https://api.harvestapp.com/api/v2/clients"
+            return resp
+
+        def request(method, url, **kwargs):
+            if url == "https://api.harvestapp.com/api/v2/company?page=1&per_page=100":
+                return response(200, company_dict)
+            if url == "https://api.harvestapp.com/api/v2/time_entries/1":
+                raise requests.ConnectionError("Connection refused")
+            if method == 'DELETE':
+                return response(200)
+
+            data = json.loads(kwargs['data'])
+            with lock:
+                in_flight.append(data['name'])
+                if len(in_flight) == 2:
+                    both_in_flight.set()
+            # the first client is held until a second one is posted alongside it
+            both_in_flight.wait(timeout=5)
+            with lock:
+                in_flight.remove(data['name'])
+
+            if data['name'] == '':
+                return response(422, {"message":"Name can't be blank"})
+            return response(201, {"id":len(data['name']), "name":data['name'], "address":None, "currency":"USD", "is_active":True})
+
+        with patch.object(self.harvest.session, 'request', side_effect=request):
+            results = self.harvest.bulk([
+                    ('create_client', {'name': 'ABC Corp'}),
+                    ('create_client', {'name': ''}),
+                    ('delete_time_entry', {'time_entry_id': 636708723}),
+                    ('get_user', {'user_id': 1782959}),
+                    ('create_client',),
+                    ('create_client', {'name': '123 Industries'}),
+                    ('create_client', {'nam': 'typo'}),
+                    ('create_client', 'ABC Corp'),
+                    ('delete_time_entry', {'time_entry_id': 1}),
+                    ('create_time_entry_via_start_and_end_time', {'project_id': 14307913, 'task_id': 8083365, 'spent_date': '2017-03-01', 'started_time': '8:00am'}),
+                ], concurrency=2)
+
+        self.assertTrue(both_in_flight.is_set())
+        self.assertEqual(results[0], Client(id=8, name='ABC Corp', address=None, currency='USD', is_active=True))
+        self.assertIsInstance(results[1], HarvestError)
+        self.assertIn("Name can't be blank", str(results[1]))
+        self.assertIsNone(results[2])
+        self.assertEqual(str(results[3]), 'Unknown bulk operation "get_user", expected a create_, update_ or delete_ method.')
+        self.assertIsInstance(results[4], HarvestError)
+        self.assertEqual(results[5].name, '123 Industries')
+        self.assertIsInstance(results[6], HarvestError)
+        self.assertIn('create_client failed. TypeError', str(results[6]))
+        self.assertEqual(str(results[7]), 'Invalid keyword arguments \'ABC Corp\' of bulk operation "create_client", expected a mapping.')
+        self.assertEqual(str(results[8]), 'delete_time_entry failed. ConnectionError: Connection refused')
+        self.assertEqual(str(results[9]), TIME_ENTRY_PERMISSION_MESSAGE)
+
+    def test_stream_records(self):
+        def clients_page(page):
+            return json.dumps({
+                    "clients":[{"id":page * 10 + record, "name":"Client {0}".format(page * 10 + record), "address":None, "is_active":True, "currency":"USD"} for record in range(2)],
+                    "per_page":2,
+                    "total_pages":2,
+                    "total_entries":4,
+                    "next_page":2 if page == 1 else None,
+                    "previous_page":None,
+                    "page":page,
+                    "links":{
+                            "first":"https://api.harvestapp.com/api/v2/clients?page=1&per_page=2",
+                            "next":"https://api.harvestapp.com/api/v2/clients?page=2&per_page=2" if page == 1 else None,
+                            "previous":None,
+                            "last":"https://api.harvestapp.com/api/v2/clients?page=2&per_page=2"
+                        }
+                })
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients?page=1&per_page=2",
+                body=gzip.compress(clients_page(1).encode('utf-8')),
+                adding_headers={'Content-Encoding': 'gzip'},
+                status=200,
+                match_querystring=True
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients?page=2&per_page=2",
+                body=clients_page(2),
+                status=200,
+                match_querystring=True
+            )
+
+        clients = self.harvest.stream_records('clients', per_page=2)
+        self.assertEqual(next(clients), Client(id=10, name="Client 10", address=None, is_active=True, currency="USD"))
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+        self.assertIn('gzip', httpretty.last_request().headers['Accept-Encoding'])
+        self.assertEqual([client.id for client in clients], [11, 20, 21])
+
+        # parsed once downloaded without ijson
+        with patch('harvest.harvest.ijson', None):
+            self.assertEqual([client['name'] for client in self.harvest.with_decode('dict').stream_records('clients', per_page=2)], ["Client 10", "Client 11", "Client 20", "Client 21"])
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/reports/time/clients?from=20170101&to=20171231&page=1&per_page=1000",
+                body=json.dumps({"results":[{"client_id":5735776, "client_name":"123 Industries", "total_hours":4.5, "billable_hours":3.5, "currency":"EUR", "billable_amount":350.0}], "per_page":1000, "total_pages":1, "total_entries":1, "next_page":None, "previous_page":None, "page":1, "links":{"first":"", "next":None, "previous":None, "last":""}}),
+                status=200,
+                match_querystring=True
+            )
+        results = list(self.harvest.stream_records('reports_time_clients', '20170101', '20171231'))
+        self.assertEqual([(result.client_name, result.billable_amount) for result in results], [("123 Industries", 350.0)])
+
+        with self.assertRaises(HarvestError):
+            next(self.harvest.stream_records('get_client', 5735776))
+
+        httpretty.reset()
+
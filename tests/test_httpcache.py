@@ -0,0 +1,175 @@
+# Copyright 2020 Bradbase
+
+import os, sys
+import unittest
+import tempfile
+import warnings
+import httpretty
+import json
+from datetime import date, datetime
+from dacite import from_dict
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import Harvest
+from harvest.httpcache import ResponseCache, MemoryResponseStore, SQLiteResponseStore, DirectoryResponseStore, CachedResponse, ClosedPeriodCache, period_end
+from harvest.harvestdataclasses import *
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.client_dict = {"id":5735776, "name":"123 Industries", "address":None, "is_active":True, "currency":"EUR"}
+        self.etag = '"1"'
+
+        def get_client(request, uri, response_headers):
+            if request.headers.get('If-None-Match') == self.etag:
+                return [304, {}, '']
+            return [200, {'ETag': self.etag}, json.dumps(self.client_dict)]
+
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/clients/5735776", body=get_client)
+
+    def tearDown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_conditional_get(self):
+        response_cache = ResponseCache()
+        harvest = Harvest('https://api.harvestapp.com/api/v2', self.personal_access_token, response_cache=response_cache)
+
+        client = from_dict(data_class=Client, data=self.client_dict)
+        self.assertEqual(harvest.get_client(5735776), client)
+        self.assertIsNone(httpretty.last_request().headers.get('If-None-Match'))
+
+        self.assertEqual(harvest.get_client(5735776), client)
+        self.assertEqual(httpretty.last_request().headers.get('If-None-Match'), '"1"')
+        self.assertEqual(harvest.with_decode('raw').get_client(5735776), json.dumps(self.client_dict).encode('utf-8'))
+        self.assertEqual(response_cache.stats(), {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+        # a changed client is downloaded and kept again
+        self.client_dict['name'] = "456 Industries"
+        self.etag = '"2"'
+        self.assertEqual(harvest.get_client(5735776).name, "456 Industries")
+        self.assertEqual(harvest.get_client(5735776).name, "456 Industries")
+        self.assertEqual(response_cache.stats()['misses'], 2)
+
+    def test_keyed_by_account(self):
+        response_cache = ResponseCache()
+        Harvest('https://api.harvestapp.com/api/v2', self.personal_access_token, response_cache=response_cache).get_client(5735776)
+        Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('OTHER_ACCOUNT', 'PERSONAL_ACCESS_TOKEN'), response_cache=response_cache).get_client(5735776)
+
+        self.assertIsNone(httpretty.last_request().headers.get('If-None-Match'))
+        self.assertEqual(response_cache.stats()['misses'], 2)
+
+    def test_oauth_keyed_by_user(self):
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/users/me", body=json.dumps({"id":1782959, "first_name":"Kim", "last_name":"Allen"}), status=200)
+        response_cache = ResponseCache()
+
+        # a reissued token of the same user finds the responses kept with the last one
+        for access_token in ('FIRST_TOKEN', 'SECOND_TOKEN'):
+            client = Harvest('https://api.harvestapp.com/api/v2', OAuth2_ClientSide_Token(access_token, 1209600, 'bearer', []), response_cache=response_cache)
+            client.get_client(5735776)
+            client.get_client(5735776)
+
+        self.assertEqual([request.path for request in httpretty.latest_requests()], ["/api/v2/users/me", "/api/v2/clients/5735776", "/api/v2/clients/5735776", "/api/v2/users/me", "/api/v2/clients/5735776", "/api/v2/clients/5735776"])
+        self.assertEqual(response_cache.stats()['misses'], 1)
+
+        # an explicit account is requested and needs no lookup
+        client = Harvest('https://api.harvestapp.com/api/v2', OAuth2_ClientSide_Token('THIRD_TOKEN', 1209600, 'bearer', []), response_cache=response_cache, account_id='ACCOUNT_NUMBER')
+        client.get_client(5735776)
+        self.assertEqual(httpretty.last_request().headers.get('Harvest-Account-ID'), 'ACCOUNT_NUMBER')
+        self.assertEqual(len(httpretty.latest_requests()), 7)
+
+    def test_sqlite_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'responses.sqlite')
+            store = SQLiteResponseStore(path)
+            Harvest('https://api.harvestapp.com/api/v2', self.personal_access_token, response_cache=ResponseCache(store)).get_client(5735776)
+            store.close()
+
+            store = SQLiteResponseStore(path)
+            response_cache = ResponseCache(store)
+            self.assertEqual(Harvest('https://api.harvestapp.com/api/v2', self.personal_access_token, response_cache=response_cache).get_client(5735776).name, "123 Industries")
+            self.assertEqual(response_cache.stats()['hits'], 1)
+
+            store.clear()
+            self.assertIsNone(store.get(ResponseCache.key('ACCOUNT_NUMBER', 'https://api.harvestapp.com/api/v2/clients/5735776')))
+            store.close()
+
+    def test_memory_store(self):
+        store = MemoryResponseStore(maxsize=1)
+        store.set('a', CachedResponse(b'{}', etag='"a"'))
+        store.set('b', CachedResponse(b'[]', last_modified='Wed, 21 Oct 2015 07:28:00 GMT'))
+
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(ResponseCache(store).request_headers('b'), {'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+class TestClosedPeriodCache(unittest.TestCase):
+
+    def setUp(self):
+        self.personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.results_dict = {"results":[{"client_id":5735776, "client_name":"123 Industries", "total_hours":4.5, "billable_hours":3.5, "currency":"EUR", "billable_amount":350.0}], "per_page":1000, "total_pages":1, "total_entries":1, "next_page":None, "previous_page":None, "page":1, "links":{"first":"", "next":None, "previous":None, "last":""}}
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/reports/time/clients", body=json.dumps(self.results_dict), status=200)
+
+        # 2017-03-15
+        self.clock = lambda: datetime(2017, 3, 15, 12).timestamp()
+
+    def tearDown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_period_end(self):
+        self.assertEqual(period_end('https://api.harvestapp.com/api/v2/reports/time/clients?from=20170101&to=20170131&page=1'), date(2017, 1, 31))
+        self.assertEqual(period_end('https://api.harvestapp.com/api/v2/time_entries?from=2017-01-01&to=2017-01-31'), date(2017, 1, 31))
+        self.assertIsNone(period_end('https://api.harvestapp.com/api/v2/time_entries?from=2017-01-01'))
+
+    def test_closed_period(self):
+        with tempfile.TemporaryDirectory() as directory:
+            archive = ClosedPeriodCache(DirectoryResponseStore(directory), lock_days=30, clock=self.clock)
+            harvest = Harvest('https://api.harvestapp.com/api/v2', self.personal_access_token, archive=archive)
+
+            results = harvest.reports_time_clients('20170101', '20170131')
+            self.assertEqual(harvest.reports_time_clients('20170101', '20170131'), results)
+            self.assertEqual(harvest.with_decode('dict').reports_time_clients('20170101', '20170131')['results'], self.results_dict['results'])
+            self.assertEqual(len(httpretty.latest_requests()), 1)
+            self.assertEqual(archive.stats(), {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+            # a new client with the same archive runs offline
+            archive = ClosedPeriodCache(DirectoryResponseStore(directory), lock_days=30, clock=self.clock)
+            Harvest('https://api.harvestapp.com/api/v2', self.personal_access_token, archive=archive).reports_time_clients('20170101', '20170131')
+            self.assertEqual(len(httpretty.latest_requests()), 1)
+
+            DirectoryResponseStore(directory).clear()
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_archived_resources(self):
+        archive = ClosedPeriodCache(lock_days=30, clock=self.clock)
+
+        self.assertIsNotNone(archive.closed_key('ACCOUNT_NUMBER', 'https://api.harvestapp.com/api/v2/time_entries?from=2017-01-01&to=2017-01-31'))
+        self.assertIsNotNone(archive.closed_key('ACCOUNT_NUMBER', 'https://api.harvestapp.com/api/v2/expenses?to=2017-01-31'))
+        # invoices are paid and estimates accepted long after they were issued
+        self.assertIsNone(archive.closed_key('ACCOUNT_NUMBER', 'https://api.harvestapp.com/api/v2/invoices?from=2017-01-01&to=2017-01-31'))
+        self.assertIsNone(archive.closed_key('ACCOUNT_NUMBER', 'https://api.harvestapp.com/api/v2/estimates?to=2017-01-31'))
+
+        archive = ClosedPeriodCache(lock_days=30, clock=self.clock, resources=('reports',))
+        self.assertIsNone(archive.closed_key('ACCOUNT_NUMBER', 'https://api.harvestapp.com/api/v2/time_entries?to=2017-01-31'))
+        self.assertIsNotNone(archive.closed_key('ACCOUNT_NUMBER', 'https://api.harvestapp.com/api/v2/reports/time/clients?from=20170101&to=20170131'))
+
+    def test_open_period(self):
+        archive = ClosedPeriodCache(lock_days=30, clock=self.clock)
+        harvest = Harvest('https://api.harvestapp.com/api/v2', self.personal_access_token, archive=archive)
+
+        harvest.reports_time_clients('20170201', '20170228')
+        harvest.reports_time_clients('20170201', '20170228')
+
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+        self.assertEqual(archive.stats()['hits'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
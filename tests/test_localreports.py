@@ -0,0 +1,85 @@
+# Copyright 2020 Bradbase
+
+import os, sys
+import unittest
+import tempfile
+from datetime import date
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest.localreports import LocalReports, report_date
+from harvest.sync import SQLiteStore
+from harvest.harvestdataclasses import *
+
+class TestLocalReports(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SQLiteStore(os.path.join(self.directory.name, 'harvest.sqlite'))
+        self.reports = LocalReports(self.store)
+
+        abc_corp = {"id":5735774, "name":"ABC Corp", "currency":"USD"}
+        industries = {"id":5735776, "name":"123 Industries", "currency":"EUR"}
+        website = {"id":14307913, "name":"Marketing Website", "code":"MW"}
+        mobile_app = {"id":14308069, "name":"Online Store - Phase 1", "code":"OS1"}
+        design = {"id":8083365, "name":"Graphic Design"}
+        programming = {"id":8083366, "name":"Programming"}
+        kim = {"id":1782959, "name":"Kim Allen"}
+        bob = {"id":1782884, "name":"Bob Powell"}
+
+        self.store.upsert('time_entries', [
+                {"id":1, "spent_date":"2017-03-01", "client":abc_corp, "project":website, "task":design, "user":kim, "hours":2.0, "billable":True, "billable_rate":100.0},
+                {"id":2, "spent_date":"2017-03-02", "client":abc_corp, "project":website, "task":programming, "user":bob, "hours":3.0, "billable":False, "billable_rate":None},
+                {"id":3, "spent_date":"2017-03-31", "client":industries, "project":mobile_app, "task":programming, "user":kim, "hours":1.5, "billable":True, "billable_rate":120.0},
+                {"id":4, "spent_date":"2017-04-01", "client":abc_corp, "project":website, "task":design, "user":kim, "hours":8.0, "billable":True, "billable_rate":100.0},
+            ])
+        self.store.upsert('expenses', [
+                {"id":11, "spent_date":"2017-03-01", "client":abc_corp, "project":website, "expense_category":{"id":4195926, "name":"Meals"}, "user":kim, "total_cost":33.35, "billable":True},
+                {"id":12, "spent_date":"2017-03-03", "client":abc_corp, "project":website, "expense_category":{"id":4197501, "name":"Lodging"}, "user":bob, "total_cost":100.0, "billable":False},
+            ])
+        self.store.upsert('users', [
+                {"id":1782959, "first_name":"Kim", "last_name":"Allen", "is_contractor":False},
+                {"id":1782884, "first_name":"Bob", "last_name":"Powell", "is_contractor":True},
+            ])
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_report_date(self):
+        self.assertEqual(report_date('20170301'), '2017-03-01')
+        self.assertEqual(report_date('2017-03-01'), '2017-03-01')
+        self.assertEqual(report_date(date(2017, 3, 1)), '2017-03-01')
+
+    def test_reports_time(self):
+        self.assertEqual(self.reports.reports_time_clients('20170301', '20170331'), TimeReportResults([
+                TimeReportResult(client_id=5735774, client_name="ABC Corp", project_id=None, project_name=None, task_id=None, task_name=None, user_id=None, user_name=None, is_contractor=None, currency="USD", billable_amount=200.0, total_hours=5.0, billable_hours=2.0),
+                TimeReportResult(client_id=5735776, client_name="123 Industries", project_id=None, project_name=None, task_id=None, task_name=None, user_id=None, user_name=None, is_contractor=None, currency="EUR", billable_amount=180.0, total_hours=1.5, billable_hours=1.5),
+            ]))
+
+        projects = self.reports.reports_time_projects(date(2017, 3, 1), date(2017, 4, 30)).results
+        self.assertEqual([(result.project_name, result.total_hours, result.billable_amount) for result in projects], [("Marketing Website", 13.0, 1000.0), ("Online Store - Phase 1", 1.5, 180.0)])
+
+        tasks = self.reports.reports_time_tasks('20170301', '20170331').results
+        self.assertEqual([(result.task_name, result.currency, result.total_hours) for result in tasks], [("Graphic Design", "USD", 2.0), ("Programming", "EUR", 1.5), ("Programming", "USD", 3.0)])
+
+        team = self.reports.reports_time_team('20170301', '20170331').results
+        self.assertEqual([(result.user_name, result.is_contractor, result.currency, result.billable_hours) for result in team], [("Bob Powell", True, "USD", 0), ("Kim Allen", False, "EUR", 1.5), ("Kim Allen", False, "USD", 2.0)])
+
+        self.assertEqual(self.reports.reports_time_clients('20180101', '20181231'), TimeReportResults([]))
+
+    def test_reports_expenses(self):
+        clients = self.reports.reports_expenses_clients('20170301', '20170331').results
+        self.assertEqual(clients, [ExpenseReportResult(client_id=5735774, client_name="ABC Corp", project_id=None, project_name=None, expense_category_id=None, expense_category_name=None, user_id=None, user_name=None, is_contractor=None, total_amount=133.35, billable_amount=33.35, currency="USD")])
+
+        categories = self.reports.reports_expenses_categories('20170301', '20170331').results
+        self.assertEqual([(result.expense_category_name, result.total_amount) for result in categories], [("Meals", 33.35), ("Lodging", 100.0)])
+
+        team = self.reports.reports_expenses_team('20170301', '20170302').results
+        self.assertEqual([(result.user_name, result.is_contractor, result.billable_amount) for result in team], [("Kim Allen", False, 33.35)])
+
+        projects = self.reports.reports_expenses_projects('20170301', '20170331').results
+        self.assertEqual([(result.project_id, result.total_amount) for result in projects], [(14307913, 133.35)])
+
+if __name__ == '__main__':
+    unittest.main()
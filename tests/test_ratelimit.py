@@ -0,0 +1,187 @@
+# Copyright 2020 Bradbase
+
+import os, sys
+import unittest
+import tempfile
+import threading
+import warnings
+import httpretty
+import json
+from mock import patch
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import Harvest
+from harvest.ratelimit import RateLimiter, SQLiteBackend
+from harvest.harvestdataclasses import *
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_reserve_within_window(self):
+        rate_limiter = RateLimiter(3, 15, clock=self.clock)
+
+        self.assertEqual([rate_limiter.reserve() for i in range(3)], [0, 0, 0])
+        # the fourth request waits for the first to leave the window
+        self.assertEqual(rate_limiter.reserve(), 15)
+        self.assertEqual(rate_limiter.reserve(), 15)
+
+        self.clock.now += 10
+        self.assertEqual(rate_limiter.reserve(), 5)
+
+        self.assertEqual(rate_limiter.requests, 6)
+        self.assertEqual(rate_limiter.wait_time, 35)
+
+    def test_reserve_after_window(self):
+        rate_limiter = RateLimiter(2, 15, clock=self.clock)
+
+        rate_limiter.reserve()
+        self.clock.now += 5
+        rate_limiter.reserve()
+        self.clock.now += 11
+        # the first request has aged out, the second has not
+        self.assertEqual(rate_limiter.reserve(), 0)
+        self.assertEqual(rate_limiter.reserve(), 4)
+
+    def test_reserve_threads(self):
+        rate_limiter = RateLimiter(10, 15, clock=self.clock)
+        delays = []
+
+        def reserve():
+            for i in range(10):
+                delays.append(rate_limiter.reserve())
+
+        threads = [threading.Thread(target=reserve) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(delays), [0] * 10 + [15] * 10 + [30] * 10 + [45] * 10 + [60] * 10)
+
+    def test_acquire_sleeps(self):
+        rate_limiter = RateLimiter(1, 15, clock=self.clock)
+
+        with patch('harvest.ratelimit.time.sleep') as sleep_mock:
+            self.assertEqual(rate_limiter.acquire(), 0)
+            self.assertEqual(rate_limiter.acquire(), 15)
+
+        sleep_mock.assert_called_once_with(15)
+
+    def test_update_from_headers(self):
+        rate_limiter = RateLimiter(100, 15, clock=self.clock)
+
+        self.assertFalse(rate_limiter.update_from_headers({}))
+        self.assertTrue(rate_limiter.update_from_headers({'X-RateLimit-Limit': '2', 'X-RateLimit-Remaining': '1', 'X-RateLimit-Reset': '3'}))
+        self.assertEqual(rate_limiter.count, 2)
+
+        # one request left in the server's window, the next waits for its reset
+        self.assertEqual(rate_limiter.reserve(), 0)
+        self.assertEqual(rate_limiter.reserve(), 3)
+
+        self.clock.now += 20
+        self.assertTrue(rate_limiter.update_from_headers({'RateLimit-Limit': '500;w=60', 'RateLimit-Remaining': '499', 'RateLimit-Reset': '60'}))
+        self.assertEqual((rate_limiter.count, rate_limiter.period), (500, 60))
+        self.assertEqual([rate_limiter.reserve() for i in range(400)], [0] * 400)
+
+    def test_sqlite_backend_shared_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rate_limits.sqlite')
+            # two limiters on the same file behave like two worker processes
+            rate_limiter_1 = RateLimiter(3, 15, clock=self.clock, backend=SQLiteBackend(path, 'ACCOUNT_NUMBER:requests:15'))
+            rate_limiter_2 = RateLimiter(3, 15, clock=self.clock, backend=SQLiteBackend(path, 'ACCOUNT_NUMBER:requests:15'))
+            reports_rate_limiter = RateLimiter(3, 900, clock=self.clock, backend=SQLiteBackend(path, 'ACCOUNT_NUMBER:reports:900'))
+
+            self.assertEqual(rate_limiter_1.reserve(), 0)
+            self.assertEqual(rate_limiter_2.reserve(), 0)
+            self.assertEqual(rate_limiter_1.reserve(), 0)
+            self.assertEqual(rate_limiter_2.reserve(), 15)
+            self.assertEqual(reports_rate_limiter.reserve(), 0)
+
+            self.assertEqual(RateLimiter(3, 15, backend=SQLiteBackend(path, 'ACCOUNT_NUMBER:requests:15')).clock, SQLiteBackend.clock)
+
+            # the budget is named explicitly, limiters of different windows can't end up sharing one
+            with self.assertRaises(TypeError):
+                SQLiteBackend(path)
+
+    def test_sqlite_backend_threads(self):
+        with tempfile.TemporaryDirectory() as directory:
+            rate_limiter = RateLimiter(1000, 15, clock=self.clock, backend=SQLiteBackend(os.path.join(directory, 'rate_limits.sqlite'), 'ACCOUNT_NUMBER:requests:15'))
+
+            def reserve():
+                for i in range(50):
+                    rate_limiter.reserve()
+                rate_limiter.backend.close()
+
+            threads = [threading.Thread(target=reserve) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(rate_limiter.requests, 200)
+            self.assertEqual(rate_limiter.wait_time, 0)
+
+class TestHarvestRateLimiting(unittest.TestCase):
+
+    def setUp(self):
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+    def tearDown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_shared_rate_limiter(self):
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/company",
+                body=json.dumps({"name":"API Examples"}),
+                status=200
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/reports/time/clients",
+                body=json.dumps({"results":[]}),
+                status=200
+            )
+
+        rate_limiter = RateLimiter(100, 15)
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        harvest_1 = Harvest('https://api.harvestapp.com/api/v2', personal_access_token, rate_limiter=rate_limiter)
+        harvest_2 = Harvest('https://api.harvestapp.com/api/v2', personal_access_token, rate_limiter=rate_limiter)
+
+        harvest_1.company()
+        harvest_2.company()
+        harvest_2.reports_time_clients('20170101', '20171231')
+
+        self.assertEqual(rate_limiter.requests, 2)
+        self.assertEqual(harvest_1.reports_rate_limiter.requests, 0)
+        self.assertEqual(harvest_2.reports_rate_limiter.requests, 1)
+        self.assertEqual(harvest_2.reports_rate_limiter.period, Harvest.RATE_LIMIT_REPORTS_DURATION_SECONDS)
+
+    def test_adapts_to_response_headers(self):
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/company",
+                body=json.dumps({"name":"API Examples"}),
+                status=200,
+                adding_headers={'X-RateLimit-Limit': '200', 'X-RateLimit-Remaining': '150', 'X-RateLimit-Reset': '10'}
+            )
+
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        harvest = Harvest('https://api.harvestapp.com/api/v2', personal_access_token)
+        self.assertEqual(harvest.rate_limiter.count, Harvest.RATE_LIMIT_REQUEST_COUNT)
+
+        harvest.company()
+        self.assertEqual(harvest.rate_limiter.count, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+# Copyright 2020 Bradbase
+
+import os, sys
+import unittest
+import tempfile
+import warnings
+import httpretty
+import json
+from datetime import date
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+from harvest import Harvest, HarvestError
+from harvest.sync import Sync, SQLiteStore, SyncResult, ReconcileResult
+from harvest.httpcache import ClosedPeriodCache, ResponseCache
+from harvest.harvestdataclasses import *
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        self.harvest = Harvest('https://api.harvestapp.com/api/v2', personal_access_token)
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SQLiteStore(os.path.join(self.directory.name, 'harvest.sqlite'))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+        httpretty.reset()
+        httpretty.disable()
+
+    def clients_page(self, clients):
+        return json.dumps({
+                "clients":clients,
+                "per_page":100,
+                "total_pages":1,
+                "total_entries":len(clients),
+                "next_page":None,
+                "previous_page":None,
+                "page":1,
+                "links":{
+                        "first":"https://api.harvestapp.com/v2/clients?page=1&per_page=100",
+                        "next":None,
+                        "previous":None,
+                        "last":"https://api.harvestapp.com/v2/clients?page=1&per_page=100"
+                    }
+            })
+
+    def test_sync(self):
+        client_5735776_dict = {"id":5735776, "name":"123 Industries", "address":None, "is_active":True, "currency":"EUR", "updated_at":"2017-06-26T21:34:11Z"}
+        client_5735774_dict = {"id":5735774, "name":"ABC Corp", "address":None, "is_active":True, "currency":"USD", "updated_at":"2017-06-26T21:27:07Z"}
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients?per_page=100&page=1",
+                body=self.clients_page([client_5735776_dict, client_5735774_dict]),
+                status=200,
+                match_querystring=True
+            )
+
+        sync = Sync(self.harvest, self.store)
+        self.assertEqual(sync.sync('clients'), SyncResult('clients', None, '2017-06-26T21:34:11Z', fetched=2, inserted=2))
+        self.assertEqual(self.store.count('clients'), 2)
+
+        # only the records updated since the checkpoint are requested
+        renamed_dict = dict(client_5735774_dict, name="ABC Corporation", updated_at="2017-07-01T10:00:00Z")
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/clients?per_page=100&updated_since=2017-06-26T21:34:11Z&page=1",
+                body=self.clients_page([renamed_dict, client_5735776_dict]),
+                status=200,
+                match_querystring=True
+            )
+
+        self.assertEqual(sync.sync('clients'), SyncResult('clients', '2017-06-26T21:34:11Z', '2017-07-01T10:00:00Z', fetched=2, updated=1, unchanged=1))
+        self.assertEqual(list(self.store.records('clients')), [renamed_dict, client_5735776_dict])
+        self.assertEqual(self.store.checkpoint('clients'), '2017-07-01T10:00:00Z')
+        self.assertIsNone(self.store.checkpoint('time_entries'))
+
+        with self.assertRaises(HarvestError):
+            sync.sync('_get')
+
+    def time_entries_page(self, time_entries, total_entries):
+        return json.dumps({
+                "time_entries":time_entries,
+                "per_page":len(time_entries),
+                "total_pages":1,
+                "total_entries":total_entries,
+                "next_page":None,
+                "previous_page":None,
+                "page":1,
+                "links":{"first":"", "next":None, "previous":None, "last":""}
+            })
+
+    def test_reconcile(self):
+        def time_entry(time_entry_id, spent_date):
+            return {"id":time_entry_id, "spent_date":spent_date, "hours":1.0, "updated_at":"2017-05-01T00:00:00Z"}
+
+        march = [time_entry(1, "2017-03-01"), time_entry(2, "2017-03-31")]
+        april = [time_entry(3, "2017-04-01"), time_entry(4, "2017-04-30")]
+        with self.store.transaction() as connection:
+            self.store.upsert('time_entries', march + april, connection)
+        self.assertEqual(self.store.window_counts('time_entries', 'spent_date'), {'2017-03':2, '2017-04':2})
+
+        # March still has two entries so only its count is requested
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/time_entries?per_page=1&from=2017-03-01&to=2017-03-31&page=1",
+                body=self.time_entries_page(march[:1], 2),
+                status=200,
+                match_querystring=True
+            )
+        # entry 4 was deleted and entry 5 created in April
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/time_entries?per_page=1&from=2017-04-01&to=2017-04-30&page=1",
+                body=self.time_entries_page(april[:1], 1),
+                status=200,
+                match_querystring=True
+            )
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/time_entries?per_page=2000&from=2017-04-01&to=2017-04-30&page=1",
+                body=self.time_entries_page([april[0], time_entry(5, "2017-04-15")], 2),
+                status=200,
+                match_querystring=True
+            )
+
+        result = Sync(self.harvest, self.store).reconcile('time_entries')
+
+        self.assertEqual(result, ReconcileResult('time_entries', windows=2, scanned=1, deleted=[4], restored=1))
+        self.assertEqual([record['id'] for record in self.store.records('time_entries')], [1, 2, 3, 5])
+        self.assertEqual(len(httpretty.latest_requests()), 3)
+
+    def test_reconcile_with_sync_filters(self):
+        def time_entry(time_entry_id, spent_date):
+            return {"id":time_entry_id, "spent_date":spent_date, "user":{"id":1782959}, "hours":1.0, "updated_at":"2017-05-01T00:00:00Z"}
+
+        march = [time_entry(1, "2017-03-20"), time_entry(2, "2017-03-31")]
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/time_entries?user_id=1782959&per_page=100&from=2017-03-15&page=1",
+                body=self.time_entries_page(march, 2),
+                status=200,
+                match_querystring=True
+            )
+
+        sync = Sync(self.harvest, self.store)
+        sync.sync('time_entries', user_id=1782959, from_date=date(2017, 3, 15))
+        self.assertEqual(self.store.sync_filters('time_entries'), {'user_id':1782959, 'from_date':'2017-03-15'})
+
+        # the count of the user's entries since the 15th matches the store, the other entries of March aren't scanned
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/time_entries?per_page=1&user_id=1782959&from=2017-03-15&to=2017-03-31&page=1",
+                body=self.time_entries_page(march[:1], 2),
+                status=200,
+                match_querystring=True
+            )
+
+        self.assertEqual(sync.reconcile('time_entries'), ReconcileResult('time_entries', windows=1, scanned=0))
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+
+    def test_caches_not_used(self):
+        march = [{"id":1, "spent_date":"2017-03-01", "hours":1.0, "updated_at":"2017-05-01T00:00:00Z"}]
+        with self.store.transaction() as connection:
+            self.store.upsert('time_entries', march, connection)
+
+        httpretty.register_uri(httpretty.GET,
+                "https://api.harvestapp.com/api/v2/time_entries?per_page=1&from=2017-03-01&to=2017-03-31&page=1",
+                body=self.time_entries_page(march, 1),
+                status=200,
+                match_querystring=True
+            )
+
+        response_cache = ResponseCache()
+        harvest = Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), response_cache=response_cache, archive=ClosedPeriodCache())
+        sync = Sync(harvest, self.store)
+
+        # March is long closed, yet every reconcile asks Harvest for its count
+        self.assertEqual(sync.reconcile('time_entries'), ReconcileResult('time_entries', windows=1, scanned=0))
+        self.assertEqual(sync.reconcile('time_entries'), ReconcileResult('time_entries', windows=1, scanned=0))
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+        self.assertEqual(response_cache.stats(), {'hits': 0, 'misses': 0, 'hit_rate': 0.0})
+        self.assertIsNotNone(harvest.archive)
+        self.assertEqual(sync.harvest.decode, 'dict')
+
+    def test_store_delete(self):
+        with self.store.transaction() as connection:
+            self.assertEqual(self.store.upsert('clients', [{"id":1, "updated_at":"a"}, {"id":2, "updated_at":"a"}], connection), (2, 0, 0))
+        self.assertEqual(self.store.delete('clients', [1, 3]), 1)
+        self.assertEqual([record['id'] for record in self.store.records('clients')], [2])
+
+if __name__ == '__main__':
+    unittest.main()
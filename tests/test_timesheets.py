@@ -11,6 +11,9 @@ import httpretty
 import warnings
 from dacite import from_dict
 import json
+import threading
+import requests
+from mock import patch
 from datetime import datetime
 
 sys.path.insert(0, sys.path[0]+"/..")
@@ -635,3 +638,65 @@ class TestTimesheets(unittest.TestCase):
 
 
         httpretty.reset()
+
+    def test_create_time_entries(self):
+        company_dict = {"base_uri":"https://{ACCOUNT_SUBDOMAIN}.harvestapp.com", "full_domain":"{ACCOUNT_SUBDOMAIN}.harvestapp.com", "name":"API Examples", "is_active":False, "week_start_day":"Monday", "wants_timestamp_timers":False, "time_format":"hours_minutes", "plan_type":"sponsored", "expense_feature":True, "invoice_feature":True, "estimate_feature":True, "approval_required":True, "clock":"12h", "decimal_symbol":".", "thousands_separator":",", "color_scheme":"orange"}
+
+        # httpretty isn't thread safe, the session is mocked so the entries really are posted from several threads
+        lock = threading.Lock()
+        both_in_flight = threading.Event()
+        in_flight = []
+        posted = []
+
+        def response(status_code, body):
+            resp = requests.Response()
+            resp.status_code = status_code
+            resp._content = json.dumps(body).encode('utf-8')
+            resp.url = "https://api.harvestapp.com/api/v2/time_entries"
+            return resp
+
+        def request(method, url, **kwargs):
+            if method == 'GET':
+                return response(200, company_dict)
+
+            data = json.loads(kwargs['data'])
+            with lock:
+                in_flight.append(data['spent_date'])
+                posted.append(data['spent_date'])
+                if len(in_flight) == 2:
+                    both_in_flight.set()
+            # the first entry is held until a second one is posted alongside it
+            both_in_flight.wait(timeout=5)
+            with lock:
+                in_flight.remove(data['spent_date'])
+
+            if data['hours'] > 24:
+                return response(422, {"message":"Hours must be less than 24"})
+            return response(201, {
+                    "id":data['hours'] * 10, "spent_date":data['spent_date'], "user":{"id":1782959, "name":"Kim Allen"}, "client":{"id":5735774, "name":"ABC Corp"}, "project":{"id":data['project_id'], "name":"Marketing Website"}, "task":{"id":data['task_id'], "name":"Graphic Design"},
+                    "hours":data['hours'], "notes":None, "created_at":"2017-06-27T16:01:23Z", "updated_at":"2017-06-27T16:01:23Z", "is_locked":False, "locked_reason":None, "is_closed":False, "is_billed":False, "timer_started_at":None, "started_time":None, "ended_time":None, "is_running":False,
+                    "invoice":None, "external_reference":None, "billable":True, "budgeted":True, "billable_rate":100.0, "cost_rate":50.0
+                })
+
+        with patch.object(self.harvest.session, 'request', side_effect=request) as session_request:
+            results = self.harvest.create_time_entries(False, [
+                    {"project_id":14307913, "task_id":8083365, "spent_date":"2017-03-21", "hours":1.0},
+                    {"project_id":14307913, "spent_date":"2017-03-21", "hours":2.0},
+                    {"project_id":14307913, "task_id":8083365, "spent_date":"2017-03-22", "hours":25.0},
+                    {"project_id":14307913, "task_id":8083365, "spent_date":"2017-03-23", "hours":3.0},
+                ], concurrency=2)
+
+            self.assertTrue(both_in_flight.is_set())
+            self.assertEqual([(result.spent_date, result.hours) for result in results[0::3]], [("2017-03-21", 1.0), ("2017-03-23", 3.0)])
+            self.assertEqual(results[1], ErrorMessage("Time entry is missing task_id."))
+            self.assertIsInstance(results[2], ErrorMessage)
+            self.assertIn("Hours must be less than 24", results[2].message)
+            self.assertEqual(sorted(posted), ["2017-03-21", "2017-03-22", "2017-03-23"])
+
+            # the company settings are requested once for every entry and the next calls
+            self.harvest.create_time_entry_via_duration(project_id=14307913, task_id=8083365, spent_date="2017-03-24", hours=4.0)
+            self.assertEqual([call.kwargs['method'] for call in session_request.call_args_list].count('GET'), 1)
+
+            # settings saying no are requested again in case they changed
+            self.assertEqual(self.harvest.create_time_entries(True, [{"project_id":14307913, "task_id":8083365, "spent_date":"2017-03-21", "started_time":"8:00am"}]), [ErrorMessage(harvest.harvest.TIME_ENTRY_PERMISSION_MESSAGE)])
+            self.assertEqual([call.kwargs['method'] for call in session_request.call_args_list].count('GET'), 2)